@@ -0,0 +1,71 @@
+# EthoGrid_App/benchmarks/bench_batched_inference.py
+"""
+Measures YOLO inference throughput on the frames of a video with one frame per predict call versus
+batches of frames, and checks that every batch size yields the same detections (formatted like the
+CSV columns the inference workers write).
+
+Requires ultralytics and a model file; detection and segmentation models both work.
+
+Usage: python benchmarks/bench_batched_inference.py --model yolov8n.pt --video fish.mp4 [--frames 256] [--batch-sizes 1 4 8 16]
+"""
+
+import os
+import sys
+import time
+import argparse
+import cv2
+
+try:
+    from ultralytics import YOLO
+except ImportError:
+    YOLO = None
+
+def read_frames(video_path, count):
+    """The first `count` frames of the video (fewer if it is shorter)."""
+    cap, frames = cv2.VideoCapture(video_path), []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret: break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+def csv_rows(frame_idx, results):
+    """The box columns of the detections CSV for one frame's results."""
+    if results.boxes is None: return []
+    return [(frame_idx, int(cls), f"{float(conf):.4f}", *(f"{v:.4f}" for v in xyxy.tolist()))
+            for xyxy, conf, cls in zip(results.boxes.xyxy, results.boxes.conf, results.boxes.cls)]
+
+def run(model, frames, batch_size, confidence):
+    rows = []
+    start = time.perf_counter()
+    for first in range(0, len(frames), batch_size):
+        batch = frames[first:first + batch_size]
+        for offset, results in enumerate(model.predict(batch, conf=confidence, verbose=False)): rows.extend(csv_rows(first + offset, results))
+    return len(frames) / (time.perf_counter() - start), rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', required=True)
+    parser.add_argument('--video', required=True)
+    parser.add_argument('--frames', type=int, default=256)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--conf', type=float, default=0.4)
+    args = parser.parse_args()
+    if YOLO is None: sys.exit("This benchmark needs ultralytics: pip install ultralytics")
+
+    frames = read_frames(args.video, args.frames)
+    if not frames: sys.exit(f"Could not read frames from {args.video}")
+    model = YOLO(args.model)
+    model.predict(frames[:1], conf=args.conf, verbose=False)  # Warm-up: model fusing and lazy initialization.
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}, model {os.path.basename(args.model)}")
+
+    reference_fps, reference_rows = None, None
+    for batch_size in sorted(set(args.batch_sizes) | {1}):
+        fps, rows = run(model, frames, batch_size, args.conf)
+        if reference_rows is None: reference_fps, reference_rows = fps, rows
+        identical = "identical" if rows == reference_rows else f"{sum(a != b for a, b in zip(rows, reference_rows)) + abs(len(rows) - len(reference_rows))} rows differ"
+        print(f"batch {batch_size:3d}: {fps:7.1f} frames/s ({fps / reference_fps:.2f}x), {len(rows):,} detections, {identical}")
+
+if __name__ == "__main__":
+    main()
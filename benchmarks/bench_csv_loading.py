@@ -0,0 +1,73 @@
+# EthoGrid_App/benchmarks/bench_csv_loading.py
+"""
+Compares the row-by-row csv module parser, the pandas C parser and the binary sidecar cache
+on a synthetic detection CSV.
+
+Usage: python benchmarks/bench_csv_loading.py [--rows 3000000] [--polygons]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.detection_table import DetectionTable
+from core.detection_loader import load_detection_file, LoadStats, PANDAS_AVAILABLE
+
+def write_synthetic_csv(path, num_rows, with_polygons, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = np.sort(rng.integers(0, max(1, num_rows // 10), num_rows))
+    x1 = rng.uniform(0, 3800, num_rows); y1 = rng.uniform(0, 2100, num_rows)
+    x2 = x1 + rng.uniform(10, 60, num_rows); y2 = y1 + rng.uniform(10, 60, num_rows)
+    conf = rng.uniform(0.25, 1.0, num_rows); behaviors = np.array(['swimming', 'resting', 'turning', 'feeding'])[rng.integers(0, 4, num_rows)]
+    header = "frame_idx,class_name,conf,x1,y1,x2,y2,cx,cy" + (",polygon" if with_polygons else "") + "\n"
+    with open(path, 'w', newline='') as f:
+        f.write(header)
+        step = 200_000
+        for start in range(0, num_rows, step):
+            end = min(num_rows, start + step); lines = []
+            for i in range(start, end):
+                line = f"{frames[i]},{behaviors[i]},{conf[i]:.4f},{x1[i]:.4f},{y1[i]:.4f},{x2[i]:.4f},{y2[i]:.4f},{(x1[i] + x2[i]) / 2:.4f},{(y1[i] + y2[i]) / 2:.4f}"
+                if with_polygons:
+                    px, py = int(x1[i]), int(y1[i]); line += f',"{px},{py};{px + 20},{py};{px + 20},{py + 15};{px},{py + 15}"'
+                lines.append(line)
+            f.write("\n".join(lines) + "\n")
+
+def time_csv_module(path):
+    start = time.perf_counter(); table = DetectionTable.from_csv(path)
+    return table, LoadStats(len(table), time.perf_counter() - start, "csv module")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=3_000_000)
+    parser.add_argument('--polygons', action='store_true', help="Add a polygon column like _segmentations.csv files have.")
+    args = parser.parse_args()
+    if not PANDAS_AVAILABLE: sys.exit("pandas is not installed; only the csv module path is available.")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "synthetic_detections.csv")
+        print(f"Writing {args.rows:,} synthetic rows...")
+        write_synthetic_csv(path, args.rows, args.polygons)
+        print(f"File size: {os.path.getsize(path) / 1e6:.1f} MB")
+
+        baseline_table, baseline = time_csv_module(path)
+        print("csv module:      " + baseline.summary())
+        fast_table, fast = load_detection_file(path, use_cache=False)
+        print("fast loader:     " + fast.summary())
+        print(f"Speedup: {baseline.seconds / fast.seconds:.1f}x")
+        load_detection_file(path)  # Builds the sidecar cache.
+        cached_table, cached = load_detection_file(path)
+        print("binary cache:    " + cached.summary())
+        print(f"Speedup over csv module: {baseline.seconds / cached.seconds:.1f}x")
+
+        for table in (fast_table, cached_table):
+            for name in ('frame_idx', 'conf', 'x1', 'y1', 'x2', 'y2', 'cx', 'cy'):
+                assert np.array_equal(getattr(baseline_table, name), getattr(table, name), equal_nan=True), name
+            assert list(baseline_table.class_name_array()) == list(table.class_name_array())
+        print("All loaders produced identical tables.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# EthoGrid_App/benchmarks/bench_mmap_loading.py
+"""
+Compares the peak resident memory of an in-memory and a memory-mapped detection load (followed by
+tank assignment and random frame lookups) on a synthetic detection CSV. Every mode runs in its own
+process so the peak RSS numbers do not leak into each other.
+
+Usage: python benchmarks/bench_mmap_loading.py [--rows 5000000] [--polygons]
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.detection_loader import load_detection_file, peak_rss_bytes
+from core.tank_assignment import assign_tanks, NO_TANK
+from bench_csv_loading import write_synthetic_csv
+
+def run_child(path, mode):
+    table, stats = load_detection_file(path, memory_map=(mode == "memory-mapped"), use_cache=(mode != "in memory"))
+    tank_numbers = table.allocate_column(np.int16)
+    identity = np.eye(3)
+    for rows in table.row_chunks(1_000_000):
+        cx = (table.x1[rows] + table.x2[rows]) / 2.0; cy = (table.y1[rows] + table.y2[rows]) / 2.0
+        tank_numbers[rows] = assign_tanks(cx, cy, identity, (3840, 2160), 4, 3)
+    rng = np.random.default_rng(1)
+    lookups = sum(len(table.frame_records(int(f), 'class_name', 'x1', 'y1')) for f in rng.integers(0, int(table.frame_idx[-1]) + 1, 1000))
+    assigned = int(np.count_nonzero(np.asarray(tank_numbers) != NO_TANK))
+    print(f"{mode:>14}: {stats.summary()}; {assigned:,} rows assigned, {lookups:,} rows looked up, final peak RSS {peak_rss_bytes() / (1024 * 1024):,.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--polygons', action='store_true', help="Add a polygon column like _segmentations.csv files have.")
+    parser.add_argument('--child', nargs=2, metavar=('PATH', 'MODE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child: run_child(*args.child); return
+    if peak_rss_bytes() is None: sys.exit("Peak RSS cannot be measured on this platform.")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "synthetic_detections.csv")
+        print(f"Writing {args.rows:,} synthetic rows...")
+        write_synthetic_csv(path, args.rows, args.polygons)
+        print(f"File size: {os.path.getsize(path) / 1e6:.1f} MB")
+        # The first memory-mapped run streams the CSV into the cache, the second one only maps it.
+        for mode in ("in memory", "memory-mapped", "memory-mapped"):
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--child', path, mode], check=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# EthoGrid_App/benchmarks/bench_model_runtime.py
+"""
+Measures YOLO inference throughput on the CPU with the PyTorch model and with its exported runtimes
+(ONNX Runtime, ONNX Runtime with INT8 weights, OpenVINO), and compares each runtime's detections with
+PyTorch's: boxes are matched per frame by class and IoU, and the share of matched boxes, their mean IoU
+and the largest confidence difference are reported. Exported runtimes do not reproduce PyTorch's
+floating-point results bit for bit, so a few boxes near the confidence threshold may differ.
+
+Requires ultralytics (plus onnx/onnxruntime or openvino for the runtimes) and a model file; detection and
+segmentation models both work. Exports are cached like the inference workers' (see core/model_runtime.py).
+
+Usage: python benchmarks/bench_model_runtime.py --model yolov8n.pt --video fish.mp4 [--frames 256] [--batch-size 8] [--runtimes onnx onnx-int8 openvino]
+"""
+
+import os
+import sys
+import time
+import argparse
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.model_runtime import RUNTIMES, DEFAULT_RUNTIME, load_model
+
+try:
+    import ultralytics
+except ImportError:
+    ultralytics = None
+
+def read_frames(video_path, count):
+    """The first `count` frames of the video (fewer if it is shorter)."""
+    cap, frames = cv2.VideoCapture(video_path), []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret: break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+def frame_boxes(results):
+    """(k, 6) rows of x1, y1, x2, y2, conf, class id of one frame's results."""
+    if results.boxes is None or len(results.boxes) == 0: return np.empty((0, 6))
+    return np.column_stack([results.boxes.xyxy.cpu().numpy(), results.boxes.conf.cpu().numpy(), results.boxes.cls.cpu().numpy()])
+
+def run(model, frames, batch_size, confidence):
+    boxes = []
+    start = time.perf_counter()
+    for first in range(0, len(frames), batch_size):
+        boxes.extend(frame_boxes(results) for results in model.predict(frames[first:first + batch_size], conf=confidence, verbose=False, device='cpu'))
+    return len(frames) / (time.perf_counter() - start), boxes
+
+def iou_matrix(a, b):
+    x1, y1 = np.maximum(a[:, None, 0], b[None, :, 0]), np.maximum(a[:, None, 1], b[None, :, 1])
+    x2, y2 = np.minimum(a[:, None, 2], b[None, :, 2]), np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = lambda boxes: (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / np.maximum(area(a)[:, None] + area(b)[None, :] - intersection, 1e-9)
+
+def parity(reference, candidate, min_iou=0.5):
+    """(matched share of all boxes of both runs, mean IoU of the matches, largest confidence difference of the matches)."""
+    matched, total, ious, conf_diff = 0, 0, [], 0.0
+    for expected, found in zip(reference, candidate):
+        total += len(expected) + len(found)
+        if not len(expected) or not len(found): continue
+        iou = iou_matrix(expected, found) * (expected[:, None, 5] == found[None, :, 5])
+        # Greedy matching by IoU; the boxes of one frame rarely compete for the same partner.
+        for i, j in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):
+            if iou[i, j] < min_iou: break
+            if np.isnan(iou[i, j]): continue
+            matched += 2; ious.append(iou[i, j]); conf_diff = max(conf_diff, abs(expected[i, 4] - found[j, 4]))
+            iou[i, :] = np.nan; iou[:, j] = np.nan
+    return (matched / total if total else 1.0), (float(np.mean(ious)) if ious else 1.0), conf_diff
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', required=True)
+    parser.add_argument('--video', required=True)
+    parser.add_argument('--frames', type=int, default=256)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--runtimes', nargs='+', choices=[name for name in RUNTIMES if name != DEFAULT_RUNTIME], default=['onnx', 'onnx-int8', 'openvino'])
+    parser.add_argument('--conf', type=float, default=0.4)
+    args = parser.parse_args()
+    if ultralytics is None: sys.exit("This benchmark needs ultralytics: pip install ultralytics")
+
+    frames = read_frames(args.video, args.frames)
+    if not frames: sys.exit(f"Could not read frames from {args.video}")
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}, model {os.path.basename(args.model)}, batch {args.batch_size}, CPU")
+
+    reference_fps, reference_boxes = None, None
+    for runtime in [DEFAULT_RUNTIME] + args.runtimes:
+        try: model = load_model(args.model, runtime, log=print)
+        except Exception as e:
+            print(f"{RUNTIMES[runtime]:>27}: not available ({e})"); continue
+        model.predict(frames[:args.batch_size], conf=args.conf, verbose=False, device='cpu')  # Warm-up: fusing, session creation and compilation.
+        fps, boxes = run(model, frames, args.batch_size, args.conf)
+        if reference_boxes is None: reference_fps, reference_boxes = fps, boxes
+        matched, mean_iou, conf_diff = parity(reference_boxes, boxes)
+        print(f"{RUNTIMES[runtime]:>27}: {fps:7.1f} frames/s ({fps / reference_fps:.2f}x), {sum(map(len, boxes)):,} detections, "
+              f"{matched:.1%} matched (mean IoU {mean_iou:.3f}, max conf diff {conf_diff:.4f})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# EthoGrid_App/benchmarks/bench_polygon_storage.py
+"""
+Compares the two polygon formats of YoloSegmentationProcessor: the 'polygon' text column of the segmentations CSV
+and the compressed binary .polygons file next to it. Synthetic fish contours are written in both formats, and the
+file sizes, write times and load times (load_detection_file without the sidecar cache) are reported. Both loads
+are checked to return the same vertices.
+
+Usage: python benchmarks/bench_polygon_storage.py [--rows 200000] [--vertices 40]
+"""
+
+import os
+import sys
+import csv
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.detection_loader import load_detection_file
+from core.polygon_store import PolygonStoreWriter, polygon_store_path
+
+HEADER = ["frame_idx", "class_name", "conf", "x1", "y1", "x2", "y2", "cx", "cy"]
+
+def synthetic_contours(rng, rows, vertices):
+    """One elongated contour per row, as the integer vertices cv2.findContours returns."""
+    centers = rng.uniform((100, 100), (3740, 2060), size=(rows, 2))
+    lengths = rng.uniform(20, 60, size=rows)
+    t = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    return [np.rint(np.stack([np.cos(t) * length, np.sin(t) * length * 0.3], axis=1) + center).astype(np.int32) for center, length in zip(centers, lengths)]
+
+def write_files(directory, contours, binary):
+    csv_path = os.path.join(directory, "binary.csv" if binary else "text.csv")
+    store = PolygonStoreWriter(polygon_store_path(csv_path)) if binary else None
+    start = time.perf_counter()
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER + ([] if binary else ["polygon"]))
+        for i, points in enumerate(contours):
+            (x1, y1), (x2, y2) = points.min(axis=0), points.max(axis=0)
+            row = [i // 12, "fish", "0.9000", f"{x1:.4f}", f"{y1:.4f}", f"{x2:.4f}", f"{y2:.4f}", f"{(x1 + x2) / 2:.4f}", f"{(y1 + y2) / 2:.4f}"]
+            if binary: store.add(points)
+            else: row.append(";".join(f"{x},{y}" for x, y in points.tolist()))
+            writer.writerow(row)
+    if store is not None: store.flush(len(contours)); store.close()
+    seconds = time.perf_counter() - start
+    size = os.path.getsize(csv_path) + (os.path.getsize(polygon_store_path(csv_path)) if binary else 0)
+    return csv_path, seconds, size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--vertices', type=int, default=40)
+    args = parser.parse_args()
+
+    contours = synthetic_contours(np.random.default_rng(0), args.rows, args.vertices)
+    with tempfile.TemporaryDirectory() as directory:
+        results = {}
+        for name, binary in (("text column", False), ("binary file", True)):
+            csv_path, write_seconds, size = write_files(directory, contours, binary)
+            start = time.perf_counter()
+            table, _ = load_detection_file(csv_path, use_cache=False)
+            load_seconds = time.perf_counter() - start
+            results[name] = table.polygons
+            print(f"{name:>11}: {size / 2**20:8.1f} MB, written in {write_seconds:6.2f} s, loaded in {load_seconds:6.2f} s")
+        text, binary = results["text column"], results["binary file"]
+        assert np.array_equal(text.offsets, binary.offsets) and np.array_equal(text.vertices, binary.vertices), "The formats loaded different polygons."
+    print("Both formats loaded identical polygons.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# EthoGrid_App/benchmarks/bench_tank_assignment.py
+"""
+Compares analytic tank assignment with the cell-label raster lookup on synthetic fish trajectories,
+and checks that both paths assign every point to the same tank.
+
+Usage: python benchmarks/bench_tank_assignment.py [--points 5000000] [--width 3840 --height 2160]
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.grid_manager import transform_from_settings
+from core.tank_assignment import CellLabelMap, assign_tanks, inverse_matrix_for, BORDER
+
+def best_of(runs, func, *args, **kwargs):
+    best, result = float('inf'), None
+    for _ in range(runs):
+        start = time.perf_counter(); result = func(*args, **kwargs); best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=5_000_000)
+    parser.add_argument('--width', type=int, default=3840)
+    parser.add_argument('--height', type=int, default=2160)
+    args = parser.parse_args()
+
+    video_size, cols, rows = (args.width, args.height), 6, 4
+    transform = transform_from_settings({'center_x': 0.5, 'center_y': 0.5, 'angle': -12.0, 'scale_x': 1.1, 'scale_y': 1.05}, video_size)
+    inverse_matrix = inverse_matrix_for(transform)
+    rng = np.random.default_rng(0)
+    fish = 24
+    walk = rng.normal(0, 3, (args.points // fish, fish, 2)).cumsum(axis=0) + rng.uniform(0, video_size, (fish, 2))
+    xs = np.clip(walk[..., 0].ravel(), 0, args.width - 1); ys = np.clip(walk[..., 1].ravel(), 0, args.height - 1)
+
+    label_map = CellLabelMap(inverse_matrix, video_size, cols, rows)
+    build_seconds, labels = best_of(1, lambda: label_map.labels)
+    analytic_seconds, analytic = best_of(3, assign_tanks, xs, ys, inverse_matrix, video_size, cols, rows)
+    raster_seconds, raster = best_of(3, assign_tanks, xs, ys, inverse_matrix, video_size, cols, rows, label_map)
+    print(f"{len(xs):,} points, {args.width}x{args.height} video, {np.mean(labels == BORDER):.2%} border pixels")
+    print(f"Label map build: {build_seconds:.3f} s")
+    print(f"Analytic:        {analytic_seconds:.3f} s ({len(xs) / analytic_seconds:,.0f} points/s)")
+    print(f"Raster lookup:   {raster_seconds:.3f} s ({len(xs) / raster_seconds:,.0f} points/s)")
+    assert np.array_equal(analytic, raster), "Raster and analytic assignment differ."
+    print("Both paths assigned every point to the same tank.")
+
+if __name__ == "__main__":
+    main()
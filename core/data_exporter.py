@@ -2,10 +2,10 @@
 
 import os
 import traceback
-from collections import defaultdict
 import cv2
 import numpy as np
-from PyQt5.QtCore import QPointF
+
+from core.tank_assignment import inverse_matrix_for, map_points, NO_TANK
 
 try:
     import pandas as pd
@@ -16,6 +16,9 @@ except ImportError:
 def export_trajectory_image(processed_detections, grid_settings, video_size, grid_transform, output_path, time_gap_seconds, video_fps):
     if video_fps <= 0:
         return "Cannot generate trajectories, video FPS is zero or invalid."
+    inverse_matrix = inverse_matrix_for(grid_transform)
+    if inverse_matrix is None:
+        return "Cannot generate trajectories, the grid transform is not invertible."
     try:
         video_w, video_h = video_size
         cols, rows = grid_settings['cols'], grid_settings['rows']
@@ -33,36 +36,24 @@ def export_trajectory_image(processed_detections, grid_settings, video_size, gri
                 cv2.rectangle(untransformed_layer, (x1, y1), (x2, y2), (0, 0, 0), 2)
                 tank_num = r * cols + c + 1
                 cv2.putText(untransformed_layer, f"Tank {tank_num}", (x1 + 15, y1 + 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
-        tank_points = defaultdict(list)
-        all_dets = [det for frame_dets in processed_detections.values() for det in frame_dets]
-        inverse_transform, _ = grid_transform.inverted()
-        for det in all_dets:
-            tank_num, cx, cy = det.get('tank_number'), det.get('cx'), det.get('cy')
-            if tank_num is not None and cx is not None and cy is not None:
-                p = inverse_transform.map(QPointF(float(cx), float(cy)))
-                scaled_x = draw_area_x1 + (p.x() / video_w) * draw_area_w
-                scaled_y = draw_area_y1 + (p.y() / video_h) * draw_area_h
-                tank_points[int(tank_num)].append({'frame_idx': int(det['frame_idx']), 'point': (scaled_x, scaled_y)})
-        if tank_points:
+        table = processed_detections
+        has_point = (table.tank_number != NO_TANK) & ~np.isnan(table.cx) & ~np.isnan(table.cy)
+        tank_nums, frames = table.tank_number[has_point].astype(np.int64), table.frame_idx[has_point].astype(np.int64)
+        tx, ty = map_points(table.cx[has_point], table.cy[has_point], inverse_matrix)
+        scaled_points = np.column_stack((draw_area_x1 + (tx / video_w) * draw_area_w, draw_area_y1 + (ty / video_h) * draw_area_h))
+        if len(tank_nums):
+            # Colors are drawn in order of each tank's first appearance, as before.
+            unique_tanks, first_rows = np.unique(tank_nums, return_index=True)
             np.random.seed(42)
-            colors = {tank_num: tuple(np.random.randint(0, 200, 3).tolist()) for tank_num in tank_points.keys()}
+            colors = {int(tank_num): tuple(np.random.randint(0, 200, 3).tolist()) for tank_num in unique_tanks[np.argsort(first_rows)]}
             frame_gap_threshold = int(time_gap_seconds * video_fps)
-            for tank_num, detections in sorted(tank_points.items()):
-                detections.sort(key=lambda d: d['frame_idx'])
-                if not detections: continue
-                current_segment = [detections[0]['point']]
-                for i in range(1, len(detections)):
-                    prev_det, curr_det = detections[i-1], detections[i]
-                    if (curr_det['frame_idx'] - prev_det['frame_idx']) > frame_gap_threshold:
-                        if len(current_segment) > 1:
-                            pts = np.array(current_segment, np.int32).reshape((-1, 1, 2))
-                            cv2.polylines(untransformed_layer, [pts], isClosed=False, color=colors[tank_num], thickness=2)
-                        current_segment = [curr_det['point']]
-                    else:
-                        current_segment.append(curr_det['point'])
-                if len(current_segment) > 1:
-                    pts = np.array(current_segment, np.int32).reshape((-1, 1, 2))
-                    cv2.polylines(untransformed_layer, [pts], isClosed=False, color=colors[tank_num], thickness=2)
+            for tank_num in sorted(colors):
+                tank_rows = np.flatnonzero(tank_nums == tank_num)  # Rows are already in frame order.
+                breaks = np.flatnonzero(np.diff(frames[tank_rows]) > frame_gap_threshold) + 1
+                for segment_rows in np.split(tank_rows, breaks):
+                    if len(segment_rows) > 1:
+                        pts = scaled_points[segment_rows].astype(np.int32).reshape((-1, 1, 2))
+                        cv2.polylines(untransformed_layer, [pts], isClosed=False, color=colors[tank_num], thickness=2)
         M = np.float32([[grid_transform.m11(), grid_transform.m12(), grid_transform.dx()], [grid_transform.m21(), grid_transform.m22(), grid_transform.dy()]])
         final_image = cv2.warpAffine(untransformed_layer, M, (video_w, video_h), borderValue=(255, 255, 255))
         cv2.imwrite(output_path, final_image)
@@ -73,39 +64,26 @@ def export_trajectory_image(processed_detections, grid_settings, video_size, gri
 def export_centroid_csv(processed_detections, total_tanks, output_path):
     if not PANDAS_AVAILABLE: return "The 'pandas' library is required. Please run: pip install pandas"
     try:
-        frame_data = defaultdict(dict)
-        all_dets = [det for frame_dets in processed_detections.values() for det in frame_dets]
-        for det in all_dets:
-            if det.get('tank_number') is not None:
-                frame, tank = int(det['frame_idx']), int(det['tank_number'])
-                cx, cy = det.get('cx', ''), det.get('cy', '')
-                adjusted_tank = tank - 1
-                if 0 <= adjusted_tank < total_tanks:
-                    frame_data[frame][adjusted_tank] = (cx, cy)
-        
-        int_frame_data = {int(k): v for k, v in frame_data.items()}
-        all_frames = sorted(int_frame_data.keys())
-        if not all_frames: return "No valid detections with tank numbers found to export."
-        
-        output_rows = []
-        for frame_idx in range(all_frames[0], all_frames[-1] + 1):
-            row_dict = {'position': frame_idx}
-            for tank_idx in range(total_tanks):
-                # ### THE FIX IS HERE ###
-                # Use .get() for safe dictionary access to prevent errors
-                tank_coords = int_frame_data.get(frame_idx, {}).get(tank_idx)
-                
-                if tank_coords:
-                    cx, cy = tank_coords
-                    cx_str = f"{cx:.4f}" if isinstance(cx, float) else cx
-                    cy_str = f"{cy:.4f}" if isinstance(cy, float) else cy
-                else:
-                    cx_str, cy_str = '', ''
-                row_dict[f'x{tank_idx}'] = cx_str
-                row_dict[f'y{tank_idx}'] = cy_str
-            output_rows.append(row_dict)
+        table = processed_detections
+        valid = (table.tank_number >= 1) & (table.tank_number <= total_tanks)
+        frames, tank_idx = table.frame_idx[valid].astype(np.int64), table.tank_number[valid].astype(np.int64) - 1
+        cxs, cys = table.cx[valid], table.cy[valid]
+        if len(frames) == 0: return "No valid detections with tank numbers found to export."
+
+        first_frame, last_frame = int(frames.min()), int(frames.max())
+        # When a tank has several detections in one frame, the last one wins.
+        keys = (frames - first_frame) * total_tanks + tank_idx
+        last_rows = len(keys) - 1 - np.unique(keys[::-1], return_index=True)[1]
+        grid_x = np.full((last_frame - first_frame + 1, total_tanks), np.nan); grid_y = grid_x.copy()
+        grid_x[frames[last_rows] - first_frame, tank_idx[last_rows]] = cxs[last_rows]
+        grid_y[frames[last_rows] - first_frame, tank_idx[last_rows]] = cys[last_rows]
+
+        output_columns = {'position': np.arange(first_frame, last_frame + 1)}
+        for tank in range(total_tanks):
+            output_columns[f'x{tank}'] = [f"{v:.4f}" if v == v else '' for v in grid_x[:, tank].tolist()]
+            output_columns[f'y{tank}'] = [f"{v:.4f}" if v == v else '' for v in grid_y[:, tank].tolist()]
 
-        output_df = pd.DataFrame(output_rows)
+        output_df = pd.DataFrame(output_columns)
         output_df.to_csv(output_path, index=False)
         return None
     except Exception as e:
@@ -115,23 +93,16 @@ def export_centroid_csv(processed_detections, total_tanks, output_path):
 def export_to_excel_sheets(processed_detections, output_path):
     if not PANDAS_AVAILABLE: return "The 'pandas' and 'openpyxl' libraries are required. Please run: pip install pandas openpyxl"
     try:
-        tank_data = defaultdict(list)
-        all_dets = [det for frame_dets in processed_detections.values() for det in frame_dets]
-        for det in all_dets:
-            tank_num = det.get('tank_number')
-            if tank_num is not None:
-                tank_data[int(tank_num)].append(det)
-        if not tank_data:
+        table = processed_detections
+        tank_numbers = sorted(int(t) for t in np.unique(table.tank_number) if t != NO_TANK)
+        if not tank_numbers:
             return "No detections with tank numbers found to export."
+        headers = table.csv_headers + [col for col in ['cx', 'cy'] if col not in table.csv_headers]
         with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            for tank_num in sorted(tank_data.keys()):
+            for tank_num in tank_numbers:
                 sheet_name = f'Tank_{tank_num}'
-                tank_df = pd.DataFrame(tank_data[tank_num])
-                for col in ['x1', 'y1', 'x2', 'y2', 'cx', 'cy', 'conf']:
-                    if col in tank_df.columns:
-                        tank_df[col] = pd.to_numeric(tank_df[col], errors='coerce').map(lambda x: f'{x:.4f}' if pd.notnull(x) else '')
-                if 'tank_number' in tank_df.columns:
-                    tank_df = tank_df.drop(columns=['tank_number'])
+                rows = np.flatnonzero(table.tank_number == tank_num)
+                tank_df = pd.DataFrame({col: table.formatted_column(col, rows) for col in headers if col != 'tank_number'})
                 tank_df.to_excel(writer, sheet_name=sheet_name, index=False)
         return None
     except Exception as e:
@@ -0,0 +1,199 @@
+# EthoGrid_App/core/detection_cache.py
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+
+from core.detection_table import DetectionTable
+
+CACHE_VERSION = 2
+CACHE_SUFFIX = ".cache"
+COLUMN_DTYPES = {'frame_idx': np.int32, 'class_id': np.int16, 'conf': np.float64, 'x1': np.float64, 'y1': np.float64,
+                 'x2': np.float64, 'y2': np.float64, 'cx': np.float64, 'cy': np.float64, 'tank_number': np.int16}
+NPY_HEADER_SIZE = 128  # Fixed so the row count can be patched in after streaming; keeps the data 64-byte aligned.
+
+def cache_dir_for(csv_path):
+    """The sidecar directory holding the binary columns of `csv_path`."""
+    return csv_path + CACHE_SUFFIX
+
+def file_content_hash(path, block_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class EncodedStrings:
+    """
+    A read-only string column stored as one UTF-8 byte buffer plus row offsets.
+    Strings are only decoded for the rows that are indexed, so memory-mapped buffers stay on disk.
+    """
+    def __init__(self, buffer, offsets):
+        self.buffer = buffer
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _decode(self, i):
+        return bytes(self.buffer[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def __getitem__(self, rows):
+        if isinstance(rows, slice):
+            start, stop, step = rows.indices(len(self))
+            if step == 1:
+                bounds = self.offsets[start:stop + 1].tolist()
+                raw = bytes(self.buffer[bounds[0]:bounds[-1]]) if bounds else b''
+                base = bounds[0] if bounds else 0
+                return np.array([raw[bounds[i] - base:bounds[i + 1] - base].decode('utf-8') for i in range(len(bounds) - 1)], dtype=object)
+            rows = range(start, stop, step)
+        elif np.isscalar(rows):
+            return self._decode(int(rows))
+        return np.array([self._decode(i) for i in np.asarray(rows).tolist()], dtype=object)
+
+    def __iter__(self):
+        for rows in (slice(i, i + 65536) for i in range(0, len(self), 65536)):
+            yield from self[rows]
+
+def encode_strings(values):
+    encoded = [str(v).encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+def _npy_header(dtype, length):
+    """A version 1.0 .npy header for a 1-D array, space-padded to NPY_HEADER_SIZE bytes."""
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (np.lib.format.dtype_to_descr(np.dtype(dtype)), length)
+    header = header.ljust(NPY_HEADER_SIZE - 10 - 1) + "\n"
+    return b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, 'little') + header.encode('latin1')
+
+class _StreamingNpyFile:
+    """Appends raw values to a .npy file whose header is rewritten with the final length on close."""
+    def __init__(self, path, dtype):
+        self.dtype, self.length = np.dtype(dtype), 0
+        self._file = open(path, 'wb'); self._file.write(_npy_header(self.dtype, 0))
+
+    def append(self, values):
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        self._file.write(values.tobytes()); self.length += len(values)
+
+    def close(self):
+        if self._file.closed: return
+        self._file.seek(0); self._file.write(_npy_header(self.dtype, self.length)); self._file.close()
+
+class CacheWriter:
+    """
+    Streams column chunks of an already frame-sorted table into a new sidecar cache, so a table can be
+    cached while it is being parsed without ever holding all of it in memory.
+    """
+    def __init__(self, csv_path, extra_names):
+        self.csv_path, self.cache_dir = csv_path, cache_dir_for(csv_path)
+        self.extra_names = list(extra_names)
+        self.source_stat = os.stat(csv_path)
+        if os.path.isdir(self.cache_dir): shutil.rmtree(self.cache_dir)
+        os.makedirs(self.cache_dir)
+        self._columns = {name: _StreamingNpyFile(os.path.join(self.cache_dir, f"{name}.npy"), dtype) for name, dtype in COLUMN_DTYPES.items()}
+        self._extra = [(_StreamingNpyFile(os.path.join(self.cache_dir, f"extra{i}.npy"), np.uint8),
+                        _StreamingNpyFile(os.path.join(self.cache_dir, f"extra{i}_offsets.npy"), np.int64)) for i in range(len(self.extra_names))]
+        for _, offsets_file in self._extra: offsets_file.append([0])
+        self._extra_bytes = [0] * len(self.extra_names)
+        self.last_frame = None
+
+    @property
+    def rows(self):
+        return self._columns['frame_idx'].length
+
+    def append(self, columns, extra):
+        """
+        Appends one chunk. `columns` maps COLUMN_DTYPES names to arrays, `extra` maps extra names to string sequences.
+        Returns False without writing anything if the chunk would break the frame ordering.
+        """
+        frames = np.asarray(columns['frame_idx'])
+        if len(frames) and ((self.last_frame is not None and frames[0] < self.last_frame) or np.any(np.diff(frames) < 0)):
+            return False
+        if len(frames): self.last_frame = int(frames[-1])
+        for name, column in self._columns.items(): column.append(columns[name])
+        for i, name in enumerate(self.extra_names):
+            buffer, offsets = encode_strings(extra[name])
+            self._extra[i][0].append(buffer); self._extra[i][1].append(offsets[1:] + self._extra_bytes[i])
+            self._extra_bytes[i] += int(offsets[-1])
+        return True
+
+    def finish(self, class_names, csv_headers):
+        for column in self._columns.values(): column.close()
+        for buffer_file, offsets_file in self._extra: buffer_file.close(); offsets_file.close()
+        frame_idx = np.load(os.path.join(self.cache_dir, "frame_idx.npy"), mmap_mode='r') if self.rows else np.empty(0, dtype=np.int32)
+        first_frame = min(int(frame_idx[0]), 0) if self.rows else 0
+        frame_offsets = np.searchsorted(frame_idx, np.arange(first_frame, int(frame_idx[-1]) + 2)).astype(np.int64) if self.rows else np.zeros(1, dtype=np.int64)
+        np.save(os.path.join(self.cache_dir, "frame_offsets.npy"), frame_offsets)
+        del frame_idx
+        # meta.json is written last, so a partially written cache is never considered valid.
+        _write_meta(self.cache_dir, {'version': CACHE_VERSION, 'source_size': self.source_stat.st_size, 'source_mtime_ns': self.source_stat.st_mtime_ns,
+                                     'source_hash': file_content_hash(self.csv_path), 'rows': self.rows, 'first_frame': first_frame,
+                                     'class_names': list(class_names), 'csv_headers': list(csv_headers), 'extra_columns': self.extra_names})
+
+    def abort(self):
+        for column in self._columns.values(): column.close()
+        for buffer_file, offsets_file in self._extra: buffer_file.close(); offsets_file.close()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+def _read_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, "meta.json"), 'r') as f: return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_meta(cache_dir, meta):
+    tmp_path = os.path.join(cache_dir, "meta.json.tmp")
+    with open(tmp_path, 'w') as f: json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(cache_dir, "meta.json"))
+
+def is_cache_valid(csv_path, meta):
+    """
+    A cache is valid when the CSV still has the size and mtime it had when the cache was built.
+    If only the mtime changed (file copied or touched), the content hash decides, and a match re-stamps the cache.
+    """
+    if meta is None or meta.get('version') != CACHE_VERSION: return False
+    stat = os.stat(csv_path)
+    if stat.st_size != meta['source_size']: return False
+    if stat.st_mtime_ns == meta['source_mtime_ns']: return True
+    if file_content_hash(csv_path) != meta['source_hash']: return False
+    meta['source_mtime_ns'] = stat.st_mtime_ns
+    try: _write_meta(cache_dir_for(csv_path), meta)
+    except OSError: pass
+    return True
+
+def load_cached_table(csv_path, memory_map=False):
+    """
+    Returns the cached DetectionTable for `csv_path`, or None if there is no valid cache.
+    With `memory_map=True` the columns stay on disk as read-only np.memmap arrays.
+    """
+    cache_dir = cache_dir_for(csv_path)
+    meta = _read_meta(cache_dir)
+    mmap_mode = 'r' if memory_map and meta and meta.get('rows') else None
+    load = lambda name: np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+    try:
+        if not is_cache_valid(csv_path, meta): return None
+        columns = {name: load(name) for name in COLUMN_DTYPES}
+        extra = {name: EncodedStrings(load(f"extra{i}"), load(f"extra{i}_offsets")) for i, name in enumerate(meta['extra_columns'])}
+        frame_offsets = load("frame_offsets")
+    except (OSError, ValueError, KeyError):
+        return None
+    return DetectionTable(columns['frame_idx'], columns['class_id'], meta['class_names'], columns['conf'],
+                          columns['x1'], columns['y1'], columns['x2'], columns['y2'], columns['cx'], columns['cy'], columns['tank_number'],
+                          extra=extra, csv_headers=meta['csv_headers'], frame_offsets=frame_offsets, first_frame=meta['first_frame'],
+                          memory_mapped=mmap_mode is not None)
+
+def save_table_cache(csv_path, table):
+    """Writes an in-memory `table` as the binary sidecar of `csv_path`. Returns False if the cache could not be written."""
+    writer = None
+    try:
+        writer = CacheWriter(csv_path, table.extra)
+        writer.append({name: getattr(table, name) for name in COLUMN_DTYPES}, table.extra)
+        writer.finish(table.class_names, table.csv_headers)
+        return True
+    except OSError:
+        if writer: writer.abort()
+        return False
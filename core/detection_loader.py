@@ -0,0 +1,173 @@
+# EthoGrid_App/core/detection_loader.py
+
+import sys
+import time
+import numpy as np
+
+from core.detection_cache import CacheWriter, load_cached_table, save_table_cache
+from core.detection_table import DetectionTable, CORE_COLUMNS, COORD_COLUMNS
+from core.polygons import parse_polygon_column
+from core.polygon_store import polygon_store_path, read_polygon_store
+from core.tank_assignment import NO_TANK
+
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+REQUIRED_COLUMNS = ('frame_idx', 'class_name', 'x1', 'y1', 'x2', 'y2')
+DEFAULT_CHUNK_ROWS = 500_000
+
+class LoadStats:
+    """Timing and memory information about one detection file load."""
+    def __init__(self, rows, seconds, engine, peak_rss=None):
+        self.rows = rows
+        self.seconds = seconds
+        self.engine = engine
+        self.peak_rss = peak_rss
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def summary(self):
+        text = f"Loaded {self.rows:,} rows in {self.seconds:.2f} s ({self.rows_per_second:,.0f} rows/s, {self.engine})"
+        if self.peak_rss is not None: text += f", peak RSS {self.peak_rss / (1024 * 1024):,.0f} MB"
+        return text
+
+def peak_rss_bytes():
+    """Peak resident set size of this process in bytes, or None if the platform cannot report it."""
+    try:
+        # VmHWM is reset by exec, unlike ru_maxrss which Linux carries over from the parent process.
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'): return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024  # Other Unixes report kilobytes.
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return getattr(psutil.Process().memory_info(), 'peak_wset', None)
+    except ImportError:
+        return None
+
+def _pandas_chunks(file_path, headers, chunk_rows, class_ids):
+    """
+    Parses the CSV `chunk_rows` rows at a time and yields (columns, extra) per chunk, with columns typed the way
+    DetectionTable stores them. `class_ids` is filled with class names in first-appearance order.
+    """
+    float_names = [name for name in ('frame_idx', 'conf', 'tank_number') + COORD_COLUMNS if name in headers]
+    extra_names = [name for name in headers if name not in CORE_COLUMNS]
+    dtypes = {name: np.float64 for name in float_names}
+    dtypes['class_name'] = 'category'
+    dtypes.update({name: str for name in extra_names})
+
+    reader = pd.read_csv(file_path, engine='c', encoding='utf-8', dtype=dtypes, chunksize=chunk_rows,
+                         keep_default_na=False, na_values={name: [''] for name in float_names})
+    for chunk in reader:
+        n = len(chunk)
+        column = lambda name: chunk[name].to_numpy(dtype=np.float64) if name in float_names else np.full(n, np.nan)
+        # Category codes are local to each chunk, so remap them onto one table-wide id space.
+        categories = chunk['class_name'].cat.categories
+        remap = np.array([class_ids.setdefault(str(name), len(class_ids)) for name in categories] + [-1], dtype=np.int16)
+        tank_number = column('tank_number')
+        columns = {name: column(name) for name in ('conf',) + COORD_COLUMNS}
+        columns['frame_idx'] = column('frame_idx').astype(np.int32)
+        columns['class_id'] = remap[chunk['class_name'].cat.codes.to_numpy()]
+        columns['tank_number'] = np.where(np.isnan(tank_number), NO_TANK, tank_number).astype(np.int16)
+        yield columns, {name: chunk[name].to_numpy(dtype=object) for name in extra_names}
+
+def _read_with_pandas(file_path, headers, chunk_rows, progress_callback):
+    class_ids, parts, extra_parts, rows_read = {}, [], [], 0
+    for columns, extra in _pandas_chunks(file_path, headers, chunk_rows, class_ids):
+        parts.append(columns); extra_parts.append(extra)
+        rows_read += len(columns['frame_idx'])
+        if progress_callback: progress_callback(rows_read)
+    if not parts: return DetectionTable([], [], [], [], [], [], [], [], extra={name: np.empty(0, dtype=object) for name in headers if name not in CORE_COLUMNS}, csv_headers=headers)
+    column = lambda name: np.concatenate([part[name] for part in parts])
+    return DetectionTable(column('frame_idx'), column('class_id'), list(class_ids), column('conf'),
+                          column('x1'), column('y1'), column('x2'), column('y2'), column('cx'), column('cy'), column('tank_number'),
+                          extra={name: np.concatenate([part[name] for part in extra_parts]) for name in extra_parts[0]}, csv_headers=headers)
+
+def _stream_into_cache(file_path, headers, chunk_rows, progress_callback):
+    """
+    Parses the CSV chunk by chunk straight into the sidecar cache, so at most one chunk is held in memory.
+    Returns False (leaving no cache behind) if the rows turn out not to be sorted by frame.
+    """
+    class_ids, rows_read = {}, 0
+    writer = CacheWriter(file_path, [name for name in headers if name not in CORE_COLUMNS])
+    try:
+        for columns, extra in _pandas_chunks(file_path, headers, chunk_rows, class_ids):
+            if not writer.append(columns, extra):
+                writer.abort(); return False
+            rows_read += len(columns['frame_idx'])
+            if progress_callback: progress_callback(rows_read)
+        writer.finish(list(class_ids), headers)
+        return True
+    except BaseException:
+        writer.abort()
+        raise
+
+def _stream_into_cache_if_writable(file_path, headers, chunk_rows, progress_callback):
+    try: return _stream_into_cache(file_path, headers, chunk_rows, progress_callback)
+    except OSError: return False  # The cache directory is not writable; the table is loaded into memory instead.
+
+def load_detection_file(file_path, chunk_rows=DEFAULT_CHUNK_ROWS, progress_callback=None, use_cache=True, memory_map=False):
+    """
+    Loads a detection CSV into a DetectionTable.
+
+    A valid binary sidecar cache (see core/detection_cache.py) is used when present. Otherwise the CSV is
+    parsed with pandas' C tokenizer and explicit dtypes, `chunk_rows` rows at a time, falling back to
+    `DetectionTable.from_csv` when pandas is missing or the file has values the typed parser rejects;
+    the parsed table is then cached for the next load.
+
+    With `memory_map=True` the returned table's columns are read-only memory maps of the cache, so resident
+    memory stays bounded by what is actually touched. Frame-sorted CSVs are streamed into the cache one chunk
+    at a time; unsorted ones have to be sorted in memory once before they can be mapped.
+
+    A 'polygon' column is parsed once here into `table.polygons`, so renderers never split polygon strings per frame.
+    Without one, the polygons are read from a binary polygon file next to the CSV (see core/polygon_store.py) if it
+    has a polygon for every row.
+
+    Returns:
+        (DetectionTable, LoadStats)
+    """
+    start = time.perf_counter()
+    def loaded(table, engine):
+        if 'polygon' in table.extra: table.polygons = parse_polygon_column(table.extra['polygon'], memory_mapped=table.memory_mapped)
+        else:
+            polygons = read_polygon_store(polygon_store_path(file_path), memory_mapped=table.memory_mapped)
+            if polygons is not None and len(polygons) == len(table): table.polygons = polygons
+        return table, LoadStats(len(table), time.perf_counter() - start, engine, peak_rss_bytes())
+    if use_cache or memory_map:
+        table = load_cached_table(file_path, memory_map=memory_map)
+        if table is not None: return loaded(table, "memory-mapped cache" if table.memory_mapped else "binary cache")
+    table, engine = None, "csv module"
+    if PANDAS_AVAILABLE:
+        try:
+            headers = list(pd.read_csv(file_path, nrows=0, encoding='utf-8').columns)
+        except pd.errors.EmptyDataError:
+            headers = None
+        if headers is not None:
+            for required in REQUIRED_COLUMNS:
+                if required not in headers: raise ValueError(f"Detection CSV is missing the '{required}' column.")
+            try:
+                if memory_map and _stream_into_cache_if_writable(file_path, headers, chunk_rows, progress_callback):
+                    table = load_cached_table(file_path, memory_map=True)
+                    if table is not None: return loaded(table, "pandas C parser, memory-mapped")
+                table, engine = _read_with_pandas(file_path, headers, chunk_rows, progress_callback), "pandas C parser"
+            except (ValueError, TypeError):
+                table = None  # Malformed numeric fields; the row-by-row parser turns them into NaN instead.
+    if table is None:
+        table = DetectionTable.from_csv(file_path)
+    if use_cache or memory_map:
+        if save_table_cache(file_path, table) and memory_map:
+            mapped = load_cached_table(file_path, memory_map=True)
+            if mapped is not None: table, engine = mapped, engine + ", memory-mapped"
+    return loaded(table, engine)
@@ -0,0 +1,196 @@
+# EthoGrid_App/core/detection_table.py
+
+import copy
+import csv
+import tempfile
+import numpy as np
+
+from core.tank_assignment import NO_TANK
+
+COORD_COLUMNS = ('x1', 'y1', 'x2', 'y2', 'cx', 'cy')
+CORE_COLUMNS = ('frame_idx', 'class_name', 'conf') + COORD_COLUMNS + ('tank_number',)
+
+def _parse_float(value):
+    try: return float(value) if value else np.nan
+    except (ValueError, TypeError): return np.nan
+
+class DetectionTable:
+    """
+    Columnar store for detections: one NumPy array per field instead of one dict per detection.
+    Rows are kept sorted by frame, so the detections of frame f are the contiguous slice
+    `frame_offsets[f - first_frame]:frame_offsets[f - first_frame + 1]` (first_frame is 0 unless frames are negative).
+    Missing coordinates are NaN and unassigned detections have tank_number == NO_TANK.
+    Columns that are not part of the detection schema (e.g. 'polygon') are kept as string arrays in `extra`.
+
+    The columns may be np.memmap views of a sidecar cache (`memory_mapped=True`); in that case a frame
+    lookup only touches the pages of that frame, and `allocate_column` hands out disk-backed scratch arrays.
+
+    `polygons` optionally holds the 'polygon' column parsed once into a PolygonBuffer (see core/polygons.py);
+    renderers read its vertices through `frame_records(..., 'polygon_points')`.
+    """
+    def __init__(self, frame_idx, class_id, class_names, conf, x1, y1, x2, y2, cx=None, cy=None, tank_number=None, extra=None, csv_headers=None,
+                 frame_offsets=None, first_frame=0, memory_mapped=False, polygons=None):
+        n = len(frame_idx)
+        self.frame_idx = np.asarray(frame_idx, dtype=np.int32)
+        self.class_id = np.asarray(class_id, dtype=np.int16)
+        self.class_names = list(class_names)
+        self.conf = np.asarray(conf, dtype=np.float64)
+        self.x1, self.y1 = np.asarray(x1, dtype=np.float64), np.asarray(y1, dtype=np.float64)
+        self.x2, self.y2 = np.asarray(x2, dtype=np.float64), np.asarray(y2, dtype=np.float64)
+        self.cx = np.full(n, np.nan) if cx is None else np.asarray(cx, dtype=np.float64)
+        self.cy = np.full(n, np.nan) if cy is None else np.asarray(cy, dtype=np.float64)
+        self.tank_number = np.full(n, NO_TANK, dtype=np.int16) if tank_number is None else np.asarray(tank_number, dtype=np.int16)
+        self.extra = dict(extra or {})
+        self.csv_headers = list(csv_headers) if csv_headers else list(CORE_COLUMNS[:-1])
+        self.memory_mapped = memory_mapped
+        self.polygons = polygons
+        if frame_offsets is not None:
+            # Prebuilt index from a cache: rows are already sorted, so skip the O(n) checks.
+            self._first_frame, self.frame_offsets = first_frame, frame_offsets
+            return
+        if n > 1 and np.any(np.diff(self.frame_idx) < 0):
+            order = np.argsort(self.frame_idx, kind='stable')
+            for name in ('frame_idx', 'class_id', 'conf') + COORD_COLUMNS + ('tank_number',):
+                setattr(self, name, getattr(self, name)[order])
+            self.extra = {name: values[order] for name, values in self.extra.items()}
+        self._build_frame_index()
+
+    @classmethod
+    def empty(cls):
+        return cls([], [], [], [], [], [], [], [])
+
+    @classmethod
+    def from_csv(cls, file_path):
+        """Parses a detection CSV row by row with the standard library csv module."""
+        with open(file_path, newline="", encoding='utf-8') as f:
+            reader = csv.reader(f)
+            headers = next(reader, None)
+            if headers is None: return cls.empty()
+            index = {name: i for i, name in enumerate(headers)}
+            for required in ('frame_idx', 'class_name', 'x1', 'y1', 'x2', 'y2'):
+                if required not in index: raise ValueError(f"Detection CSV is missing the '{required}' column.")
+            extra_names = [name for name in headers if name not in CORE_COLUMNS]
+            float_names = ['conf'] + list(COORD_COLUMNS)
+            columns = {name: [] for name in ['frame_idx', 'class_id', 'tank_number'] + float_names + extra_names}
+            class_ids = {}
+            for row in reader:
+                if not row: continue
+                get = lambda name: row[index[name]] if name in index and index[name] < len(row) else ''
+                columns['frame_idx'].append(int(float(get('frame_idx'))))
+                columns['class_id'].append(class_ids.setdefault(get('class_name'), len(class_ids)))
+                for name in float_names: columns[name].append(_parse_float(get(name)))
+                tank = get('tank_number'); columns['tank_number'].append(int(float(tank)) if tank else NO_TANK)
+                for name in extra_names: columns[name].append(get(name))
+        return cls(columns['frame_idx'], columns['class_id'], list(class_ids), columns['conf'],
+                   columns['x1'], columns['y1'], columns['x2'], columns['y2'], columns['cx'], columns['cy'], columns['tank_number'],
+                   extra={name: np.array(columns[name], dtype=object) for name in extra_names}, csv_headers=headers)
+
+    def _build_frame_index(self):
+        if len(self.frame_idx) == 0:
+            self._first_frame, self.frame_offsets = 0, np.zeros(1, dtype=np.int64); return
+        first, last = int(self.frame_idx[0]), int(self.frame_idx[-1])
+        self._first_frame = min(first, 0)
+        self.frame_offsets = np.searchsorted(self.frame_idx, np.arange(self._first_frame, last + 2)).astype(np.int64)
+
+    def __len__(self):
+        return len(self.frame_idx)
+
+    @property
+    def first_frame(self):
+        """Frame number that `frame_offsets[0]` refers to."""
+        return self._first_frame
+
+    def row_chunks(self, chunk_rows):
+        """Yields row slices of roughly `chunk_rows` rows that never split a frame across two chunks."""
+        n, start = len(self), 0
+        while start < n:
+            stop = min(n, start + chunk_rows)
+            if stop < n:
+                stop = int(self.frame_offsets[int(self.frame_idx[stop - 1]) - self._first_frame + 1])
+            yield slice(start, stop)
+            start = stop
+
+    def allocate_column(self, dtype):
+        """Returns a new uninitialized per-row array, backed by an anonymous temporary file for memory-mapped tables."""
+        if self.memory_mapped and len(self) > 0:
+            return np.memmap(tempfile.TemporaryFile(prefix="ethogrid_"), dtype=dtype, mode='w+', shape=(len(self),))
+        return np.empty(len(self), dtype=dtype)
+
+    @property
+    def num_frames(self):
+        """Number of distinct frames that have at least one detection."""
+        return int(np.count_nonzero(np.diff(self.frame_offsets))) if len(self) else 0
+
+    def frame_slice(self, frame_idx):
+        """Returns the row slice holding the detections of `frame_idx` (empty if there are none)."""
+        pos = frame_idx - self._first_frame
+        if pos < 0 or pos + 1 >= len(self.frame_offsets): return slice(0, 0)
+        return slice(int(self.frame_offsets[pos]), int(self.frame_offsets[pos + 1]))
+
+    def frame_window(self, first_frame, last_frame):
+        """Returns a table holding only the detections of frames first_frame..last_frame (inclusive), sharing memory where possible."""
+        first_frame = max(first_frame, self._first_frame)
+        last_frame = min(last_frame, self._first_frame + len(self.frame_offsets) - 2)
+        if last_frame < first_frame:
+            offsets, start, stop = np.zeros(1, dtype=np.int64), 0, 0
+        else:
+            offsets = self.frame_offsets[first_frame - self._first_frame:last_frame - self._first_frame + 2]
+            start, stop = int(offsets[0]), int(offsets[-1])
+        rows = slice(start, stop)
+        columns = {name: getattr(self, name)[rows] for name in ('frame_idx', 'class_id', 'conf') + COORD_COLUMNS + ('tank_number',)}
+        return DetectionTable(columns['frame_idx'], columns['class_id'], self.class_names, columns['conf'], columns['x1'], columns['y1'], columns['x2'], columns['y2'],
+                              columns['cx'], columns['cy'], columns['tank_number'], extra={name: values[rows] for name, values in self.extra.items()},
+                              csv_headers=self.csv_headers, frame_offsets=offsets - start,
+                              first_frame=first_frame, polygons=self.polygons.slice(rows) if self.polygons is not None else None)
+
+    def frame_records(self, frame_idx, *names):
+        """
+        Returns one tuple per detection of `frame_idx` holding the requested columns as Python scalars.
+        'class_name' is resolved from class_id, 'polygon_points' gives the parsed (k, 2) int32 vertices of each polygon
+        (None where there is none or it was malformed), and columns the table does not have come back as None.
+        """
+        rows = self.frame_slice(frame_idx)
+        count = rows.stop - rows.start
+        columns = []
+        for name in names:
+            if name == 'class_name': columns.append([self.class_names[i] for i in self.class_id[rows].tolist()])
+            elif name == 'polygon_points': columns.append(self.polygons.points(rows) if self.polygons is not None else [None] * count)
+            elif name in self.extra: columns.append(self.extra[name][rows].tolist())
+            elif name in CORE_COLUMNS or name == 'class_id': columns.append(getattr(self, name)[rows].tolist())
+            else: columns.append([None] * count)
+        return list(zip(*columns))
+
+    def class_name_array(self):
+        return np.array(self.class_names, dtype=object)[self.class_id]
+
+    def with_columns(self, **columns):
+        """Returns a shallow copy sharing every array except the replaced ones (rows must stay in the same order)."""
+        table = copy.copy(self)
+        table.extra = dict(self.extra)
+        for name, values in columns.items():
+            if name in self.extra: table.extra[name] = values
+            else: setattr(table, name, values)
+        return table
+
+    def output_headers(self):
+        headers = self.csv_headers[:]
+        headers.extend(k for k in ['tank_number', 'cx', 'cy'] if k not in headers)
+        return headers
+
+    def formatted_column(self, name, rows=slice(None)):
+        """Returns the values of a column as strings, formatted the way EthoGrid writes them to CSV."""
+        if name == 'frame_idx': return [str(v) for v in self.frame_idx[rows].tolist()]
+        if name == 'class_name': return self.class_name_array()[rows].tolist()
+        if name == 'tank_number': return [str(v) if v != NO_TANK else '' for v in self.tank_number[rows].tolist()]
+        if name == 'conf' or name in COORD_COLUMNS: return [f"{v:.4f}" if v == v else '' for v in getattr(self, name)[rows].tolist()]
+        if name in self.extra: return [str(v) for v in self.extra[name][rows].tolist()]
+        return [''] * len(self.frame_idx[rows])
+
+    def write_csv(self, file_path, headers=None):
+        """Writes the table (including tank_number, cx and cy) to a CSV file."""
+        headers = headers or self.output_headers()
+        columns = [self.formatted_column(name) for name in headers]
+        with open(file_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(zip(*columns))
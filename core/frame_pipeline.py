@@ -0,0 +1,166 @@
+# EthoGrid_App/core/frame_pipeline.py
+
+import time
+import queue
+import threading
+import cv2
+
+PIPELINE_QUEUE_SIZE = 8  # Items buffered between stages; bounds memory to a few frames per queue.
+STAGES = ('decode', 'render', 'encode')
+
+class FrameReader:
+    """
+    Decodes frames from `cap` on a background thread into a bounded queue of batches of up to `batch_size`
+    frames, so the consumer never waits on the decoder while the queue has frames in it.
+    Reads `max_frames` frames, or until the video ends when it is None.
+    """
+    def __init__(self, cap, max_frames=None, batch_size=1, queue_size=PIPELINE_QUEUE_SIZE):
+        self.cap, self.max_frames, self.batch_size = cap, max_frames, batch_size
+        self.busy, self.frames, self.error = 0.0, 0, None
+        self._queue, self._stopping = queue.Queue(queue_size), threading.Event()
+        self._thread = threading.Thread(target=self._read, name="frame-reader", daemon=True); self._thread.start()
+
+    def _put(self, item):
+        while True:
+            try: self._queue.put(item, timeout=0.1); return
+            except queue.Full:
+                if self._stopping.is_set(): return
+
+    def _read(self):
+        try:
+            batch = []
+            while not self._stopping.is_set() and (self.max_frames is None or self.frames < self.max_frames):
+                began = time.perf_counter(); ret, frame = self.cap.read(); self.busy += time.perf_counter() - began
+                if not ret: break
+                batch.append(frame); self.frames += 1
+                if len(batch) == self.batch_size: self._put(batch); batch = []
+            if batch: self._put(batch)
+        except Exception as e:
+            self.error = e
+        self._put([])
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def get(self):
+        """Returns the next batch of frames; an empty list once the video (or `max_frames`) has been read."""
+        return self._queue.get()
+
+    def close(self):
+        """Stops decoding and waits for the thread; errors are left in `error`."""
+        self._stopping.set(); self._thread.join()
+
+class FrameWriter:
+    """Encodes frames with `writer` on a background thread, in the order they are passed to `write`."""
+    def __init__(self, writer, queue_size=PIPELINE_QUEUE_SIZE):
+        self.writer = writer
+        self.busy, self.frames, self.error = 0.0, 0, None
+        self._queue = queue.Queue(queue_size)
+        self._thread = threading.Thread(target=self._write, name="frame-writer", daemon=True); self._thread.start()
+
+    def _write(self):
+        # Keeps draining after an error so that `write` never blocks on a full queue.
+        while True:
+            frame = self._queue.get()
+            if frame is None: return
+            if self.error is not None: continue
+            try:
+                began = time.perf_counter(); self.writer.write(frame); self.busy += time.perf_counter() - began; self.frames += 1
+            except Exception as e:
+                self.error = e
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def write(self, frame):
+        self._queue.put(frame)
+
+    def close(self):
+        """Waits until every queued frame is written; errors are left in `error`."""
+        self._queue.put(None); self._thread.join()
+
+def open_at_frame(video_path, start):
+    """
+    Opens `video_path` positioned at frame `start`. Returns None if the video cannot be opened.
+
+    Backends report the requested CAP_PROP_POS_FRAMES after a seek even when it landed on another frame, so the seek
+    is checked against the timestamp of the decoded frame before `start`: it must be the first frame's timestamp plus
+    `start - 1` frame intervals. When it is not (a bad seek, or a video without a constant frame rate), the video is
+    decoded from the beginning up to `start` instead, which is exact.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened(): return None
+    if start <= 0: return cap
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps > 0 and cap.grab():
+        first_msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start - 1)
+        if cap.grab() and abs(cap.get(cv2.CAP_PROP_POS_MSEC) - first_msec - (start - 1) * 1000.0 / fps) < 500.0 / fps: return cap
+    cap.release(); cap = cv2.VideoCapture(video_path)
+    for _ in range(start): cap.grab()
+    return cap
+
+def raise_stage_errors(*stages):
+    for stage in stages:
+        if stage is not None and stage.error is not None: raise stage.error
+
+class PipelineStats:
+    """Busy time of each stage of one decode -> render -> encode run and the mean fill of the queues between them."""
+    def __init__(self, queue_size):
+        self.queue_size = queue_size
+        self.frames = 0
+        self.seconds = 0.0
+        self.busy = dict.fromkeys(STAGES, 0.0)
+        self._depth_sums, self._depth_samples = {'decoded': 0, 'rendered': 0}, 0
+
+    def sample_queues(self, reader, writer):
+        self._depth_sums['decoded'] += reader.depth; self._depth_sums['rendered'] += writer.depth; self._depth_samples += 1
+
+    def utilization(self, stage):
+        """Fraction of the wall time `stage` spent working rather than waiting on its queues."""
+        return min(1.0, self.busy[stage] / self.seconds) if self.seconds > 0 else 0.0
+
+    def mean_depth(self, name):
+        return self._depth_sums[name] / self._depth_samples if self._depth_samples else 0.0
+
+    @property
+    def bottleneck(self):
+        return max(STAGES, key=self.busy.get)
+
+    def summary(self):
+        fps = self.frames / self.seconds if self.seconds > 0 else 0.0
+        busy = ", ".join(f"{stage} {self.utilization(stage):.0%}" for stage in STAGES)
+        return (f"Exported {self.frames:,} frames in {self.seconds:.1f} s ({fps:.1f} FPS). Stage utilization: {busy}; "
+                f"mean queue depth: {self.mean_depth('decoded'):.1f}/{self.queue_size} decoded, {self.mean_depth('rendered'):.1f}/{self.queue_size} rendered. "
+                f"Bottleneck: {self.bottleneck}.")
+
+def run_pipeline(cap, writer, render, start, stop, report=None, queue_size=PIPELINE_QUEUE_SIZE):
+    """
+    Decodes frames [start, stop) from `cap` (already positioned at `start`) on a reader thread, renders them with
+    `render(frame, frame_idx)` on the calling thread and encodes them with `writer` on a writer thread, so that
+    drawing overlaps OpenCV's decoding and encoding, which release the GIL.
+
+    `report(frames_rendered)` is called after every rendered frame; returning False stops the pipeline early.
+    Frames already rendered are still written. Reader and writer errors are re-raised here.
+    Returns the PipelineStats of the run.
+    """
+    stats = PipelineStats(queue_size)
+    began = time.perf_counter()
+    reader, frame_writer = FrameReader(cap, stop - start, 1, queue_size), FrameWriter(writer, queue_size)
+    try:
+        frame_idx = start
+        while frame_writer.error is None:
+            stats.sample_queues(reader, frame_writer)
+            frames = reader.get()
+            if not frames: break
+            render_began = time.perf_counter(); output = render(frames[0], frame_idx); stats.busy['render'] += time.perf_counter() - render_began
+            frame_writer.write(output); frame_idx += 1
+            if report is not None and not report(frame_idx - start): break
+    finally:
+        reader.close(); frame_writer.close()
+        stats.seconds = time.perf_counter() - began
+        stats.busy['decode'], stats.busy['encode'], stats.frames = reader.busy, frame_writer.busy, frame_writer.frames
+    raise_stage_errors(reader, frame_writer)
+    return stats
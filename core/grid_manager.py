@@ -1,9 +1,32 @@
 # EthoGrid_App/core/grid_manager.py
 
+import os
+import json
 import numpy as np
 from PyQt5.QtCore import QObject, pyqtSignal, QPointF
 from PyQt5.QtGui import QTransform
 
+from core.tank_assignment import CellLabelMap, inverse_matrix_for, load_arena_mask
+
+def transform_from_settings(transform_settings, video_size):
+    """Builds the grid transform stored in a settings file ('grid_transform' section) for a video of `video_size`."""
+    w, h = video_size
+    transform = QTransform()
+    transform.translate(w * transform_settings['center_x'], h * transform_settings['center_y'])
+    transform.rotate(transform_settings['angle'])
+    transform.scale(transform_settings['scale_x'], transform_settings['scale_y'])
+    transform.translate(-w / 2, -h / 2)
+    return transform
+
+def read_settings_file(settings_file):
+    """
+    Reads a settings file saved by the main window. Returns (grid_settings, transform_settings, arena_mask_path);
+    a relative arena mask path is resolved against the file's folder. Raises on unreadable or incomplete files.
+    """
+    with open(settings_file, 'r') as f: settings_data = json.load(f)
+    arena_mask_path = os.path.join(os.path.dirname(settings_file), settings_data['arena_mask']) if settings_data.get('arena_mask') else None
+    return settings_data['grid_settings'], settings_data['grid_transform'], arena_mask_path
+
 class GridManager(QObject):
     """
     Manages the state and transformation of the annotation grid.
@@ -19,9 +42,37 @@ class GridManager(QObject):
         self.scale_x = 1.0
         self.scale_y = 1.0
         self.video_size = (0, 0)
+        self.arena_mask_path, self.arena_mask = None, None
+        self._label_map = None
+
+    def set_arena_mask(self, path):
+        """
+        Restricts tank assignment to the non-zero pixels of a mask image (None removes the mask).
+        Raises ValueError if the image cannot be read.
+        """
+        self.arena_mask = load_arena_mask(path, self.video_size) if path and self.video_size[0] > 0 else None
+        self.arena_mask_path = path
+        self._label_map = None
+        self.transform_updated.emit()
+
+    def label_map(self, cols, rows):
+        """
+        Returns the CellLabelMap of the current grid, or None without a video or with a degenerate grid.
+        The same object is returned until the transform, grid size or arena mask changes, so the raster is built at most once per grid.
+        """
+        if self.video_size[0] == 0: return None
+        label_map = self._label_map
+        if label_map is None or (label_map.cols, label_map.rows) != (cols, rows):
+            inverse_matrix = inverse_matrix_for(self.transform)
+            if inverse_matrix is None: return None
+            label_map = self._label_map = CellLabelMap(inverse_matrix, self.video_size, cols, rows, self.arena_mask)
+        return label_map
 
     def set_video_size(self, width, height):
         self.video_size = (width, height)
+        if self.arena_mask_path:
+            try: self.arena_mask = load_arena_mask(self.arena_mask_path, self.video_size)
+            except ValueError as e: print(f"Warning: {e} The arena mask is ignored."); self.arena_mask_path, self.arena_mask = None, None
         self._update_transform_matrix()
 
     def reset(self):
@@ -64,6 +115,7 @@ class GridManager(QObject):
         self.transform_updated.emit()
 
     def _update_transform_matrix(self):
+        self._label_map = None
         self.transform.reset()
         if self.video_size[0] > 0:
             w, h = self.video_size
@@ -0,0 +1,13 @@
+# EthoGrid_App/core/inference.py
+
+DEFAULT_BATCH_SIZE = 8
+MAX_BATCH_SIZE = 64
+PREFETCH_FRAMES = 32  # Decoded frames buffered ahead of inference.
+
+def prefetch_queue_size(batch_size):
+    """Number of batches the decoder may read ahead: about PREFETCH_FRAMES frames, and at least two batches."""
+    return max(2, PREFETCH_FRAMES // batch_size)
+
+def stage_fps(frames, busy_seconds):
+    """Frames per second a pipeline stage sustains while it is working, i.e. ignoring time spent waiting on the other stages."""
+    return frames / busy_seconds if busy_seconds > 0 else 0.0
@@ -0,0 +1,117 @@
+# EthoGrid_App/core/inference_cache.py
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+
+from core.detection_cache import _StreamingNpyFile
+from core.inference_checkpoint import model_fingerprint, video_fingerprint
+
+CACHE_VERSION = 1
+CACHE_DIR_VARIABLE = 'ETHOGRID_CACHE_DIR'
+ROW_COLUMNS = 7  # x1, y1, x2, y2, conf, class id, tank number (NO_TANK unless the frame was tiled)
+
+def inference_cache_dir():
+    """Where model outputs are cached: $ETHOGRID_CACHE_DIR, or ~/.cache/ethogrid/inference."""
+    return os.environ.get(CACHE_DIR_VARIABLE) or os.path.join(os.path.expanduser("~"), ".cache", "ethogrid", "inference")
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f: return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_json(path, data):
+    temporary_path = f"{path}.{os.getpid()}.tmp"  # Per process, since pool processes share the cache.
+    with open(temporary_path, 'w', encoding='utf-8') as f: json.dump(data, f)
+    os.replace(temporary_path, path)
+
+def cache_key(video_path, model_path, input_settings=None):
+    """
+    The content address of a video's model outputs: the video's fingerprint and the model's content hash plus the
+    settings that change what the model sees (`input_settings`, JSON-serializable, e.g. the input size and tiling;
+    None for full frames at the model's default size). The confidence threshold is not part of the key; see `find_cached_outputs`.
+    """
+    text = json.dumps([CACHE_VERSION, video_fingerprint(video_path), model_fingerprint(model_path), input_settings], sort_keys=True)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+def _entry_name(confidence):
+    return f"conf_{float(confidence):.4f}"
+
+class CachedOutputs:
+    """
+    The model outputs of every frame of a video, captured at `confidence`. `frame_rows` returns the boxes of a frame
+    at any threshold at or above it: a lower threshold only adds boxes with lower scores, and those can neither
+    suppress nor displace a higher-scoring box in non-maximum suppression, so filtering gives the boxes the model
+    would have returned at the higher threshold.
+    """
+    def __init__(self, entry_dir, meta):
+        self.confidence, self.frames = meta['confidence'], meta['frames']
+        counts = np.load(os.path.join(entry_dir, "counts.npy"))
+        self.offsets = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+        self.rows = np.load(os.path.join(entry_dir, "rows.npy"), mmap_mode='r').reshape(-1, ROW_COLUMNS)
+
+    def frame_rows(self, frame_idx, confidence):
+        """(k, ROW_COLUMNS) float64 rows of one frame with a score above `confidence`, as the model applies its threshold."""
+        if frame_idx >= self.frames: return np.empty((0, ROW_COLUMNS))
+        rows = np.array(self.rows[self.offsets[frame_idx]:self.offsets[frame_idx + 1]])
+        return rows[rows[:, 4].astype(np.float32) > np.float32(confidence)]
+
+def find_cached_outputs(key, confidence):
+    """The complete cached outputs of `key` captured at the highest threshold not above `confidence`, or None."""
+    key_dir = os.path.join(inference_cache_dir(), key)
+    best = None
+    for name in os.listdir(key_dir) if os.path.isdir(key_dir) else []:
+        meta = _read_json(os.path.join(key_dir, name, "meta.json"))
+        if meta and meta.get('version') == CACHE_VERSION and meta['confidence'] <= confidence + 1e-9 and (best is None or meta['confidence'] > best[1]['confidence']):
+            best = (os.path.join(key_dir, name), meta)
+    if best is None: return None
+    try: return CachedOutputs(*best)
+    except (OSError, ValueError): return None
+
+class UndecodedFrames:
+    """
+    Stands in for core.frame_pipeline.FrameReader when every frame's outputs come from the cache and no frame is drawn
+    on: yields batches of None for frames `start_frame` to `frames` without opening the video.
+    """
+    def __init__(self, start_frame, frames, batch_size=1):
+        self._remaining, self.batch_size = max(frames - start_frame, 0), batch_size
+        self.busy, self.frames, self.error = 0.0, 0, None
+
+    def get(self):
+        batch = [None] * min(self.batch_size, self._remaining)
+        self._remaining -= len(batch); self.frames += len(batch)
+        return batch
+
+    def close(self):
+        pass
+
+class OutputCacheWriter:
+    """
+    Streams the model outputs of a run into a new cache entry, one frame at a time and starting at frame 0.
+    The entry becomes visible only in `finish`, after the last frame, so interrupted runs leave nothing behind.
+    """
+    def __init__(self, key, confidence):
+        self.final_dir = os.path.join(inference_cache_dir(), key, _entry_name(confidence))
+        self.entry_dir = f"{self.final_dir}.{os.getpid()}.partial"
+        self.confidence, self.frames = float(confidence), 0
+        shutil.rmtree(self.entry_dir, ignore_errors=True); os.makedirs(self.entry_dir)
+        self._counts = _StreamingNpyFile(os.path.join(self.entry_dir, "counts.npy"), np.int32)
+        self._rows = _StreamingNpyFile(os.path.join(self.entry_dir, "rows.npy"), np.float64)
+
+    def add_frame(self, rows):
+        """Appends the (k, ROW_COLUMNS) rows of the next frame."""
+        self._counts.append([len(rows)]); self._rows.append(np.asarray(rows, dtype=np.float64).reshape(-1))
+        self.frames += 1
+
+    def finish(self):
+        self._counts.close(); self._rows.close()
+        _write_json(os.path.join(self.entry_dir, "meta.json"), {'version': CACHE_VERSION, 'confidence': self.confidence, 'frames': self.frames})
+        shutil.rmtree(self.final_dir, ignore_errors=True)
+        os.replace(self.entry_dir, self.final_dir)
+
+    def abort(self):
+        self._counts.close(); self._rows.close()
+        shutil.rmtree(self.entry_dir, ignore_errors=True)
@@ -0,0 +1,87 @@
+# EthoGrid_App/core/inference_checkpoint.py
+
+import os
+import hashlib
+import cv2
+
+from core.detection_cache import file_content_hash
+from core.parallel_export import ffmpeg_path, concat_segments
+from core.streaming_csv import read_progress_marker
+from core.polygon_store import polygon_store_path
+
+RUN_KEYS = ('model_hash', 'confidence', 'source_fingerprint', 'settings')  # Checkpoint fields that must match for outputs to be reused.
+FINGERPRINT_BYTES = 4 * 1024 * 1024  # Read from each end of a video for its fingerprint.
+
+_model_hashes = {}
+
+def model_fingerprint(model_path):
+    """Content hash of the model file, computed once per file version; the name itself for models that are not local files (downloaded by ultralytics)."""
+    if not os.path.isfile(model_path): return os.path.basename(model_path)
+    stat = os.stat(model_path); key = (os.path.abspath(model_path), stat.st_size, stat.st_mtime_ns)
+    if key not in _model_hashes: _model_hashes[key] = file_content_hash(model_path)
+    return _model_hashes[key]
+
+def video_fingerprint(video_path):
+    """
+    Identifies a video by its path, size, modification time and a hash of its first and last FINGERPRINT_BYTES, so
+    even multi-GB recordings are fingerprinted instantly. A video that is replaced, edited or moved gets a new one.
+    """
+    stat = os.stat(video_path)
+    digest = hashlib.blake2b(f"{os.path.abspath(video_path)}|{stat.st_size}|{stat.st_mtime_ns}".encode('utf-8'), digest_size=16)
+    with open(video_path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_BYTES))
+        if stat.st_size > FINGERPRINT_BYTES:
+            f.seek(max(FINGERPRINT_BYTES, stat.st_size - FINGERPRINT_BYTES)); digest.update(f.read())
+    return digest.hexdigest()
+
+def checkpoint_metadata(model_path, confidence, video_path, settings=None):
+    """
+    The run settings stored in a CSV's progress marker; outputs are reused only when a new run has the same ones.
+    `settings` holds any further worker options that change the outputs (JSON-serializable, None for the defaults).
+    """
+    return {'model_hash': model_fingerprint(model_path), 'confidence': round(float(confidence), 4), 'source_fingerprint': video_fingerprint(video_path), 'settings': settings}
+
+def video_frame_count(path):
+    cap = cv2.VideoCapture(path)
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else -1
+    cap.release()
+    return count
+
+def plan_resume(csv_path, video_path, metadata):
+    """
+    Decides what to do with a video whose CSV may hold the checkpoint of an earlier run. `video_path` is the annotated
+    video the run writes, or None. Returns (action, checkpoint, message): action is 'skip' when the outputs are complete
+    and were made with the same settings, 'resume' to continue at frame checkpoint['frames_done'] and 'start' otherwise.
+    `message` explains the decision for the log, or is None for a first run.
+    """
+    checkpoint = read_progress_marker(csv_path)
+    if checkpoint is None: return 'start', None, None
+    if any(checkpoint.get(key) != metadata[key] for key in RUN_KEYS):
+        return 'start', None, "Existing outputs were made with a different model, confidence, source video or settings; starting over."
+    if not os.path.exists(csv_path) or os.path.getsize(csv_path) < checkpoint['bytes']:
+        return 'start', None, "The checkpointed CSV is missing or shorter than recorded; starting over."
+    if 'polygon_bytes' in checkpoint and (not os.path.exists(polygon_store_path(csv_path)) or os.path.getsize(polygon_store_path(csv_path)) < checkpoint['polygon_bytes']):
+        return 'start', None, "The checkpointed polygon file is missing or shorter than recorded; starting over."
+    # An annotated video can be continued only if it holds exactly the checkpointed frames; an interrupted mp4 cannot be read at all.
+    video_matches = video_path is None or (checkpoint.get('video') and video_frame_count(video_path) == checkpoint['frames_done'])
+    if checkpoint['complete']:
+        if video_matches: return 'skip', checkpoint, f"✓ Outputs are already complete ({checkpoint['frames_done']:,} frames); skipping."
+        return 'start', None, "The CSV is complete but the annotated video is missing or incomplete; starting over."
+    if checkpoint['frames_done'] == 0: return 'start', None, None
+    if not video_matches: return 'start', None, "The partial annotated video cannot be continued; starting over."
+    if video_path is not None and ffmpeg_path() is None: return 'start', None, "Continuing a partial annotated video needs ffmpeg; starting over."
+    return 'resume', checkpoint, f"Resuming from the checkpoint at frame {checkpoint['frames_done']:,}."
+
+def continuation_path(video_path):
+    root, extension = os.path.splitext(video_path)
+    return f"{root}.resume{extension}"
+
+def join_continuation(video_path, continuation):
+    """Appends the frames encoded into `continuation` to `video_path` without re-encoding. Returns an error message or None."""
+    if video_frame_count(continuation) <= 0: os.remove(continuation); return None
+    joined = continuation_path(continuation)
+    error = concat_segments([video_path, continuation], joined)
+    if error is None: os.replace(joined, video_path)
+    for path in (continuation, joined, os.path.join(os.path.dirname(continuation), "segments.txt")):
+        if os.path.exists(path): os.remove(path)
+    return error
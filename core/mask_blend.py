@@ -0,0 +1,62 @@
+# EthoGrid_App/core/mask_blend.py
+
+import cv2
+import numpy as np
+
+MASK_ALPHA = 0.4
+REGION_PADDING = 12  # Room for line thickness and anti-aliased label text around what a detection draws.
+
+def merge_regions(rects, width, height):
+    """
+    Clips (x1, y1, x2, y2) rectangles (x2 and y2 exclusive) to a width x height frame, pads them by REGION_PADDING
+    and merges overlapping ones, so the returned integer rectangles are pairwise disjoint.
+    """
+    regions = []
+    for x1, y1, x2, y2 in rects:
+        x1, y1 = max(0, int(np.floor(x1)) - REGION_PADDING), max(0, int(np.floor(y1)) - REGION_PADDING)
+        x2, y2 = min(width, int(np.ceil(x2)) + REGION_PADDING), min(height, int(np.ceil(y2)) + REGION_PADDING)
+        if x1 >= x2 or y1 >= y2: continue
+        merged = True
+        while merged:
+            merged = False
+            for i, (a1, b1, a2, b2) in enumerate(regions):
+                if x1 < a2 and a1 < x2 and y1 < b2 and b1 < y2:
+                    x1, y1, x2, y2 = min(x1, a1), min(y1, b1), max(x2, a2), max(y2, b2)
+                    del regions[i]; merged = True; break
+        regions.append((x1, y1, x2, y2))
+    return regions
+
+class RegionBlend:
+    """
+    Semi-transparent mask drawing that only copies and blends the regions around the detections of a frame,
+    instead of copying the whole frame into an overlay and running cv2.addWeighted over all of it.
+
+    Create it from the rectangles covering everything that will be drawn on the frame (masks, boxes, labels),
+    before drawing anything. Then fill the masks through it, draw the rest on the frame as usual, and call `apply`.
+    The result is the same as the full-frame blend, because the overlay equals the frame outside those rectangles.
+    """
+    def __init__(self, frame, rects, alpha=MASK_ALPHA):
+        height, width = frame.shape[:2]
+        self.alpha = alpha
+        self.regions = [(x1, y1, x2, y2, frame[y1:y2, x1:x2].copy()) for x1, y1, x2, y2 in merge_regions(rects, width, height)]
+
+    def _overlapping(self, x1, y1, x2, y2):
+        return [region for region in self.regions if x1 < region[2] and region[0] < x2 and y1 < region[3] and region[1] < y2]
+
+    def fill_poly(self, points, color):
+        """Fills an (N, 2) int32 polygon on the overlay."""
+        (x1, y1), (x2, y2) = points.min(axis=0), points.max(axis=0) + 1
+        for rx1, ry1, _, _, overlay in self._overlapping(x1, y1, x2, y2):
+            cv2.fillPoly(overlay, [points], color, offset=(-rx1, -ry1))
+
+    def fill_mask(self, x, y, mask, color):
+        """Fills the non-zero pixels of `mask`, a crop whose top-left corner is at (x, y) in the frame, on the overlay."""
+        height, width = mask.shape[:2]
+        for rx1, ry1, rx2, ry2, overlay in self._overlapping(x, y, x + width, y + height):
+            ix1, iy1, ix2, iy2 = max(x, rx1), max(y, ry1), min(x + width, rx2), min(y + height, ry2)
+            overlay[iy1 - ry1:iy2 - ry1, ix1 - rx1:ix2 - rx1][mask[iy1 - y:iy2 - y, ix1 - x:ix2 - x].astype(bool)] = color
+
+    def apply(self, frame):
+        """Blends the overlay regions into `frame` in place."""
+        for x1, y1, x2, y2, overlay in self.regions:
+            frame[y1:y2, x1:x2] = cv2.addWeighted(overlay, self.alpha, frame[y1:y2, x1:x2], 1 - self.alpha, 0)
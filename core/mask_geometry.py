@@ -0,0 +1,64 @@
+# EthoGrid_App/core/mask_geometry.py
+
+import cv2
+import numpy as np
+
+class MaskGeometry:
+    """
+    Centroids, contours and drawing crops of instance masks, computed at the resolution the model returns them in.
+
+    The masks of a segmentation model are much smaller than the video frame. Upsampling each one to the frame with
+    cv2.resize (INTER_NEAREST) and measuring it there is the main CPU cost of segmentation at high resolutions. This
+    class keeps the nearest-neighbour mapping between frame and mask pixels instead, so that:
+    - `centroid` gives the centroid of the upsampled mask exactly, from weighted sums over the small mask;
+    - `polygon` traces contours on the small mask and maps each vertex to the centre of its upsampled block
+      (within half a block of tracing the upsampled mask);
+    - `crop` upsamples only the mask's bounding box, pixel for pixel as the full-frame resize would.
+    """
+    def __init__(self, mask_size, video_size):
+        self.mask_size, self.video_size = mask_size, video_size
+        self.source_x, self.count_x, self.sum_x, self.start_x, self.centre_x = self._axis(mask_size[0], video_size[0])
+        self.source_y, self.count_y, self.sum_y, self.start_y, self.centre_y = self._axis(mask_size[1], video_size[1])
+        self.scale = (video_size[0] / mask_size[0] + video_size[1] / mask_size[1]) / 2.0
+
+    @staticmethod
+    def _axis(mask_length, video_length):
+        # The same mapping as cv2.resize with INTER_NEAREST: frame pixel i shows mask pixel floor(i * mask / video).
+        source = np.minimum(np.floor(np.arange(video_length) * (mask_length / video_length)).astype(np.intp), mask_length - 1)
+        count = np.bincount(source, minlength=mask_length).astype(np.float64)
+        total = np.bincount(source, weights=np.arange(video_length, dtype=np.float64), minlength=mask_length)
+        start = np.searchsorted(source, np.arange(mask_length + 1))
+        centre = np.rint((start[:-1] + start[1:] - 1) / 2.0).astype(np.int32)
+        return source, count, total, start, centre
+
+    def centroid(self, mask):
+        """(cx, cy) of the upsampled mask in frame pixels, or None if it is empty. `mask` is a 0/1 array of `mask_size`."""
+        weights = mask.astype(np.float64, copy=False)
+        per_column, per_column_y = self.count_y @ weights, self.sum_y @ weights
+        area = per_column @ self.count_x
+        if area == 0: return None
+        return (per_column @ self.sum_x) / area, (per_column_y @ self.count_x) / area
+
+    def polygon_points(self, mask, tolerance=0.0):
+        """
+        The vertices of the outer contours of a uint8 mask as an (N, 2) int32 array in frame pixels. With a `tolerance`
+        (in frame pixels), the contours are simplified with cv2.approxPolyDP first.
+        """
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if tolerance > 0: contours = [cv2.approxPolyDP(contour, tolerance / self.scale, True) for contour in contours]
+        if not contours: return np.empty((0, 2), dtype=np.int32)
+        points = np.concatenate(contours).reshape(-1, 2)
+        return np.stack([self.centre_x[points[:, 0]], self.centre_y[points[:, 1]]], axis=1)
+
+    def polygon(self, mask, tolerance=0.0):
+        """`polygon_points` as the "x,y;x,y;..." text of the CSV's 'polygon' column."""
+        points = self.polygon_points(mask, tolerance)
+        return ";".join(f"{x},{y}" for x, y in points.tolist())
+
+    def crop(self, mask):
+        """(x, y, crop) of the upsampled mask's bounding box in the frame, or None if the mask is empty or falls between frame pixels."""
+        mx, my, mw, mh = cv2.boundingRect(mask)
+        if not mw or not mh: return None
+        x0, x1, y0, y1 = self.start_x[mx], self.start_x[mx + mw], self.start_y[my], self.start_y[my + mh]
+        if x1 <= x0 or y1 <= y0: return None
+        return x0, y0, mask[np.ix_(self.source_y[y0:y1], self.source_x[x0:x1])]
@@ -0,0 +1,73 @@
+# EthoGrid_App/core/model_runtime.py
+
+import os
+import shutil
+import tempfile
+
+from core.inference_cache import inference_cache_dir
+from core.inference_checkpoint import model_fingerprint
+
+# Inference runtimes of the YOLO workers. The exported runtimes only run on the CPU, where they are usually much faster than PyTorch.
+RUNTIMES = {
+    'pytorch': "PyTorch (.pt)",
+    'onnx': "ONNX Runtime",
+    'onnx-int8': "ONNX Runtime, INT8 weights",
+    'openvino': "OpenVINO",
+}
+DEFAULT_RUNTIME = 'pytorch'
+DEFAULT_INPUT_SIZE = 640  # The input size ultralytics predicts at unless told otherwise.
+
+def runtime_dir():
+    """Where exported models are kept, next to the cached model outputs."""
+    return os.path.join(inference_cache_dir(), "runtimes")
+
+def runtime_artifact_path(model_path, runtime, imgsz=DEFAULT_INPUT_SIZE):
+    """
+    The exported model of `model_path` for `runtime` at input size `imgsz`, addressed by the model's content hash
+    (ultralytics recognizes OpenVINO models by the '_openvino_model' directory suffix).
+    """
+    name = f"{model_fingerprint(model_path)}_{runtime.replace('-', '_')}_{imgsz}"
+    return os.path.join(runtime_dir(), f"{name}_openvino_model" if runtime == 'openvino' else f"{name}.onnx")
+
+def _quantize_onnx(source_path, target_path):
+    """Dynamic INT8 quantization of the weights, keeping the metadata (class names, task, input size) ultralytics reads back."""
+    import onnx
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(source_path, target_path, weight_type=QuantType.QUInt8)
+    source, quantized = onnx.load(source_path), onnx.load(target_path)
+    del quantized.metadata_props[:]; quantized.metadata_props.extend(source.metadata_props)
+    onnx.save(quantized, target_path)
+
+def export_runtime(model_path, runtime, imgsz=DEFAULT_INPUT_SIZE, log=None):
+    """
+    Returns the exported model of `model_path` for `runtime`, exporting it first if it is not in the runtime directory.
+    The export (with a dynamic batch size) runs in a private copy of the model and is moved into place when done, so
+    concurrent runs never see a partial export.
+    """
+    from ultralytics import YOLO
+    target_path = runtime_artifact_path(model_path, runtime, imgsz)
+    if os.path.exists(target_path): return target_path
+    if not os.path.isfile(model_path): raise FileNotFoundError(f"Exporting to {RUNTIMES[runtime]} needs a local model file: {model_path}")
+    if log: log(f"Exporting the model to {RUNTIMES[runtime]} at {imgsz} px; later runs reuse the export.")
+    os.makedirs(runtime_dir(), exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix="export-", dir=runtime_dir())
+    try:
+        source_path = os.path.join(work_dir, "model.pt")
+        shutil.copy2(model_path, source_path)
+        exported_path = YOLO(source_path).export(format='openvino' if runtime == 'openvino' else 'onnx', imgsz=imgsz, dynamic=True, verbose=False)
+        if runtime == 'onnx-int8':
+            quantized_path = os.path.join(work_dir, "model_int8.onnx")
+            _quantize_onnx(exported_path, quantized_path); exported_path = quantized_path
+        try: os.replace(exported_path, target_path)
+        except OSError:
+            # Another run exported the same model first (an OpenVINO directory cannot be replaced); its export is used.
+            if not os.path.exists(target_path): raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return target_path
+
+def load_model(model_path, runtime=DEFAULT_RUNTIME, imgsz=DEFAULT_INPUT_SIZE, task=None, log=None):
+    """A YOLO model of `model_path` running on `runtime`; exported models are created once per model file and input size."""
+    from ultralytics import YOLO
+    if runtime == DEFAULT_RUNTIME: return YOLO(model_path)
+    return YOLO(export_runtime(model_path, runtime, imgsz, log), task=task)
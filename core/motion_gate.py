@@ -0,0 +1,81 @@
+# EthoGrid_App/core/motion_gate.py
+
+import time
+import numpy as np
+import cv2
+
+from core.grid_manager import transform_from_settings, read_settings_file
+from core.tank_assignment import NO_TANK, assign_tanks, inverse_matrix_for, load_arena_mask
+
+GATE_WIDTH = 320  # Frames are compared at this width: a fish stays several pixels large and the difference costs next to nothing.
+PIXEL_CHANGE = 15  # Grey-level difference above which a downscaled pixel counts as changed; well above sensor noise after blurring.
+DEFAULT_GATE_GRID = (4, 4)  # Cells (cols, rows) used when no settings file describes the tank grid.
+DEFAULT_MOTION_THRESHOLD = 0.2  # Percent of a cell's pixels that must change to run inference.
+DEFAULT_MAX_SKIP_FRAMES = 30
+
+def gate_cells(video_size, settings_file=None):
+    """
+    Tank number of every pixel of the downscaled frames the gate compares (NO_TANK outside the grid or arena mask).
+    Uses the grid of a settings file, or a plain DEFAULT_GATE_GRID over the whole frame without one.
+    Raises if the settings file cannot be read.
+    """
+    w, h = video_size
+    gate_size = (GATE_WIDTH, max(1, round(h * GATE_WIDTH / w))) if w > GATE_WIDTH else (w, h)
+    xs, ys = np.meshgrid((np.arange(gate_size[0]) + 0.5) * w / gate_size[0], (np.arange(gate_size[1]) + 0.5) * h / gate_size[1])
+    if settings_file is None:
+        cols, rows = DEFAULT_GATE_GRID
+        cells = np.minimum((ys * rows / h).astype(np.int32), rows - 1) * cols + np.minimum((xs * cols / w).astype(np.int32), cols - 1) + 1
+    else:
+        grid_settings, transform_settings, arena_mask_path = read_settings_file(settings_file)
+        inverse_matrix = inverse_matrix_for(transform_from_settings(transform_settings, video_size))
+        if inverse_matrix is None: raise ValueError("The grid of the settings file is degenerate.")
+        cells = assign_tanks(xs.ravel(), ys.ravel(), inverse_matrix, video_size, grid_settings['cols'], grid_settings['rows']).reshape(xs.shape)
+        if arena_mask_path: cells[~load_arena_mask(arena_mask_path, video_size)[ys.astype(np.intp), xs.astype(np.intp)]] = NO_TANK
+    return cells.astype(np.int32)
+
+class MotionGate:
+    """
+    Skips inference on frames in which nothing moved. Each frame is downscaled, converted to grey and compared with the
+    frame inference last ran on; inference runs again once the changed pixels of any cell exceed `threshold` percent
+    of that cell, or after `max_skip_frames` skipped frames in a row. Comparing per cell keeps a single small fish from
+    being drowned out by the rest of the frame.
+    """
+    def __init__(self, cells, threshold=DEFAULT_MOTION_THRESHOLD, max_skip_frames=DEFAULT_MAX_SKIP_FRAMES):
+        self.gate_size = (cells.shape[1], cells.shape[0])
+        self.cells = cells.ravel()
+        self.cell_pixels = np.maximum(np.bincount(self.cells, minlength=self.cells.max() + 1), 1)
+        self.threshold, self.max_skip_frames = threshold / 100.0, max_skip_frames
+        self.reference, self.skipped_in_row = None, 0
+        self.frames, self.inferred, self.busy = 0, 0, 0.0
+
+    def _downscale(self, frame):
+        small = cv2.resize(frame, self.gate_size, interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (3, 3), 0)
+
+    def cell_motion(self, small):
+        """Fraction of changed pixels in every cell (index 0 is the area outside the grid) relative to the reference frame."""
+        changed = cv2.absdiff(small, self.reference).ravel() > PIXEL_CHANGE
+        return np.bincount(self.cells[changed], minlength=len(self.cell_pixels)) / self.cell_pixels
+
+    def needs_inference(self, frame):
+        """Call once per frame, in order, before drawing on it. Returns False when the previous detections can be carried forward."""
+        began = time.perf_counter()
+        small = self._downscale(frame)
+        run = self.reference is None or self.skipped_in_row >= self.max_skip_frames or self.cell_motion(small)[1:].max(initial=0.0) > self.threshold
+        if run: self.reference, self.skipped_in_row, self.inferred = small, 0, self.inferred + 1
+        else: self.skipped_in_row += 1
+        self.frames += 1; self.busy += time.perf_counter() - began
+        return run
+
+    @property
+    def skipped_fraction(self):
+        return 1.0 - self.inferred / self.frames if self.frames else 0.0
+
+    def speedup(self, inference_seconds):
+        """Estimated speedup of the inference stage: every frame at the measured per-frame inference cost, over the time spent on inference and gating."""
+        if not self.inferred or inference_seconds + self.busy <= 0: return 1.0
+        return self.frames * inference_seconds / self.inferred / (inference_seconds + self.busy)
+
+    def summary(self, inference_seconds):
+        return (f"Motion gating skipped {self.frames - self.inferred:,} of {self.frames:,} frames ({self.skipped_fraction:.1%}); "
+                f"estimated inference speedup {self.speedup(inference_seconds):.2f}x.")
@@ -0,0 +1,100 @@
+# EthoGrid_App/core/parallel_export.py
+
+import os
+import time
+import queue
+import shutil
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+
+MIN_FRAMES_PER_WORKER = 300  # Shorter ranges spend more time starting processes and seeking than rendering.
+PROGRESS_INTERVAL = 0.25
+
+_progress_queue, _stop_event = None, None
+
+def ffmpeg_path():
+    """The ffmpeg executable used to join the segments losslessly, or None if it is not installed."""
+    return shutil.which('ffmpeg')
+
+def default_worker_count():
+    return max(1, min(8, os.cpu_count() or 1))
+
+def effective_workers(total_frames, workers):
+    """
+    Number of processes a parallel export of `total_frames` frames would use: 1 (export serially) when
+    ffmpeg is missing, the frame count is unknown, or the video is too short to be worth splitting.
+    """
+    if workers <= 1 or total_frames <= 0 or ffmpeg_path() is None: return 1
+    return max(1, min(workers, total_frames // MIN_FRAMES_PER_WORKER))
+
+def frame_ranges(total_frames, workers):
+    """Splits [0, total_frames) into `workers` contiguous (start, stop) ranges of near-equal length."""
+    bounds = [total_frames * i // workers for i in range(workers + 1)]
+    return [(start, stop) for start, stop in zip(bounds, bounds[1:]) if stop > start]
+
+def concat_segments(segment_paths, output_path):
+    """Joins encoded segments into `output_path` with ffmpeg's concat demuxer, without re-encoding. Returns an error message or None."""
+    list_path = os.path.join(os.path.dirname(segment_paths[0]), "segments.txt")
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for path in segment_paths: f.write("file '%s'\n" % os.path.abspath(path).replace("'", "'\\''"))
+    result = subprocess.run([ffmpeg_path(), '-hide_banner', '-loglevel', 'error', '-y', '-f', 'concat', '-safe', '0', '-i', list_path, '-c', 'copy', output_path],
+                            capture_output=True, text=True)
+    if result.returncode != 0: return f"ffmpeg could not join the video segments: {result.stderr.strip()[-500:]}"
+    return None
+
+def _init_worker(progress_queue, stop_event):
+    global _progress_queue, _stop_event
+    _progress_queue, _stop_event = progress_queue, stop_event
+
+def _run_job(render_range, job):
+    """Runs `render_range(job, report)` in a pool process; `report(frames_done)` returns False once the export is cancelled."""
+    last_report = [0.0]
+    def report(frames_done, force=False):
+        now = time.monotonic()
+        if force or now - last_report[0] >= PROGRESS_INTERVAL:
+            _progress_queue.put((job['index'], frames_done)); last_report[0] = now
+        return not _stop_event.is_set()
+    frames_done = render_range(job, report)
+    report(frames_done, force=True)
+    return frames_done
+
+def run_parallel_export(render_range, jobs, output_path, progress_callback=None, should_stop=None):
+    """
+    Renders frame ranges in separate processes and joins the resulting segments into `output_path`.
+
+    `render_range(job, report)` must be a module-level function; it encodes the frames of `job` into
+    `job['segment_path']`, calls `report(frames_done)` as it goes, stops early when that returns False, and returns
+    the number of frames it wrote. `progress_callback(total_frames_done)` and `should_stop()` run in the calling thread.
+
+    Returns an error message, or None when the export finished or was cancelled (no output is written then).
+    """
+    extension = os.path.splitext(output_path)[1] or ".mp4"
+    segment_dir = tempfile.mkdtemp(prefix=".ethogrid_export_", dir=os.path.dirname(os.path.abspath(output_path)))
+    # Spawned workers never inherit the parent's Qt threads, which forking could leave in a broken state.
+    context = multiprocessing.get_context('spawn')
+    progress_queue, stop_event = context.Queue(), context.Event()
+    done = [0] * len(jobs)
+    try:
+        for index, job in enumerate(jobs): job.update(index=index, segment_path=os.path.join(segment_dir, f"segment_{index:03d}{extension}"))
+        with ProcessPoolExecutor(max_workers=len(jobs), mp_context=context, initializer=_init_worker, initargs=(progress_queue, stop_event)) as pool:
+            futures = [pool.submit(_run_job, render_range, job) for job in jobs]
+            pending = set(futures)
+            while pending:
+                finished, pending = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_EXCEPTION)
+                if any(future.exception() for future in finished): stop_event.set()
+                try:
+                    while True:
+                        index, frames_done = progress_queue.get_nowait(); done[index] = frames_done
+                except queue.Empty:
+                    pass
+                if progress_callback: progress_callback(sum(done))
+                if should_stop and should_stop(): stop_event.set()
+            for future in futures:
+                if future.exception(): return f"Rendering a video segment failed: {future.exception()}"
+            if progress_callback: progress_callback(sum(future.result() for future in futures))
+        if stop_event.is_set(): return None
+        return concat_segments([job['segment_path'] for job in jobs], output_path)
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
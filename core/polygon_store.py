@@ -0,0 +1,106 @@
+# EthoGrid_App/core/polygon_store.py
+
+import os
+import struct
+import tempfile
+import zlib
+import numpy as np
+
+from core.polygons import PolygonBuffer
+
+MAGIC = b"EGPOLY1\n"
+BLOCK_HEADER = struct.Struct('<IIBI')  # rows, vertices, bytes per vertex coordinate, compressed payload bytes
+COMPRESSION_LEVEL = 6
+WRITE_BLOCK_ROWS = 100_000
+
+def polygon_store_path(csv_path):
+    """The binary polygon file stored next to a detections CSV (`name.csv` -> `name.polygons`)."""
+    return os.path.splitext(csv_path)[0] + ".polygons"
+
+def _encode_block(polygons):
+    counts = np.array([0 if points is None else len(points) for points in polygons], dtype=np.int32)
+    vertices = [np.asarray(points, dtype=np.int32).reshape(-1, 2) for points in polygons if points is not None and len(points)]
+    vertices = np.concatenate(vertices) if vertices else np.empty((0, 2), dtype=np.int32)
+    # Neighbouring contour vertices are close, so their differences are small, fit in int16 and compress well.
+    deltas = np.diff(vertices, axis=0, prepend=np.zeros((1, 2), dtype=np.int32))
+    itemsize = 2 if len(deltas) == 0 or (deltas.min() >= -32768 and deltas.max() <= 32767) else 4
+    payload = zlib.compress(counts.tobytes() + deltas.astype(f'<i{itemsize}').tobytes(), COMPRESSION_LEVEL)
+    return BLOCK_HEADER.pack(len(counts), len(vertices), itemsize, len(payload)) + payload
+
+class PolygonStoreWriter:
+    """
+    Writes the polygons of a segmentations CSV to a compressed binary file instead of its 'polygon' column, one row
+    per CSV row and in the same order. The file is a MAGIC header followed by independent blocks, each holding the
+    vertex counts of its rows and the delta-encoded vertices, zlib-compressed.
+
+    Meant to be driven by a StreamingCsvWriter: polygons are added with `add` next to their CSV rows, and the CSV
+    writer calls `flush` with the number of rows it writes out, so that both files always hold the same rows.
+    With `resume_from` (the CSV's progress marker), the file is truncated to the bytes the marker vouches for.
+    """
+    def __init__(self, path, resume_from=None):
+        self.path = path
+        self._buffer = []
+        if resume_from is not None:
+            with open(path, 'r+b') as f: f.truncate(resume_from['polygon_bytes'])
+            self._file = open(path, 'ab')
+        else:
+            self._file = open(path, 'wb')
+            self._file.write(MAGIC)
+
+    def add(self, points):
+        """Adds the (k, 2) vertices of the next row, or None for a row without a polygon."""
+        self._buffer.append(points)
+
+    def flush(self, rows):
+        """Writes the first `rows` buffered polygons as one block, syncs the file and returns its size in bytes."""
+        if rows: self._file.write(_encode_block(self._buffer[:rows]))
+        del self._buffer[:rows]
+        self._file.flush(); os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        if not self._file.closed: self._file.close()
+
+def write_polygon_store(path, polygons):
+    """Writes every row of a PolygonBuffer to a polygon file at `path`."""
+    writer = PolygonStoreWriter(path)
+    try:
+        for start in range(0, len(polygons), WRITE_BLOCK_ROWS):
+            rows = polygons.points(slice(start, min(len(polygons), start + WRITE_BLOCK_ROWS)))
+            for points in rows: writer.add(points)
+            writer.flush(len(rows))
+    finally:
+        writer.close()
+
+def read_polygon_store(path, memory_mapped=False):
+    """
+    Reads a polygon file into a PolygonBuffer, or returns None if it is missing or damaged.
+    With `memory_mapped=True` the vertices are written to an anonymous temporary file and mapped back,
+    matching core.polygons.parse_polygon_column.
+    """
+    try:
+        with open(path, 'rb') as f: data = f.read()
+    except OSError:
+        return None
+    if not data.startswith(MAGIC): return None
+    spill = tempfile.TemporaryFile(prefix="ethogrid_") if memory_mapped else None
+    counts, parts, position = [], [], len(MAGIC)
+    try:
+        while position < len(data):
+            rows, vertices, itemsize, size = BLOCK_HEADER.unpack_from(data, position)
+            position += BLOCK_HEADER.size
+            payload = zlib.decompress(data[position:position + size]); position += size
+            if len(payload) != rows * 4 + vertices * 2 * itemsize: return None
+            counts.append(np.frombuffer(payload, dtype='<i4', count=rows))
+            block = np.frombuffer(payload, dtype=f'<i{itemsize}', offset=rows * 4).reshape(-1, 2)
+            block = np.cumsum(block, axis=0, dtype=np.int64).astype(np.int32)  # Every block's deltas start from (0, 0).
+            if spill is not None: spill.write(block.tobytes())
+            else: parts.append(block)
+    except (struct.error, zlib.error, ValueError):
+        return None
+    counts = np.concatenate(counts) if counts else np.empty(0, dtype=np.int32)
+    offsets = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+    if spill is None or offsets[-1] == 0:
+        return PolygonBuffer(np.concatenate(parts) if parts else np.empty((0, 2), dtype=np.int32), offsets)
+    spill.flush()
+    return PolygonBuffer(np.memmap(spill, dtype=np.int32, mode='r', shape=(int(offsets[-1]), 2)), offsets)
@@ -0,0 +1,146 @@
+# EthoGrid_App/core/polygons.py
+
+import tempfile
+import numpy as np
+
+from core.detection_cache import EncodedStrings, encode_strings
+
+PARSE_CHUNK_ROWS = 200_000
+MAX_FAST_DIGITS = 9  # Longer numbers may not fit in int32 and take the Python path.
+
+_DIGIT_0 = ord('0')
+_KIND_OTHER, _KIND_DIGIT, _KIND_MINUS, _KIND_COMMA, _KIND_SEMICOLON = range(5)
+_CHAR_KIND = np.zeros(256, dtype=np.uint8)
+_CHAR_KIND[_DIGIT_0:_DIGIT_0 + 10] = _KIND_DIGIT
+_CHAR_KIND[ord('-')], _CHAR_KIND[ord(',')], _CHAR_KIND[ord(';')] = _KIND_MINUS, _KIND_COMMA, _KIND_SEMICOLON
+
+class PolygonBuffer:
+    """
+    Parsed segmentation polygons of a DetectionTable: the vertices of all rows in one (N, 2) int32 array,
+    where row i owns `vertices[offsets[i]:offsets[i + 1]]`.
+    Rows without a polygon, or with one that could not be parsed, own no vertices and are drawn as boxes.
+    """
+    def __init__(self, vertices, offsets):
+        self.vertices = vertices
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def slice(self, rows):
+        """Returns the buffer of a contiguous row slice; it shares the vertex array."""
+        start, stop, _ = rows.indices(len(self))
+        return PolygonBuffer(self.vertices, self.offsets[start:max(start, stop) + 1])
+
+    def compact(self):
+        """Returns a copy that owns only the vertices of its own rows, e.g. before sending a slice to another process."""
+        first, last = int(self.offsets[0]), int(self.offsets[-1])
+        return PolygonBuffer(np.array(self.vertices[first:last]), self.offsets - first)
+
+    def points(self, rows):
+        """Returns one (k, 2) vertex view per row of the slice `rows`, or None for rows without a polygon."""
+        bounds = self.offsets[rows.start:rows.stop + 1].tolist()
+        return [self.vertices[a:b] if b > a else None for a, b in zip(bounds, bounds[1:])]
+
+def _parse_python(text):
+    """Parses one polygon string the way the renderers used to; returns None if it is malformed."""
+    try:
+        points = np.array([list(map(int, p.split(','))) for p in text.split(';')], dtype=np.int32)
+    except (ValueError, OverflowError):
+        return None
+    return points if points.ndim == 2 and points.shape[1] == 2 else None
+
+def _parse_chunk(buffer, offsets):
+    """
+    Parses the "x,y;x,y;..." strings stored back to back in `buffer` (row i is buffer[offsets[i]:offsets[i + 1]]).
+    Returns the (N, 2) vertices and the vertex count of every row.
+
+    Rows made only of digits, '-', ',' and ';' are tokenized with array operations; anything else
+    (spaces, '+', overlong numbers, ...) falls back to the Python parser for that row.
+    """
+    n = len(offsets) - 1
+    lengths = np.diff(offsets)
+    counts = np.zeros(n, dtype=np.int64)
+    if len(buffer) == 0: return np.empty((0, 2), dtype=np.int32), counts
+    kind = _CHAR_KIND[buffer]
+    is_number = (kind == _KIND_DIGIT) | (kind == _KIND_MINUS)
+    row_edge = np.zeros(len(buffer) + 1, dtype=bool)
+    row_edge[offsets] = True
+    starts = np.flatnonzero(is_number & (row_edge[:-1] | ~np.concatenate(([False], is_number[:-1]))))
+    ends = np.flatnonzero(is_number & (row_edge[1:] | ~np.concatenate((is_number[1:], [False])))) + 1
+    token_row = np.searchsorted(offsets, starts, side='right') - 1
+    tokens_per_row = np.bincount(token_row, minlength=n)
+    first_token = np.concatenate(([0], np.cumsum(tokens_per_row)[:-1]))
+    ordinal = np.arange(len(starts)) - first_token[token_row]
+
+    slow = np.zeros(n, dtype=bool)
+    slow[np.searchsorted(offsets, np.flatnonzero(kind == _KIND_OTHER), side='right') - 1] = True
+    has_minus = kind[starts] == _KIND_MINUS
+    digits = ends - starts - has_minus
+    slow[token_row[digits > MAX_FAST_DIGITS]] = True
+    # A well-formed row is token (',' token ';' token ',' ...) token: every character is part of a number or of
+    # the single separator between two numbers, and separators alternate so that every point is exactly "x,y".
+    malformed = (tokens_per_row == 0) | (tokens_per_row % 2 == 1)
+    inner_minus = kind == _KIND_MINUS
+    inner_minus[starts] = False
+    malformed[np.searchsorted(offsets, np.flatnonzero(inner_minus), side='right') - 1] = True
+    malformed[token_row[digits == 0]] = True
+    follows = np.flatnonzero(ordinal[1:] > 0) + 1
+    previous_end = ends[follows - 1]
+    bad_gap = (starts[follows] != previous_end + 1) | (kind[previous_end] != _KIND_COMMA + (ordinal[follows - 1] & 1))
+    malformed[token_row[follows[bad_gap]]] = True
+    rows_with_tokens = np.flatnonzero(tokens_per_row)
+    malformed[rows_with_tokens] |= (starts[first_token[rows_with_tokens]] != offsets[rows_with_tokens]) | \
+                                   (ends[first_token[rows_with_tokens] + tokens_per_row[rows_with_tokens] - 1] != offsets[rows_with_tokens + 1])
+    fast = ~malformed & ~slow
+
+    selected = fast[token_row]
+    # Sum the digits of the fast tokens right to left; a token has at most MAX_FAST_DIGITS of them.
+    negative, last_digit, num_digits = has_minus[selected], ends[selected] - 1, digits[selected]
+    digit_values = buffer.astype(np.int32) - _DIGIT_0
+    values = np.zeros(len(last_digit), dtype=np.int32)
+    for k in range(int(num_digits.max()) if len(values) else 0):
+        values += np.where(num_digits > k, digit_values[last_digit - k], 0) * np.int32(10 ** k)
+    fast_vertices = np.where(negative, -values, values).reshape(-1, 2)
+    counts[fast] = tokens_per_row[fast] // 2
+
+    slow_rows = np.flatnonzero(slow & (lengths > 0)).tolist()
+    if not slow_rows: return fast_vertices, counts
+    slow_points = {}
+    for i in slow_rows:
+        points = _parse_python(bytes(buffer[offsets[i]:offsets[i + 1]]).decode('utf-8', errors='replace'))
+        if points is not None: slow_points[i], counts[i] = points, len(points)
+    vertex_offsets = np.concatenate(([0], np.cumsum(counts)))
+    vertices = np.empty((int(vertex_offsets[-1]), 2), dtype=np.int32)
+    fast_rows = np.flatnonzero(fast)
+    fast_starts = np.concatenate(([0], np.cumsum(counts[fast_rows])[:-1]))
+    vertices[np.arange(len(fast_vertices)) + np.repeat(vertex_offsets[fast_rows] - fast_starts, counts[fast_rows])] = fast_vertices
+    for i, points in slow_points.items(): vertices[vertex_offsets[i]:vertex_offsets[i + 1]] = points
+    return vertices, counts
+
+def parse_polygon_column(values, memory_mapped=False, chunk_rows=PARSE_CHUNK_ROWS):
+    """
+    Parses a 'polygon' string column (an object array or EncodedStrings) into a PolygonBuffer, chunk by chunk.
+    With `memory_mapped=True` the vertices are written to an anonymous temporary file and mapped back,
+    matching DetectionTable.allocate_column.
+    """
+    n = len(values)
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    spill = tempfile.TemporaryFile(prefix="ethogrid_") if memory_mapped else None
+    parts = []
+    for start in range(0, n, chunk_rows):
+        rows = slice(start, min(n, start + chunk_rows))
+        if isinstance(values, EncodedStrings):
+            bounds = values.offsets[rows.start:rows.stop + 1]
+            buffer, chunk_offsets = np.asarray(values.buffer[bounds[0]:bounds[-1]]), bounds - bounds[0]
+        else:
+            buffer, chunk_offsets = encode_strings(values[rows])
+        vertices, counts = _parse_chunk(buffer, chunk_offsets)
+        offsets[rows.start + 1:rows.stop + 1] = offsets[rows.start] + np.cumsum(counts)
+        if spill is not None: spill.write(vertices.tobytes())
+        else: parts.append(vertices)
+    if spill is None:
+        return PolygonBuffer(np.concatenate(parts) if parts else np.empty((0, 2), dtype=np.int32), offsets)
+    if offsets[-1] == 0: return PolygonBuffer(np.empty((0, 2), dtype=np.int32), offsets)
+    spill.flush()
+    return PolygonBuffer(np.memmap(spill, dtype=np.int32, mode='r', shape=(int(offsets[-1]), 2)), offsets)
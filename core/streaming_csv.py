@@ -0,0 +1,83 @@
+# EthoGrid_App/core/streaming_csv.py
+
+import os
+import csv
+import json
+
+FLUSH_ROWS = 5000
+FLUSH_FRAMES = 1000  # Bounds the work lost to a crash when frames have few or no detections.
+PROGRESS_SUFFIX = ".progress"
+
+def progress_marker_path(csv_path):
+    return csv_path + PROGRESS_SUFFIX
+
+def read_progress_marker(csv_path):
+    """Returns the progress marker of a CSV as a dict ('frames_done', 'rows', 'bytes', 'complete' and the writer's metadata), or None if there is none."""
+    try:
+        with open(progress_marker_path(csv_path), 'r', encoding='utf-8') as f: return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_durably(path, text):
+    """Replaces `path` with `text` so that a crash leaves either the old or the new content on disk."""
+    temporary_path = path + ".tmp"
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        f.write(text); f.flush(); os.fsync(f.fileno())
+    os.replace(temporary_path, path)
+
+class StreamingCsvWriter:
+    """
+    Writes the rows of a per-frame detection CSV as inference produces them, instead of keeping every row in memory
+    until the end of the video. Rows are buffered and appended in chunks of about `flush_rows` rows (or every
+    `flush_frames` frames), always at a frame boundary. After each chunk the file is fsync'd and `<csv>.progress`
+    records how many frames, rows and bytes it holds together with `metadata`, so a crash loses at most one chunk.
+
+    With `resume_from` (a marker of the same file), the CSV is truncated to the bytes the marker vouches for and
+    appended to, continuing at frame `resume_from['frames_done']`.
+
+    A `polygon_store` (core.polygon_store.PolygonStoreWriter) is flushed together with the rows it belongs to, and
+    the marker records its size as 'polygon_bytes'.
+    """
+    def __init__(self, path, header, flush_rows=FLUSH_ROWS, flush_frames=FLUSH_FRAMES, metadata=None, resume_from=None, polygon_store=None):
+        self.path, self.flush_rows, self.flush_frames = path, flush_rows, flush_frames
+        self.polygon_store = polygon_store
+        self.metadata = dict(metadata or {})
+        self._buffer, self._complete_rows = [], 0
+        if resume_from is not None:
+            self.frames_done, self.rows_written = resume_from['frames_done'], resume_from['rows']
+            with open(path, 'r+b') as f: f.truncate(resume_from['bytes'])  # Drops rows written after the last marker.
+            self._file = open(path, 'a', newline='')
+            self._writer = csv.writer(self._file)
+        else:
+            self.frames_done, self.rows_written = 0, 0
+            self._file = open(path, 'w', newline='')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(header)
+        self._flushed_frames = self.frames_done
+        self.flush()
+
+    def add_row(self, row):
+        self._buffer.append(row)
+
+    def end_frame(self, frame_idx):
+        """Marks the rows added so far as a complete frame; writes them out once enough have accumulated."""
+        self.frames_done, self._complete_rows = frame_idx + 1, len(self._buffer)
+        if len(self._buffer) >= self.flush_rows or self.frames_done - self._flushed_frames >= self.flush_frames: self.flush()
+
+    def flush(self, complete=False):
+        # Rows of a frame that was not finished (a cancelled video) are never written.
+        self._writer.writerows(self._buffer[:self._complete_rows]); self.rows_written += self._complete_rows
+        extra = {'polygon_bytes': self.polygon_store.flush(self._complete_rows)} if self.polygon_store is not None else {}
+        del self._buffer[:self._complete_rows]; self._complete_rows = 0
+        self._file.flush(); os.fsync(self._file.fileno()); self._flushed_frames = self.frames_done
+        marker = dict(self.metadata, frames_done=self.frames_done, rows=self.rows_written, bytes=self._file.tell(), complete=complete, **extra)
+        _write_durably(progress_marker_path(self.path), json.dumps(marker))
+
+    def close(self, complete=True):
+        """
+        Writes the remaining rows of complete frames and closes the file. The final marker records whether the whole
+        video was written (`complete`) or the CSV covers only its first `frames_done` frames.
+        """
+        if self._file.closed: return
+        self.flush(complete); self._file.close()
+        if self.polygon_store is not None: self.polygon_store.close()
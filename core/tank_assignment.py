@@ -0,0 +1,154 @@
+# EthoGrid_App/core/tank_assignment.py
+
+import numpy as np
+
+NO_TANK = 0  # Tank numbers are 1-based, so 0 marks "outside every cell".
+BORDER = -1  # Label of pixels that are split between cells; points there are assigned analytically.
+RASTER_MIN_POINTS = 10_000  # Below this, a lookup is not faster than the analytic path even with a built map.
+RASTER_BUILD_POINTS_PER_PIXEL = 3  # Building costs about as much as assigning this many points per pixel analytically.
+
+def transform_to_matrix(transform):
+    """
+    Returns the affine part of a QTransform as a 3x3 matrix acting on row vectors [x, y, 1],
+    i.e. the same convention QTransform.map uses.
+    """
+    return np.array([[transform.m11(), transform.m12(), 0.0],
+                     [transform.m21(), transform.m22(), 0.0],
+                     [transform.dx(), transform.dy(), 1.0]], dtype=np.float64)
+
+def inverse_matrix_for(transform):
+    """Returns the inverse affine matrix of a QTransform, or None if it is not invertible."""
+    inverse_transform, invertible = transform.inverted()
+    if not invertible: return None
+    return transform_to_matrix(inverse_transform)
+
+def map_points(xs, ys, matrix):
+    """
+    Maps coordinate arrays through an affine matrix in one vectorized pass.
+    The terms are summed in the same order as QTransform.map so the results are bit-identical
+    (a BLAS matmul may fuse multiply-adds and shift points lying exactly on a cell border).
+    """
+    xs = np.asarray(xs, dtype=np.float64); ys = np.asarray(ys, dtype=np.float64)
+    tx = xs * matrix[0, 0] + ys * matrix[1, 0] + matrix[2, 0]
+    ty = xs * matrix[0, 1] + ys * matrix[1, 1] + matrix[2, 1]
+    return tx, ty
+
+def _assign_analytic(xs, ys, inverse_matrix, video_size, cols, rows):
+    w, h = video_size
+    tx, ty = map_points(xs, ys, inverse_matrix)
+    inside = (tx >= 0) & (tx < w) & (ty >= 0) & (ty < h)
+    cell_width, cell_height = w / cols, h / rows
+    with np.errstate(invalid='ignore'):
+        col = np.clip(np.floor(np.where(inside, tx, 0.0) / cell_width), 0, cols - 1).astype(np.int32)
+        row = np.clip(np.floor(np.where(inside, ty, 0.0) / cell_height), 0, rows - 1).astype(np.int32)
+    return np.where(inside, row * cols + col + 1, NO_TANK).astype(np.int32)
+
+def assign_tanks(xs, ys, inverse_matrix, video_size, cols, rows, label_map=None):
+    """
+    Assigns every centroid to a grid cell at once.
+
+    Args:
+        xs, ys: Centroid coordinates in video pixels (NaN for missing values).
+        inverse_matrix: Inverse grid transform from `inverse_matrix_for`.
+        video_size: (width, height) of the untransformed grid.
+        cols, rows: Grid dimensions.
+        label_map: Optional CellLabelMap of the same grid. It is used when there are enough points to
+            pay for the lookup (and for building the map if it is not built yet); its arena mask always applies.
+
+    Returns:
+        int32 array of 1-based tank numbers, NO_TANK for points outside the grid.
+    """
+    xs = np.asarray(xs, dtype=np.float64); ys = np.asarray(ys, dtype=np.float64)
+    if label_map is None: return _assign_analytic(xs, ys, inverse_matrix, video_size, cols, rows)
+    w, h = video_size
+    use_raster = len(xs) >= RASTER_MIN_POINTS and (label_map.is_built or len(xs) >= w * h * RASTER_BUILD_POINTS_PER_PIXEL)
+    if not use_raster:
+        tank_numbers = _assign_analytic(xs, ys, inverse_matrix, video_size, cols, rows)
+        return tank_numbers if label_map.arena_mask is None else _apply_arena_mask(tank_numbers, xs, ys, label_map.arena_mask)
+    tank_numbers = label_map.lookup(xs, ys)
+    undecided = np.flatnonzero(tank_numbers == BORDER)
+    if len(undecided):
+        analytic = _assign_analytic(xs[undecided], ys[undecided], inverse_matrix, video_size, cols, rows)
+        tank_numbers[undecided] = analytic if label_map.arena_mask is None else _apply_arena_mask(analytic, xs[undecided], ys[undecided], label_map.arena_mask)
+    return tank_numbers
+
+def load_arena_mask(path, video_size):
+    """
+    Loads an arena mask image (non-zero pixels are arena) as a boolean array of the video resolution.
+    Raises ValueError if the image cannot be read.
+    """
+    import cv2
+    mask = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if mask is None: raise ValueError(f"Could not read arena mask image: {path}")
+    w, h = video_size
+    if mask.shape != (h, w): mask = cv2.resize(mask, (w, h), interpolation=cv2.INTER_NEAREST)
+    return mask > 0
+
+class CellLabelMap:
+    """
+    Per-pixel tank numbers of one grid, so assigning a centroid becomes a single array lookup.
+
+    Pixel (x, y) covers the square [x, x+1) x [y, y+1). It gets a tank number only if the whole square
+    lies in that cell, and NO_TANK only if the whole square lies outside the grid (or outside the arena
+    mask); pixels crossed by a cell border are BORDER and their points go through `assign_tanks`' analytic
+    path, so the raster and analytic paths always agree. The map is built lazily on first use.
+    """
+    BAND_ROWS = 128
+
+    def __init__(self, inverse_matrix, video_size, cols, rows, arena_mask=None):
+        self.inverse_matrix = inverse_matrix
+        self.video_size = video_size
+        self.cols, self.rows = cols, rows
+        self.arena_mask = arena_mask
+        self._labels = None
+
+    @property
+    def is_built(self):
+        return self._labels is not None
+
+    @property
+    def labels(self):
+        if self._labels is None: self._labels = self._build()
+        return self._labels
+
+    def _build(self):
+        w, h = self.video_size
+        m = self.inverse_matrix
+        cell_width, cell_height = w / self.cols, h / self.rows
+        margin = 1e-6  # Far above the rounding error of map_points, so floor() cannot differ inside a labelled pixel.
+        # The map is affine, so over a pixel square tx and ty reach their extremes at the corners,
+        # i.e. at the top-left value plus the negative (min) or positive (max) parts of the x and y steps.
+        tx_low, tx_high = min(0.0, m[0, 0]) + min(0.0, m[1, 0]) - margin, max(0.0, m[0, 0]) + max(0.0, m[1, 0]) + margin
+        ty_low, ty_high = min(0.0, m[0, 1]) + min(0.0, m[1, 1]) - margin, max(0.0, m[0, 1]) + max(0.0, m[1, 1]) + margin
+        labels = np.empty((h, w), dtype=np.int16)
+        pixel_x = np.arange(w, dtype=np.float64)
+        for y0 in range(0, h, self.BAND_ROWS):
+            y1 = min(h, y0 + self.BAND_ROWS)
+            tx, ty = map_points(pixel_x[None, :], np.arange(y0, y1, dtype=np.float64)[:, None], m)
+            tx_min, tx_max, ty_min, ty_max = tx + tx_low, tx + tx_high, ty + ty_low, ty + ty_high
+            col, row = np.floor(tx_min / cell_width), np.floor(ty_min / cell_height)
+            inside = (tx_min >= 0) & (tx_max < w) & (ty_min >= 0) & (ty_max < h) & (col == np.floor(tx_max / cell_width)) & (row == np.floor(ty_max / cell_height))
+            outside = (tx_max < 0) | (tx_min >= w) | (ty_max < 0) | (ty_min >= h)
+            tank = np.clip(row, 0, self.rows - 1) * self.cols + np.clip(col, 0, self.cols - 1) + 1
+            labels[y0:y1] = np.where(inside, tank, np.where(outside, NO_TANK, BORDER))
+        if self.arena_mask is not None: labels[~self.arena_mask] = NO_TANK
+        return labels
+
+    def lookup(self, xs, ys):
+        """Returns int32 tank numbers for the points, BORDER where the analytic path has to decide."""
+        w, h = self.video_size
+        xs = np.asarray(xs, dtype=np.float64); ys = np.asarray(ys, dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            valid = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+        flat_index = np.where(valid, ys, 0).astype(np.intp) * w + np.where(valid, xs, 0).astype(np.intp)
+        result = self.labels.ravel().take(flat_index).astype(np.int32)
+        result[~valid] = BORDER
+        return result
+
+def _apply_arena_mask(tank_numbers, xs, ys, arena_mask):
+    h, w = arena_mask.shape
+    with np.errstate(invalid='ignore'):
+        valid = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+    in_arena = np.zeros(len(xs), dtype=bool)
+    in_arena[valid] = arena_mask[ys[valid].astype(np.intp), xs[valid].astype(np.intp)]
+    return np.where(in_arena, tank_numbers, NO_TANK).astype(np.int32)
@@ -0,0 +1,51 @@
+# EthoGrid_App/core/tank_tiles.py
+
+import numpy as np
+
+from core.grid_manager import transform_from_settings, read_settings_file
+from core.tank_assignment import CellLabelMap, assign_tanks, inverse_matrix_for, transform_to_matrix, map_points, load_arena_mask
+
+DEFAULT_TILE_SIZE = 320  # Model input size for one tank crop; a tank of a 4K frame is about this size, so small fish keep their pixels.
+TILE_MARGIN = 0.1  # Crops extend this fraction of a cell beyond it, so fish on the cell border are seen whole.
+
+class TankTiles:
+    """
+    Crops the tanks of a saved grid out of each frame so that the model sees every tank at close to full resolution.
+    Each crop is the axis-aligned bounding box of a (possibly rotated) cell plus a TILE_MARGIN border, clipped to the
+    frame. Crops of neighbouring tanks overlap, so a detection is kept only from the crop of the tank its centroid is
+    assigned to, which also gives every detection its tank number. Raises if the settings file cannot be read or its
+    grid is degenerate.
+    """
+    def __init__(self, video_size, settings_file):
+        grid_settings, transform_settings, arena_mask_path = read_settings_file(settings_file)
+        self.video_size = video_size
+        self.cols, self.rows = grid_settings['cols'], grid_settings['rows']
+        transform = transform_from_settings(transform_settings, video_size)
+        self.inverse_matrix = inverse_matrix_for(transform)
+        if self.inverse_matrix is None: raise ValueError("The grid of the settings file is degenerate.")
+        arena_mask = load_arena_mask(arena_mask_path, video_size) if arena_mask_path else None
+        self.label_map = CellLabelMap(self.inverse_matrix, video_size, self.cols, self.rows, arena_mask)
+        self.regions = self._regions(transform_to_matrix(transform))
+
+    def _regions(self, matrix):
+        """(tank_number, x0, y0, x1, y1) of every cell that overlaps the frame, in tank order."""
+        w, h = self.video_size
+        cell_width, cell_height = w / self.cols, h / self.rows
+        regions = []
+        for row in range(self.rows):
+            for col in range(self.cols):
+                gx = np.array([col - TILE_MARGIN, col + 1 + TILE_MARGIN] * 2) * cell_width
+                gy = np.array([row - TILE_MARGIN] * 2 + [row + 1 + TILE_MARGIN] * 2) * cell_height
+                xs, ys = map_points(gx, gy, matrix)
+                x0, y0 = max(0, int(np.floor(xs.min()))), max(0, int(np.floor(ys.min())))
+                x1, y1 = min(w, int(np.ceil(xs.max()))), min(h, int(np.ceil(ys.max())))
+                if x1 > x0 and y1 > y0: regions.append((row * self.cols + col + 1, x0, y0, x1, y1))
+        return regions
+
+    def crops(self, frame):
+        """Views of the tank regions of `frame`, in the order of `regions`."""
+        return [frame[y0:y1, x0:x1] for _, x0, y0, x1, y1 in self.regions]
+
+    def assign(self, xs, ys):
+        """Tank numbers of frame coordinates, honouring the arena mask (NO_TANK outside it and the grid)."""
+        return assign_tanks(xs, ys, self.inverse_matrix, self.video_size, self.cols, self.rows, self.label_map)
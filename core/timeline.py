@@ -0,0 +1,141 @@
+# EthoGrid_App/core/timeline.py
+
+from collections.abc import Mapping
+import numpy as np
+
+from core.tank_assignment import NO_TANK
+
+class TimelineSegments(Mapping):
+    """
+    Behavior segments of every tank, stored as parallel arrays sorted by tank and start frame.
+    A segment is a run of consecutive frames in which a tank's behavior stays the same.
+
+    It behaves like the {tank_number: [(start, end, behavior), ...]} dict the widgets draw from,
+    while `tank_arrays` gives the raw (start, end, class_id) arrays of one tank.
+    """
+    def __init__(self, tank, start, end, class_id, class_names):
+        self.tank = np.asarray(tank, dtype=np.int16)
+        self.start = np.asarray(start, dtype=np.int32)
+        self.end = np.asarray(end, dtype=np.int32)
+        self.class_id = np.asarray(class_id, dtype=np.int16)
+        self.class_names = list(class_names)
+        self.tank_ids, first_rows = np.unique(self.tank, return_index=True)
+        self._offsets = np.append(first_rows, len(self.tank))
+
+    @classmethod
+    def empty(cls, class_names=()):
+        return cls([], [], [], [], class_names)
+
+    @classmethod
+    def from_dict(cls, segments_by_tank):
+        """Builds the array form of a {tank_number: [(start, end, behavior), ...]} dict."""
+        class_ids, rows = {}, []
+        for tank_id in sorted(segments_by_tank):
+            rows.extend((tank_id, start, end, class_ids.setdefault(behavior, len(class_ids))) for start, end, behavior in segments_by_tank[tank_id])
+        if not rows: return cls.empty()
+        tank, start, end, class_id = zip(*rows)
+        return cls(tank, start, end, class_id, list(class_ids))
+
+    @classmethod
+    def concatenate(cls, parts):
+        """
+        Joins the segments built from consecutive, frame-aligned chunks of one table.
+        A run that continues from one part into the next becomes a single segment.
+        """
+        class_names = parts[0].class_names if parts else ()
+        parts = [part for part in parts if part.num_segments]
+        if not parts: return cls.empty(class_names)
+        if len(parts) == 1: return parts[0]
+        order = np.argsort(np.concatenate([part.tank for part in parts]), kind='stable')
+        tank, start, end, class_id = (np.concatenate([getattr(part, name) for part in parts])[order] for name in ('tank', 'start', 'end', 'class_id'))
+        keep = np.ones(len(tank), dtype=bool)
+        keep[1:] = (tank[1:] != tank[:-1]) | (start[1:] != end[:-1] + 1) | (class_id[1:] != class_id[:-1])
+        first = np.flatnonzero(keep)
+        last = np.append(first[1:], len(tank)) - 1
+        return cls(tank[first], start[first], end[last], class_id[first], class_names)
+
+    @property
+    def num_segments(self):
+        return len(self.tank)
+
+    def _tank_slice(self, tank_id):
+        pos = int(np.searchsorted(self.tank_ids, tank_id))
+        if pos == len(self.tank_ids) or self.tank_ids[pos] != tank_id: return None
+        return slice(int(self._offsets[pos]), int(self._offsets[pos + 1]))
+
+    def tank_arrays(self, tank_id):
+        """Returns the (start, end, class_id) arrays of one tank (empty arrays if it has no segments)."""
+        rows = self._tank_slice(tank_id) or slice(0, 0)
+        return self.start[rows], self.end[rows], self.class_id[rows]
+
+    def after_frame(self, frame):
+        """Returns the parts of the segments that lie after `frame`."""
+        keep = self.end > frame
+        return TimelineSegments(self.tank[keep], np.maximum(self.start[keep], frame + 1), self.end[keep], self.class_id[keep], self.class_names)
+
+    def with_class_names(self, class_names):
+        """Returns the same segments with class ids taken from `class_names` (names missing there are appended)."""
+        if list(class_names) == self.class_names: return self
+        index = {name: i for i, name in enumerate(class_names)}
+        remap = np.array([index.setdefault(name, len(index)) for name in self.class_names], dtype=np.int16)
+        return TimelineSegments(self.tank, self.start, self.end, remap[self.class_id] if len(remap) else self.class_id, list(index))
+
+    def dominant_classes(self, tank_id, total_frames, columns):
+        """
+        Downsamples one tank's timeline to `columns` equal-width columns over frames [0, total_frames).
+        Returns the class id covering the most frames of each column, or -1 where the tank has no segments.
+        """
+        starts, ends, class_ids = self.tank_arrays(tank_id)
+        bounds = np.arange(columns + 1) * (total_frames / columns)
+        best_class, best_coverage = np.full(columns, -1, dtype=np.int32), np.zeros(columns)
+        for class_id in np.unique(class_ids).tolist():
+            selected = class_ids == class_id
+            seg_start, seg_stop = starts[selected].astype(np.float64), ends[selected] + 1.0
+            # Frames of this class before each bound: whole segments that end before it, plus the part of the next one.
+            done = np.searchsorted(seg_stop, bounds, side='right')
+            covered = np.concatenate(([0.0], np.cumsum(seg_stop - seg_start)))[done]
+            partial = done < len(seg_start)
+            covered[partial] += np.clip(bounds[partial] - seg_start[done[partial]], 0.0, None)
+            coverage = np.diff(covered)
+            better = coverage > best_coverage
+            best_class[better], best_coverage[better] = class_id, coverage[better]
+        return best_class
+
+    def __getitem__(self, tank_id):
+        rows = self._tank_slice(tank_id)
+        if rows is None: raise KeyError(tank_id)
+        names = self.class_names
+        return [(start, end, names[class_id]) for start, end, class_id in zip(self.start[rows].tolist(), self.end[rows].tolist(), self.class_id[rows].tolist())]
+
+    def __contains__(self, tank_id):
+        return self._tank_slice(tank_id) is not None
+
+    def __iter__(self):
+        return iter(self.tank_ids.tolist())
+
+    def __len__(self):
+        return len(self.tank_ids)
+
+def build_segments(frame_idx, tank_number, class_id, class_names):
+    """
+    Run-length encodes per-detection behavior labels into the timeline segments of all tanks at once.
+
+    Rows must be sorted by frame (as in a DetectionTable). When a tank has several detections in one frame,
+    the last one decides its behavior there; unassigned detections (NO_TANK) are ignored.
+    """
+    tank_number = np.asarray(tank_number)
+    assigned = np.flatnonzero(tank_number != NO_TANK)
+    if len(assigned) == 0: return TimelineSegments.empty(class_names)
+    # A stable sort by tank keeps every tank's rows in frame order.
+    order = assigned[np.argsort(tank_number[assigned], kind='stable')]
+    tank, frame, behavior = tank_number[order], np.asarray(frame_idx)[order], np.asarray(class_id)[order]
+
+    last_in_frame = np.ones(len(order), dtype=bool)
+    last_in_frame[:-1] = (tank[1:] != tank[:-1]) | (frame[1:] != frame[:-1])
+    tank, frame, behavior = tank[last_in_frame], frame[last_in_frame], behavior[last_in_frame]
+
+    run_start = np.ones(len(tank), dtype=bool)
+    run_start[1:] = (tank[1:] != tank[:-1]) | (frame[1:] != frame[:-1] + 1) | (behavior[1:] != behavior[:-1])
+    first = np.flatnonzero(run_start)
+    last = np.append(first[1:], len(tank)) - 1
+    return TimelineSegments(tank[first], frame[first], frame[last], behavior[first], class_names)
@@ -0,0 +1,113 @@
+# EthoGrid_App/core/video_scheduler.py
+
+import os
+import time
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import cv2
+
+from core.stopwatch import Stopwatch
+
+PROGRESS_INTERVAL = 0.25
+THREAD_LIMIT_VARIABLES = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+_event_queue, _stop_event = None, None
+
+def default_parallel_videos():
+    """Videos processed at once by default: one process per four cores, so that every model keeps a few intra-op threads."""
+    return max(1, min(8, (os.cpu_count() or 1) // 4))
+
+def threads_per_process(processes):
+    return max(1, (os.cpu_count() or 1) // processes)
+
+def limit_threads(threads):
+    """Caps the intra-op threads of OpenCV and PyTorch in this process; the environment variables cover libraries loaded later."""
+    for name in THREAD_LIMIT_VARIABLES: os.environ[name] = str(threads)
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+def _init_process(event_queue, stop_event, threads):
+    global _event_queue, _stop_event
+    _event_queue, _stop_event = event_queue, stop_event
+    limit_threads(threads)
+
+def _run_video(process_video, index, video_path):
+    last_progress = [0.0]
+    def emit(kind, *args):
+        if kind == 'progress':
+            now = time.monotonic()
+            if now - last_progress[0] < PROGRESS_INTERVAL and args[0] != args[1]: return
+            last_progress[0] = now
+        _event_queue.put((kind, index) + args)
+    emit('started')
+    process_video(video_path, emit, _stop_event.is_set)
+
+def _frame_count(video_path):
+    cap = cv2.VideoCapture(video_path)
+    count = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT))) if cap.isOpened() else 0
+    cap.release()
+    return count
+
+def schedule_videos(worker, process_video, processes):
+    """
+    Runs `process_video(video_path, emit, should_stop)` for every file of `worker.video_files`, `processes` videos at a
+    time, each in its own spawned process whose intra-op threads are capped to its share of the CPU cores.
+    `process_video` must be picklable (a module-level function or a functools.partial of one). It reports through
+    `emit('log', message)` and `emit('progress', frames_done, total_frames)`, and stops once `should_stop()` is True.
+
+    The events of all running videos are aggregated into the worker's overall_progress, file_progress, time_updated,
+    speed_updated and log_message signals; clearing `worker.is_running` cancels the videos that have not finished.
+    """
+    videos = worker.video_files
+    names = [os.path.basename(path) for path in videos]
+    frame_counts = [_frame_count(path) for path in videos]
+    done, running, completed = [0] * len(videos), [], set()
+    context = multiprocessing.get_context('spawn')  # Never fork a process that runs Qt threads.
+    event_queue, stop_event = context.Queue(), context.Event()
+    stopwatch = Stopwatch(); stopwatch.start()
+    speed_frames, speed_time = 0, 0.0
+
+    def handle_events():
+        changed = False
+        try:
+            while True:
+                kind, index, *args = event_queue.get_nowait()
+                # Events travel separately from results and may arrive after their video has completed.
+                if kind == 'started' and index not in completed: running.append(index); changed = True
+                elif kind == 'log': worker.log_message.emit(f"[{names[index]}] {args[0]}")
+                elif kind == 'progress' and index not in completed:
+                    done[index] = args[0]
+                    if args[1] > 0: frame_counts[index] = args[1]
+        except queue.Empty:
+            pass
+        return changed
+
+    worker.log_message.emit(f"Processing {len(videos)} videos, {processes} at a time with {threads_per_process(processes)} threads each.")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=_init_process, initargs=(event_queue, stop_event, threads_per_process(processes))) as pool:
+        futures = {pool.submit(_run_video, process_video, index, path): index for index, path in enumerate(videos)}
+        pending = set(futures)
+        while pending:
+            finished, pending = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+            changed = handle_events()
+            for future in finished:
+                index = futures[future]; completed.add(index); changed = True
+                if index in running: running.remove(index)
+                if not future.cancelled() and future.exception() is not None: worker.log_message.emit(f"[ERROR] Failed during processing of {names[index]}: {future.exception()}")
+                done[index] = frame_counts[index]  # Failed and cancelled videos no longer count towards the remaining time.
+            if changed and running: worker.overall_progress.emit(len(completed) + len(running), len(videos), ", ".join(names[index] for index in running))
+            if not worker.is_running and not stop_event.is_set():
+                stop_event.set()
+                for future in pending: future.cancel()
+            running_done, running_total = sum(done[index] for index in running), sum(frame_counts[index] for index in running)
+            if running_total > 0: worker.file_progress.emit(int(running_done * 100 / running_total), running_done, running_total)
+            current_time = stopwatch.get_elapsed_time(as_float=True)
+            worker.time_updated.emit(stopwatch.get_elapsed_time(), stopwatch.get_etr(sum(done), sum(frame_counts)))
+            if current_time > speed_time + 1:
+                worker.speed_updated.emit((sum(done) - speed_frames) / (current_time - speed_time)); speed_frames, speed_time = sum(done), current_time
+    handle_events()
+    if worker.is_running: worker.file_progress.emit(100, sum(done), sum(frame_counts))
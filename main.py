@@ -1,11 +1,15 @@
 # EthoGrid_App/main.py
 
 import sys
+import multiprocessing
 from PyQt5 import QtWidgets, QtCore
 
 from main_window import VideoPlayer
 
 if __name__ == "__main__":
+    # Needed by frozen builds, whose parallel video export and multi-video inference start worker processes from this executable
+    multiprocessing.freeze_support()
+
     # Set HighDPI scaling attributes
     QtWidgets.QApplication.setAttribute(QtCore.Qt.AA_EnableHighDpiScaling, True)
     QtWidgets.QApplication.setAttribute(QtCore.Qt.AA_UseHighDpiPixmaps, True)
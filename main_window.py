@@ -3,7 +3,6 @@
 import os
 import sys
 import cv2
-import csv
 import json
 import numpy as np
 from PyQt5 import QtWidgets, QtGui, QtCore
@@ -13,13 +12,16 @@ from PyQt5.QtGui import QImage, QPixmap
 # Local imports
 from workers.video_loader import VideoLoader
 from workers.video_saver import VideoSaver
-from workers.detection_processor import DetectionProcessor
+from workers.detection_processor import DetectionProcessor, assign_detections
 from widgets.timeline_widget import TimelineWidget
 from core.grid_manager import GridManager
 from widgets.batch_dialog import BatchProcessDialog
 from widgets.yolo_inference_dialog import YoloInferenceDialog
 from widgets.yolo_segmentation_dialog import YoloSegmentationDialog
 from core.data_exporter import export_centroid_csv, export_to_excel_sheets, PANDAS_AVAILABLE
+from core.detection_loader import load_detection_file
+from core.tank_assignment import NO_TANK, inverse_matrix_for
+from core.parallel_export import default_worker_count, ffmpeg_path
 
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
@@ -30,6 +32,8 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 class VideoPlayer(QtWidgets.QWidget):
+    PREVIEW_WINDOW_FRAMES = 150  # Frames on each side of the current one that are re-assigned live while the grid moves.
+
     def __init__(self, parent=None):
         super(VideoPlayer, self).__init__(parent)
         self.setWindowTitle("EthoGrid")
@@ -38,7 +42,8 @@ class VideoPlayer(QtWidgets.QWidget):
         if os.path.exists(logo_path): self.setWindowIcon(QtGui.QIcon(logo_path))
         else: print(f"Warning: Logo not found at '{logo_path}'.")
 
-        self.raw_detections, self.processed_detections, self.csv_headers = {}, {}, []
+        self.raw_detections, self.processed_detections, self.csv_headers = None, None, []
+        self.preview_detections, self.preview_key, self.processed_key, self.processing_key = None, None, None, None
         self.current_frame, self.current_frame_idx, self.total_frames = None, 0, 0
         self.video_size = (0, 0); self.behavior_colors = {}
         self.predefined_colors = [(31,119,180),(255,127,14),(44,160,44),(214,39,40),(148,103,189),(140,86,75),(227,119,194),(127,127,127),(188,189,34),(23,190,207)]
@@ -92,6 +97,8 @@ class VideoPlayer(QtWidgets.QWidget):
             self.save_centroid_csv_btn.setToolTip("Install 'pandas' to enable this feature.")
             self.save_excel_btn.setToolTip("Install 'pandas' and 'openpyxl' to enable this feature.")
         self.save_settings_btn, self.load_settings_btn = QtWidgets.QPushButton("💾 Save Settings"), QtWidgets.QPushButton("📂 Load Settings")
+        self.set_arena_mask_btn, self.clear_arena_mask_btn = QtWidgets.QPushButton("🎭 Set Arena Mask"), QtWidgets.QPushButton("Clear Mask")
+        self.set_arena_mask_btn.setToolTip("Restricts tank assignment to the white (non-zero) pixels of a mask image of the video's size; saved with the settings."); self.clear_arena_mask_btn.setEnabled(False)
         
         main_layout = QtWidgets.QVBoxLayout(self)
         processing_toolbar = QtWidgets.QHBoxLayout();
@@ -99,7 +106,7 @@ class VideoPlayer(QtWidgets.QWidget):
         if os.path.exists(logo_path): logo_label.setPixmap(QtGui.QPixmap(logo_path).scaled(32, 32, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation))
         # processing_toolbar.addWidget(logo_label)
         processing_toolbar.addWidget(self.inference_btn); processing_toolbar.addWidget(self.segmentation_btn); processing_toolbar.addWidget(self.batch_process_btn); processing_toolbar.addStretch()
-        file_toolbar = QtWidgets.QHBoxLayout(); file_toolbar.addWidget(self.load_video_btn); file_toolbar.addWidget(self.load_csv_btn); file_toolbar.addWidget(self.save_csv_btn); file_toolbar.addWidget(self.save_centroid_csv_btn); file_toolbar.addWidget(self.save_excel_btn); file_toolbar.addWidget(self.export_video_btn); file_toolbar.addStretch(); file_toolbar.addWidget(self.load_settings_btn); file_toolbar.addWidget(self.save_settings_btn)
+        file_toolbar = QtWidgets.QHBoxLayout(); file_toolbar.addWidget(self.load_video_btn); file_toolbar.addWidget(self.load_csv_btn); file_toolbar.addWidget(self.save_csv_btn); file_toolbar.addWidget(self.save_centroid_csv_btn); file_toolbar.addWidget(self.save_excel_btn); file_toolbar.addWidget(self.export_video_btn); file_toolbar.addStretch(); file_toolbar.addWidget(self.set_arena_mask_btn); file_toolbar.addWidget(self.clear_arena_mask_btn); file_toolbar.addWidget(self.load_settings_btn); file_toolbar.addWidget(self.save_settings_btn)
         main_layout.addLayout(processing_toolbar); main_layout.addLayout(file_toolbar)
         
         main_h_layout = QtWidgets.QHBoxLayout(); left_pane_layout = QtWidgets.QVBoxLayout(); left_pane_layout.addWidget(self.video_label, stretch=1); left_pane_layout.addWidget(self.status_label)
@@ -125,6 +132,7 @@ class VideoPlayer(QtWidgets.QWidget):
         self.save_excel_btn.clicked.connect(self.save_to_excel)
         self.save_settings_btn.clicked.connect(self.save_settings)
         self.load_settings_btn.clicked.connect(self.load_settings)
+        self.set_arena_mask_btn.clicked.connect(self.choose_arena_mask); self.clear_arena_mask_btn.clicked.connect(lambda: self.apply_arena_mask(None))
         self.play_btn.clicked.connect(self.start_playback)
         self.pause_btn.clicked.connect(self.pause_playback)
         self.stop_btn.clicked.connect(self.stop_playback)
@@ -167,35 +175,21 @@ class VideoPlayer(QtWidgets.QWidget):
         if not file_path:
             return
         try:
-            detections = {}
-            with open(file_path, newline="", encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                self.csv_headers = reader.fieldnames[:]
-                
-                coord_cols = ['x1', 'y1', 'x2', 'y2', 'cx', 'cy']
-
-                for row in reader:
-                    idx = int(float(row["frame_idx"]))
-                    
-                    for col in coord_cols:
-                        if col in row and row[col]:
-                            try:
-                                row[col] = float(row[col])
-                            except (ValueError, TypeError):
-                                row[col] = None
-
-                    detections.setdefault(idx, []).append(row)
-
+            self.status_label.setText("Loading detections..."); QtWidgets.QApplication.processEvents()
+            detections, load_stats = load_detection_file(file_path, memory_map=True)
+            self.status_label.setText("")
+            self.csv_headers = detections.csv_headers[:]
             self.raw_detections = detections
-            self.processed_detections = {}
+            self.processed_detections = self.preview_detections = self.processed_key = None
             self.behavior_colors.clear()
-            all_behaviors = sorted(list(set(det['class_name'] for dets in self.raw_detections.values() for det in dets)))
+            all_behaviors = sorted(set(self.raw_detections.class_names))
             for behavior in all_behaviors:
                 self.get_color_for_behavior(behavior)
             self.update_legend_widget()
             self.start_detection_processing()
-            QtWidgets.QMessageBox.information(self, "Success", f"Loaded {len(detections)} frames of detections.")
+            QtWidgets.QMessageBox.information(self, "Success", f"Loaded {detections.num_frames} frames of detections.\n{load_stats.summary()}")
         except Exception as e:
+            self.status_label.setText("")
             self.show_error(f"Error loading detections: {str(e)}")
 
     def save_detections_with_tanks(self):
@@ -203,19 +197,7 @@ class VideoPlayer(QtWidgets.QWidget):
         file_path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Save Detections with Tank Info", "detections_with_tanks.csv", "CSV Files (*.csv)")
         if not file_path: return
         try:
-            all_detections = [det for frame_dets in self.processed_detections.values() for det in frame_dets]
-            new_headers = self.csv_headers[:] if self.csv_headers and all_detections else list(all_detections[0].keys())
-            for key in ['tank_number', 'cx', 'cy']:
-                if key not in new_headers: new_headers.append(key)
-            with open(file_path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=new_headers, extrasaction='ignore')
-                writer.writeheader()
-                for det in all_detections:
-                    row_to_write = det.copy()
-                    for key in ['x1', 'y1', 'x2', 'y2', 'cx', 'cy']:
-                        if key in row_to_write and isinstance(row_to_write[key], float):
-                            row_to_write[key] = f"{row_to_write[key]:.4f}"
-                    writer.writerow(row_to_write)
+            self.processed_detections.write_csv(file_path)
             QtWidgets.QMessageBox.information(self, "Success", f"Successfully saved to:\n{file_path}")
         except Exception as e: self.show_error(f"Failed to save file: {str(e)}")
 
@@ -247,6 +229,9 @@ class VideoPlayer(QtWidgets.QWidget):
         if not self.video_loader or not self.video_loader.video_path or not self.processed_detections: self.show_error("Please load a video and detections first."); return
         dialog = QtWidgets.QDialog(self); dialog.setWindowTitle("Export Video Options"); layout = QtWidgets.QVBoxLayout(dialog)
         checkbox = QtWidgets.QCheckBox("Include Overlays (Legend and Timeline)"); checkbox.setChecked(True); layout.addWidget(checkbox)
+        workers_spin = QtWidgets.QSpinBox(); workers_spin.setRange(1, 32); workers_spin.setValue(default_worker_count() if ffmpeg_path() else 1); workers_spin.setEnabled(ffmpeg_path() is not None)
+        workers_spin.setToolTip("Number of processes that render and encode parts of the video in parallel." if ffmpeg_path() else "Parallel export needs ffmpeg on the PATH to join the video parts.")
+        workers_layout = QtWidgets.QHBoxLayout(); workers_layout.addWidget(QtWidgets.QLabel("Worker Processes:")); workers_layout.addWidget(workers_spin); workers_layout.addStretch(); layout.addLayout(workers_layout)
         button_box = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel); button_box.accepted.connect(dialog.accept); button_box.rejected.connect(dialog.reject); layout.addWidget(button_box)
         if not dialog.exec_() == QtWidgets.QDialog.Accepted: return
         draw_overlays_option = checkbox.isChecked()
@@ -254,14 +239,16 @@ class VideoPlayer(QtWidgets.QWidget):
         file_path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Save Annotated Video", default_name, "MP4 Video Files (*.mp4);;AVI Video Files (*.avi)")
         if not file_path: return
         self.toggle_controls(False); self.progress_bar.setValue(0); self.progress_bar.setFormat("Exporting video... %p%"); self.progress_bar.setTextVisible(True)
-        self.video_saver = VideoSaver(source_video_path=self.video_loader.video_path, output_video_path=file_path, detections=self.processed_detections, grid_settings=self.grid_settings, grid_transform=self.grid_manager.transform, behavior_colors=self.behavior_colors, video_size=self.video_size, fps=self.video_loader.fps, line_thickness=self.line_thickness, selected_cells=self.selected_cells, timeline_segments=self.timeline_widget.timeline_segments, draw_grid=False, draw_overlays=draw_overlays_option, parent=self)
+        self.video_saver = VideoSaver(source_video_path=self.video_loader.video_path, output_video_path=file_path, detections=self.processed_detections, grid_settings=self.grid_settings, grid_transform=self.grid_manager.transform, behavior_colors=self.behavior_colors, video_size=self.video_size, fps=self.video_loader.fps, line_thickness=self.line_thickness, selected_cells=self.selected_cells, timeline_segments=self.timeline_widget.timeline_segments, draw_grid=False, draw_overlays=draw_overlays_option, workers=workers_spin.value(), parent=self)
         self.video_saver.progress_updated.connect(self.progress_bar.setValue); self.video_saver.finished.connect(self.on_video_export_finished); self.video_saver.error_occurred.connect(self.on_video_export_error); self.video_saver.start()
 
     def _update_button_states(self):
         is_processing = self.detection_processor is not None and self.detection_processor.isRunning()
         self.load_video_btn.setEnabled(not is_processing); self.load_csv_btn.setEnabled(not is_processing); self.batch_process_btn.setEnabled(not is_processing); self.inference_btn.setEnabled(not is_processing); self.segmentation_btn.setEnabled(not is_processing)
         can_save = self.total_frames > 0 and bool(self.processed_detections) and not is_processing
-        self.save_csv_btn.setEnabled(can_save); self.export_video_btn.setEnabled(can_save); self.save_centroid_csv_btn.setEnabled(can_save and PANDAS_AVAILABLE); self.save_excel_btn.setEnabled(can_save and PANDAS_AVAILABLE); self.save_settings_btn.setEnabled(True); self.toggle_controls(not is_processing)
+        self.save_csv_btn.setEnabled(can_save); self.export_video_btn.setEnabled(can_save); self.save_centroid_csv_btn.setEnabled(can_save and PANDAS_AVAILABLE); self.save_excel_btn.setEnabled(can_save and PANDAS_AVAILABLE); self.save_settings_btn.setEnabled(True); self.clear_arena_mask_btn.setEnabled(self.grid_manager.arena_mask_path is not None)
+        # Playback stays usable while tanks are re-assigned in the background (see _display_detections); only an export locks it.
+        self.toggle_controls(self.video_saver is None or not self.video_saver.isRunning())
 
     def update_display(self):
         if self.current_frame is None: return
@@ -272,26 +259,41 @@ class VideoPlayer(QtWidgets.QWidget):
             for i in range(self.grid_settings['rows'] + 1): cv2.line(frame, transform_point(0,h*i/self.grid_settings['rows']), transform_point(w,h*i/self.grid_settings['rows']), (0,255,0), self.line_thickness)
             center_px = self.grid_manager.center.x() * w, self.grid_manager.center.y() * h; cv2.circle(frame, (int(center_px[0]), int(center_px[1])), 8, (0, 0, 255), -1)
             has_drawn_mask = False
-            if self.current_frame_idx in self.processed_detections:
-                for det in self.processed_detections[self.current_frame_idx]:
-                    if det.get('tank_number') is not None and (not self.selected_cells or str(det['tank_number']) in self.selected_cells):
-                        color_bgr = self.behavior_colors.get(det["class_name"], (128,128,128))[::-1]; x1, y1 = float(det["x1"]), float(det["y1"])
-                        if 'polygon' in det and det['polygon']:
-                            try:
-                                poly_points = np.array([list(map(int, p.split(','))) for p in det['polygon'].split(';')], dtype=np.int32)
-                                cv2.fillPoly(overlay, [poly_points], color_bgr); has_drawn_mask = True
-                            except: 
-                                x2, y2 = float(det["x2"]), float(det["y2"]); cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color_bgr, 2)
-                        else:
-                            x2, y2 = float(det["x2"]), float(det["y2"]); cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color_bgr, 2)
-                        if det.get('cx') is not None and det.get('cy') is not None:
-                            cx_float, cy_float = float(det['cx']), float(det['cy']); cv2.circle(frame, (int(round(cx_float)), int(round(cy_float))), 8, (0, 0, 255), -1)
-                        label = f"{det['tank_number']}"; font_face, f_scale, f_thick = cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2; (t_w, t_h), _ = cv2.getTextSize(label, font_face, f_scale, f_thick)
-                        cv2.rectangle(frame, (int(x1), int(y1) - t_h - 12), (int(x1) + t_w, int(y1)), color_bgr, -1); cv2.putText(frame, label, (int(x1), int(y1) - 7), font_face, f_scale, (0,0,0), f_thick, cv2.LINE_AA)
+            detections = self._display_detections()
+            frame_dets = detections.frame_records(self.current_frame_idx, 'tank_number', 'class_name', 'x1', 'y1', 'x2', 'y2', 'cx', 'cy', 'polygon_points') if detections else []
+            for tank_number, class_name, x1, y1, x2, y2, cx, cy, poly_points in frame_dets:
+                if tank_number != NO_TANK and (not self.selected_cells or str(tank_number) in self.selected_cells):
+                    color_bgr = self.behavior_colors.get(class_name, (128,128,128))[::-1]
+                    if poly_points is not None: cv2.fillPoly(overlay, [poly_points], color_bgr); has_drawn_mask = True
+                    else: cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color_bgr, 2)
+                    if cx == cx and cy == cy:
+                        cv2.circle(frame, (int(round(cx)), int(round(cy))), 8, (0, 0, 255), -1)
+                    label = f"{tank_number}"; font_face, f_scale, f_thick = cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2; (t_w, t_h), _ = cv2.getTextSize(label, font_face, f_scale, f_thick)
+                    cv2.rectangle(frame, (int(x1), int(y1) - t_h - 12), (int(x1) + t_w, int(y1)), color_bgr, -1); cv2.putText(frame, label, (int(x1), int(y1) - 7), font_face, f_scale, (0,0,0), f_thick, cv2.LINE_AA)
             if has_drawn_mask: frame = cv2.addWeighted(overlay, 0.4, frame, 0.6, 0)
             rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB); qimg = QImage(rgb.data, w, h, w * 3, QImage.Format_RGB888); pixmap = QPixmap.fromImage(qimg).scaled(self.video_label.size(), QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation); self.video_label.setPixmap(pixmap)
         except Exception as e: print(f"Error updating display: {e}")
 
+    def _assignment_key(self):
+        return (QtGui.QTransform(self.grid_manager.transform), self.grid_settings['cols'], self.grid_settings['rows'], self.video_size, self.grid_manager.arena_mask_path)
+
+    def _display_detections(self):
+        """
+        Returns the detections to draw for the current frame. While the full re-assignment is pending or running,
+        only a window of frames around the current one is re-assigned here, so grid drags update at interactive rates.
+        """
+        if not self.raw_detections or self.video_size[0] == 0: return self.processed_detections
+        key = self._assignment_key()
+        if self.processed_detections and self.processed_key == key: return self.processed_detections
+        window, frame_idx = self.preview_detections, self.current_frame_idx
+        if window is None or self.preview_key != key or not (window.first_frame <= frame_idx < window.first_frame + len(window.frame_offsets) - 1):
+            inverse_matrix = inverse_matrix_for(self.grid_manager.transform)
+            if inverse_matrix is None: return None
+            window = self.raw_detections.frame_window(frame_idx - self.PREVIEW_WINDOW_FRAMES, frame_idx + self.PREVIEW_WINDOW_FRAMES)
+            cxs, cys, tank_numbers = assign_detections(window, inverse_matrix, self.video_size, self.grid_settings, label_map=self.grid_manager.label_map(self.grid_settings['cols'], self.grid_settings['rows']))
+            self.preview_detections, self.preview_key = window.with_columns(cx=cxs, cy=cys, tank_number=tank_numbers), key
+        return self.preview_detections
+
     def get_color_for_behavior(self, behavior_name):
         if behavior_name not in self.behavior_colors: self.behavior_colors[behavior_name] = self.predefined_colors[len(self.behavior_colors) % len(self.predefined_colors)]
         return self.behavior_colors[behavior_name]
@@ -315,7 +317,7 @@ class VideoPlayer(QtWidgets.QWidget):
         if self.video_loader: self.video_loader.set_playing(False); self.video_loader.seek(pos)
     def reset_playback(self):
         if self.video_loader: self.video_loader.stop()
-        self.current_frame, self.current_frame_idx, self.total_frames = None, 0, 0; self.frame_slider.setValue(0); self.frame_slider.setEnabled(False); self.frame_label.setText("Frame: 0/0"); self.progress_bar.setValue(0); self.video_label.clear(); self.behavior_colors.clear(); self.raw_detections.clear(); self.processed_detections.clear()
+        self.current_frame, self.current_frame_idx, self.total_frames = None, 0, 0; self.frame_slider.setValue(0); self.frame_slider.setEnabled(False); self.frame_label.setText("Frame: 0/0"); self.progress_bar.setValue(0); self.video_label.clear(); self.behavior_colors.clear(); self.raw_detections, self.processed_detections = None, None; self.preview_detections = self.processed_key = None
         self.update_legend_widget();
         if self.timeline_widget: self.timeline_widget.setData({}, {}, 0, 0)
         self._update_button_states()
@@ -338,27 +340,43 @@ class VideoPlayer(QtWidgets.QWidget):
     def start_detection_processing(self):
         if not self.raw_detections or self.video_size[0] == 0: return
         if self.detection_processor and self.detection_processor.isRunning(): self.detection_processor.stop(); self.detection_processor.wait()
-        self.status_label.setText("Processing detections...")
-        self.detection_processor = DetectionProcessor(self.raw_detections, self.grid_manager.transform, self.grid_settings, self.video_size)
-        self.detection_processor.processing_finished.connect(self.on_processing_complete); self.detection_processor.error_occurred.connect(self.on_processing_error); self.detection_processor.finished.connect(self.detection_processor.deleteLater); self.detection_processor.finished.connect(self.on_processor_thread_finished)
+        self.status_label.setText("Processing detections..."); self.processing_key = self._assignment_key()
+        self.detection_processor = DetectionProcessor(self.raw_detections, self.grid_manager.transform, self.grid_settings, self.video_size, self.grid_manager.label_map(self.grid_settings['cols'], self.grid_settings['rows']))
+        self.detection_processor.processing_finished.connect(self.on_processing_complete); self.detection_processor.timeline_progress.connect(self.on_timeline_progress); self.detection_processor.error_occurred.connect(self.on_processing_error); self.detection_processor.finished.connect(self.detection_processor.deleteLater); self.detection_processor.finished.connect(self.on_processor_thread_finished)
         self.detection_processor.start(); self._update_button_states()
     def on_processor_thread_finished(self):
-        self.detection_processor = None; self._update_button_states()
+        if self.sender() is self.detection_processor: self.detection_processor = None
+        self._update_button_states()
+    def on_timeline_progress(self, timeline_segments, last_frame):
+        if self.sender() is not self.detection_processor: return  # Late update from a cancelled job.
+        if self.timeline_widget: self.timeline_widget.setPartialSegments(timeline_segments, last_frame)
+        if self.total_frames > 0: self.status_label.setText(f"Processing detections... {min(100, int((last_frame + 1) * 100 / self.total_frames))}%")
     def on_processing_complete(self, processed_detections, timeline_segments):
-        self.processed_detections = processed_detections
+        if self.sender() is not self.detection_processor: return
+        self.processed_detections, self.processed_key, self.preview_detections = processed_detections, self.processing_key, None
         if self.timeline_widget: self.timeline_widget.setData(timeline_segments, self.behavior_colors, self.total_frames, self.grid_settings['cols'] * self.grid_settings['rows'])
         self.status_label.setText(""); self._update_button_states(); self.update_display()
     def on_processing_error(self, message):
+        if self.sender() is not self.detection_processor: return  # Error of a cancelled job.
         self.status_label.setText(""); self.show_error(message); self._update_button_states()
     def on_video_export_finished(self):
-        self.toggle_controls(True); self.progress_bar.setFormat(""); self.progress_bar.setTextVisible(False); QtWidgets.QMessageBox.information(self, "Success", "Video has been exported successfully."); self.progress_bar.setValue(0); self.video_saver.deleteLater(); self.video_saver = None
+        self.toggle_controls(True); self.progress_bar.setFormat(""); self.progress_bar.setTextVisible(False); QtWidgets.QMessageBox.information(self, "Success", "Video has been exported successfully." + (f"\n{self.video_saver.pipeline_stats.summary()}" if self.video_saver.pipeline_stats else "")); self.progress_bar.setValue(0); self.video_saver.deleteLater(); self.video_saver = None
     def on_video_export_error(self, message):
         self.toggle_controls(True); self.progress_bar.setFormat(""); self.progress_bar.setTextVisible(False); self.progress_bar.setValue(0); self.show_error(f"Video export failed: {message}")
         if self.video_saver: self.video_saver.deleteLater(); self.video_saver = None
+    def choose_arena_mask(self):
+        file_path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Select Arena Mask Image", "", "Images (*.png *.jpg *.jpeg *.bmp *.tif *.tiff)")
+        if file_path: self.apply_arena_mask(file_path)
+    def apply_arena_mask(self, file_path):
+        """Sets (or with None clears) the arena mask of the grid and re-assigns the detections to tanks."""
+        try: self.grid_manager.set_arena_mask(file_path)
+        except ValueError as e: self.show_error(f"Failed to load arena mask: {e}"); return
+        self.start_detection_processing(); self._update_button_states()
     def save_settings(self):
         settings_data = {'grid_settings': self.grid_settings, 'line_thickness': self.line_thickness, 'grid_transform': {'center_x': self.grid_manager.center.x(), 'center_y': self.grid_manager.center.y(), 'angle': self.grid_manager.angle, 'scale_x': self.grid_manager.scale_x, 'scale_y': self.grid_manager.scale_y,}}
         file_path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Save Environment Settings", "settings.json", "JSON Files (*.json)")
         if not file_path: return
+        if self.grid_manager.arena_mask_path: settings_data['arena_mask'] = os.path.abspath(self.grid_manager.arena_mask_path)
         try:
             with open(file_path, 'w') as f: json.dump(settings_data, f, indent=4)
             QtWidgets.QMessageBox.information(self, "Success", f"Settings saved to {file_path}")
@@ -369,6 +387,7 @@ class VideoPlayer(QtWidgets.QWidget):
         try:
             with open(file_path, 'r') as f: settings_data = json.load(f)
             self.grid_settings, self.line_thickness = settings_data['grid_settings'], settings_data['line_thickness']; transform_settings = settings_data['grid_transform']
+            arena_mask = settings_data.get('arena_mask'); self.grid_manager.set_arena_mask(os.path.join(os.path.dirname(file_path), arena_mask) if arena_mask else None); self.clear_arena_mask_btn.setEnabled(arena_mask is not None)
             self.grid_manager.update_center(QPointF(transform_settings['center_x'], transform_settings['center_y'])); self.grid_manager.update_rotation(transform_settings['angle']); self.grid_manager.update_scale(transform_settings['scale_x'], transform_settings['scale_y'])
             self._block_signals_for_controls(True)
             self.grid_cols_spin.setValue(self.grid_settings['cols']); self.grid_rows_spin.setValue(self.grid_settings['rows']); self.line_thickness_spin.setValue(self.line_thickness)
@@ -417,9 +436,8 @@ class VideoPlayer(QtWidgets.QWidget):
         widgets = [self.grid_cols_spin, self.grid_rows_spin, self.line_thickness_spin, self.rotate_slider, self.scale_x_slider, self.scale_y_slider, self.move_x_slider, self.move_y_slider, self.reset_grid_btn]
         for widget in widgets: widget.blockSignals(should_block)
     def toggle_controls(self, enabled):
-        final_state = enabled and not (self.detection_processor and self.detection_processor.isRunning())
-        self.play_btn.setEnabled(final_state); self.pause_btn.setEnabled(final_state); self.stop_btn.setEnabled(final_state)
-        self.frame_slider.setEnabled(final_state and self.total_frames > 0)
+        self.play_btn.setEnabled(enabled); self.pause_btn.setEnabled(enabled); self.stop_btn.setEnabled(enabled)
+        self.frame_slider.setEnabled(enabled and self.total_frames > 0)
     def show_error(self, message):
         QtWidgets.QMessageBox.critical(self, "Error", message)
     def closeEvent(self, event):
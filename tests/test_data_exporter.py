@@ -0,0 +1,27 @@
+# EthoGrid_App/tests/test_data_exporter.py
+
+import os
+import numpy as np
+from PyQt5.QtGui import QTransform
+
+from core.data_exporter import export_trajectory_image
+from core.detection_table import DetectionTable
+
+GRID_SETTINGS = {'cols': 2, 'rows': 1}
+VIDEO_SIZE = (200, 100)
+
+def trajectory_table():
+    frames = np.arange(10)
+    return DetectionTable(frames, np.zeros(10), ['fish'], np.full(10, 0.9), frames * 5.0, frames * 5.0, frames * 5.0 + 4, frames * 5.0 + 4,
+                          cx=frames * 5.0 + 2, cy=frames * 5.0 + 2, tank_number=np.ones(10))
+
+def test_trajectory_image_is_written(tmp_path):
+    output_path = str(tmp_path / "trajectories.png")
+    assert export_trajectory_image(trajectory_table(), GRID_SETTINGS, VIDEO_SIZE, QTransform(), output_path, 1.0, 25.0) is None
+    assert os.path.isfile(output_path)
+
+def test_singular_grid_transform_is_reported_instead_of_drawn(tmp_path):
+    output_path = str(tmp_path / "trajectories.png")
+    error = export_trajectory_image(trajectory_table(), GRID_SETTINGS, VIDEO_SIZE, QTransform().scale(0.0, 1.0), output_path, 1.0, 25.0)
+    assert "not invertible" in error
+    assert not os.path.exists(output_path)
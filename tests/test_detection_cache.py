@@ -0,0 +1,92 @@
+# EthoGrid_App/tests/test_detection_cache.py
+
+import os
+import json
+import numpy as np
+
+from core.detection_cache import cache_dir_for, is_cache_valid, load_cached_table, save_table_cache
+from core.detection_loader import load_detection_file
+from core.detection_table import DetectionTable, COORD_COLUMNS
+
+CSV_TEXT = """frame_idx,class_name,conf,x1,y1,x2,y2,cx,cy,tank_number,track_id
+0,fish,0.9000,10.0000,20.0000,30.0000,40.0000,20.0000,30.0000,1,a
+0,shrimp,0.8000,50.0000,60.0000,70.0000,80.0000,,,,b
+3,fish,0.7000,1.0000,2.0000,3.0000,4.0000,2.0000,3.0000,2,
+"""
+
+def cached_csv(tmp_path, text=CSV_TEXT):
+    """A detection CSV with a freshly written cache."""
+    path = tmp_path / "detections.csv"
+    path.write_text(text, encoding='utf-8')
+    assert save_table_cache(str(path), DetectionTable.from_csv(str(path)))
+    return str(path)
+
+def meta_path(csv_path):
+    return os.path.join(cache_dir_for(csv_path), "meta.json")
+
+def read_meta(csv_path):
+    with open(meta_path(csv_path)) as f: return json.load(f)
+
+def shift_mtime(path, seconds=10):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 1_000_000_000))
+
+def test_cached_table_matches_the_csv(tmp_path):
+    path = cached_csv(tmp_path)
+    table, expected = load_cached_table(path), DetectionTable.from_csv(path)
+    for name in ('frame_idx', 'conf', 'tank_number') + COORD_COLUMNS:
+        assert np.array_equal(getattr(table, name), getattr(expected, name), equal_nan=True), name
+    assert table.class_name_array().tolist() == expected.class_name_array().tolist()
+    assert list(table.extra['track_id']) == ['a', 'b', '']
+    assert table.csv_headers == expected.csv_headers
+    assert table.frame_slice(3) == slice(2, 3)
+
+def test_loader_uses_the_cache_on_the_second_load(tmp_path):
+    path = tmp_path / "detections.csv"
+    path.write_text(CSV_TEXT, encoding='utf-8')
+    assert load_detection_file(str(path))[1].engine != "binary cache"
+    assert load_detection_file(str(path))[1].engine == "binary cache"
+
+def test_size_change_invalidates(tmp_path):
+    path = cached_csv(tmp_path)
+    with open(path, 'a', encoding='utf-8') as f: f.write("4,fish,0.5,1,2,3,4,,,,\n")
+    assert not is_cache_valid(path, read_meta(path))
+    assert load_cached_table(path) is None
+    table, stats = load_detection_file(path)
+    assert stats.engine != "binary cache" and len(table) == 4
+
+def test_mtime_change_with_the_same_content_keeps_the_cache_and_restamps_it(tmp_path):
+    path = cached_csv(tmp_path)
+    shift_mtime(path)
+    assert load_cached_table(path) is not None
+    assert read_meta(path)['source_mtime_ns'] == os.stat(path).st_mtime_ns
+
+def test_mtime_change_with_other_content_of_the_same_size_invalidates(tmp_path):
+    path = cached_csv(tmp_path)
+    with open(path, 'w', encoding='utf-8') as f: f.write(CSV_TEXT.replace("0.9000", "0.1000"))
+    shift_mtime(path)
+    assert not is_cache_valid(path, read_meta(path))
+    assert load_detection_file(path)[0].conf[0] == 0.1
+
+def test_missing_meta_invalidates(tmp_path):
+    path = cached_csv(tmp_path)
+    os.remove(meta_path(path))
+    assert not is_cache_valid(path, None)
+    assert load_cached_table(path) is None
+
+def test_partial_meta_invalidates(tmp_path):
+    path = cached_csv(tmp_path)
+    meta = read_meta(path)
+    with open(meta_path(path), 'w') as f: f.write(json.dumps(meta)[:40])
+    assert load_cached_table(path) is None
+    with open(meta_path(path), 'w') as f: json.dump({'version': meta['version'], 'source_size': meta['source_size']}, f)
+    assert load_cached_table(path) is None
+    with open(meta_path(path), 'w') as f: json.dump(dict(meta, version=-1), f)
+    assert load_cached_table(path) is None
+
+def test_missing_column_file_invalidates(tmp_path):
+    path = cached_csv(tmp_path)
+    os.remove(os.path.join(cache_dir_for(path), "conf.npy"))
+    assert load_cached_table(path) is None
+    table, stats = load_detection_file(path)
+    assert stats.engine != "binary cache" and len(table) == 3
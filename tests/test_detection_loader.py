@@ -0,0 +1,97 @@
+# EthoGrid_App/tests/test_detection_loader.py
+
+import numpy as np
+import pytest
+
+from core.detection_loader import load_detection_file
+from core.detection_table import DetectionTable, COORD_COLUMNS
+
+pytest.importorskip("pandas")
+
+HEADERS = "frame_idx,class_name,conf,x1,y1,x2,y2,cx,cy,tank_number,track_id"
+
+def write_text(tmp_path, text, name="detections.csv"):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+def detection_rows(count, seed=0):
+    """CSV rows over a few frames, with classes first seen in different chunks and some empty fields."""
+    rng = np.random.default_rng(seed)
+    classes = ['zebrafish', 'shrimp', 'medaka', 'snail']
+    lines = []
+    for i in range(count):
+        x1, y1 = rng.uniform(0, 600, 2)
+        tank = '' if i % 7 == 0 else str(1 + i % 4)
+        cx = '' if i % 11 == 0 else f"{x1 + 5:.4f}"
+        lines.append(f"{i // 3},{classes[min(i // 10, 3)]},{rng.uniform(0.3, 1):.4f},{x1:.4f},{y1:.4f},{x1 + 10:.4f},{y1 + 12:.4f},{cx},{y1 + 6:.4f},{tank},id{i % 5 if i % 9 else ''}")
+    return "\n".join([HEADERS] + lines) + "\n"
+
+def assert_same_table(table, expected):
+    assert len(table) == len(expected)
+    for name in ('frame_idx', 'conf', 'tank_number') + COORD_COLUMNS:
+        assert np.array_equal(getattr(table, name), getattr(expected, name), equal_nan=True), name
+    assert table.class_name_array().tolist() == expected.class_name_array().tolist()
+    assert sorted(table.extra) == sorted(expected.extra)
+    for name in expected.extra: assert list(table.extra[name]) == list(expected.extra[name]), name
+    assert table.csv_headers == expected.csv_headers
+    assert np.array_equal(table.frame_offsets, expected.frame_offsets)
+
+@pytest.mark.parametrize("chunk_rows", [1, 7, 1000])
+def test_chunked_pandas_load_matches_csv_module(tmp_path, chunk_rows):
+    path = write_text(tmp_path, detection_rows(40))
+    table, stats = load_detection_file(path, chunk_rows=chunk_rows)
+    assert stats.engine == "pandas C parser" and stats.rows == 40
+    assert_same_table(table, DetectionTable.from_csv(path))
+
+def test_progress_is_reported_per_chunk(tmp_path):
+    progress = []
+    load_detection_file(write_text(tmp_path, detection_rows(25)), chunk_rows=10, progress_callback=progress.append)
+    assert progress == [10, 20, 25]
+
+def test_missing_optional_columns(tmp_path):
+    path = write_text(tmp_path, "class_name,frame_idx,x1,y1,x2,y2\nfish,3,1,2,3,4\nshrimp,1,5,6,7,8\n")
+    table, stats = load_detection_file(path)
+    assert stats.engine == "pandas C parser"
+    assert_same_table(table, DetectionTable.from_csv(path))
+    assert table.frame_idx.tolist() == [1, 3] and np.all(np.isnan(table.conf)) and np.all(np.isnan(table.cx))
+
+def test_empty_columns(tmp_path):
+    path = write_text(tmp_path, "frame_idx,class_name,conf,x1,y1,x2,y2,cx,cy,tank_number,note\n0,fish,,1,2,3,4,,,,\n1,fish,,5,6,7,8,,,,\n")
+    table, stats = load_detection_file(path)
+    assert stats.engine == "pandas C parser"
+    assert_same_table(table, DetectionTable.from_csv(path))
+    assert table.extra['note'].tolist() == ['', '']
+
+def test_header_only_file(tmp_path):
+    path = write_text(tmp_path, HEADERS + "\n")
+    table, _ = load_detection_file(path)
+    assert len(table) == 0 and table.num_frames == 0
+    assert table.csv_headers == HEADERS.split(",")
+
+def test_malformed_numbers_fall_back_to_the_csv_module(tmp_path):
+    path = write_text(tmp_path, "frame_idx,class_name,conf,x1,y1,x2,y2\n0,fish,high,1,2,3,4\n1,fish,0.5,5,6,7,8\n")
+    table, stats = load_detection_file(path)
+    assert stats.engine == "csv module"
+    assert_same_table(table, DetectionTable.from_csv(path))
+    assert np.isnan(table.conf[0]) and table.conf[1] == 0.5
+
+def test_missing_required_column_is_an_error(tmp_path):
+    with pytest.raises(ValueError, match="'y2'"):
+        load_detection_file(write_text(tmp_path, "frame_idx,class_name,x1,y1,x2\n0,fish,1,2,3\n"))
+
+@pytest.mark.parametrize("frame_sorted", [True, False])
+def test_memory_mapped_load_matches_in_memory_load(tmp_path, frame_sorted):
+    text = detection_rows(60)
+    if not frame_sorted:
+        header, *lines = text.splitlines()
+        text = "\n".join([header] + lines[::-1]) + "\n"
+    path = write_text(tmp_path, text)
+    expected, _ = load_detection_file(path, use_cache=False)
+    table, stats = load_detection_file(path, chunk_rows=16, memory_map=True)
+    assert table.memory_mapped and "memory-mapped" in stats.engine
+    assert_same_table(table, expected)
+    for frame in range(expected.frame_idx[-1] + 1):
+        assert table.frame_records(frame, 'class_name', 'tank_number', 'track_id') == expected.frame_records(frame, 'class_name', 'tank_number', 'track_id')
+    # The next load maps the cache written by this one.
+    assert load_detection_file(path, memory_map=True)[1].engine == "memory-mapped cache"
@@ -0,0 +1,78 @@
+# EthoGrid_App/tests/test_detection_table.py
+
+import csv
+import numpy as np
+
+from core.detection_table import DetectionTable
+from core.tank_assignment import NO_TANK
+
+CSV_TEXT = """frame_idx,class_name,conf,x1,y1,x2,y2,cx,cy,tank_number,track_id
+0,fish,0.9000,10.0000,20.0000,30.0000,40.0000,20.0000,30.0000,1,a
+2,shrimp,0.8000,50.0000,60.0000,70.0000,80.0000,60.0000,70.0000,,b
+0,fish,0.7000,1.0000,2.0000,3.0000,4.0000,,,2,
+2,fish,0.6000,5.0000,6.0000,7.0000,8.0000,6.0000,7.0000,3,c
+5,shrimp,,9.0000,9.0000,9.0000,9.0000,9.0000,9.0000,4,d
+"""
+
+def write_text(tmp_path, text, name="detections.csv"):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+def read_rows(path):
+    with open(path, newline='', encoding='utf-8') as f: return list(csv.reader(f))
+
+def test_rows_are_sorted_by_frame_and_sliced_per_frame(tmp_path):
+    table = DetectionTable.from_csv(write_text(tmp_path, CSV_TEXT))
+    assert len(table) == 5 and table.num_frames == 3
+    assert table.frame_idx.tolist() == [0, 0, 2, 2, 5]
+    assert table.frame_slice(0) == slice(0, 2)
+    assert table.frame_slice(1) == slice(2, 2)
+    assert table.frame_slice(2) == slice(2, 4)
+    assert table.frame_slice(5) == slice(4, 5)
+    # Frames before the first and after the last detection have empty slices.
+    assert table.frame_slice(-1) == slice(0, 0) and table.frame_slice(6) == slice(0, 0)
+
+def test_frame_records_resolve_class_names_and_missing_columns(tmp_path):
+    table = DetectionTable.from_csv(write_text(tmp_path, CSV_TEXT))
+    records = table.frame_records(0, 'class_name', 'conf', 'cx', 'tank_number', 'track_id', 'not_a_column')
+    # The sort is stable, so the two frame-0 rows keep their file order.
+    assert records[0] == ('fish', 0.9, 20.0, 1, 'a', None)
+    assert records[1][:2] == ('fish', 0.7) and np.isnan(records[1][2]) and records[1][3:] == (2, '', None)
+    assert [record[0] for record in table.frame_records(2, 'class_name')] == ['shrimp', 'fish']
+    assert table.frame_records(2, 'tank_number')[0] == (NO_TANK,)
+    assert table.frame_records(1, 'class_name') == []
+    assert np.isnan(table.frame_records(5, 'conf')[0][0])
+
+def test_write_csv_round_trips(tmp_path):
+    table = DetectionTable.from_csv(write_text(tmp_path, CSV_TEXT))
+    out_path = str(tmp_path / "out.csv")
+    table.write_csv(out_path)
+    rows = read_rows(out_path)
+    assert rows[0] == ['frame_idx', 'class_name', 'conf', 'x1', 'y1', 'x2', 'y2', 'cx', 'cy', 'tank_number', 'track_id']
+    assert rows[1] == ['0', 'fish', '0.9000', '10.0000', '20.0000', '30.0000', '40.0000', '20.0000', '30.0000', '1', 'a']
+    # Missing values are written back as empty fields.
+    assert rows[2] == ['0', 'fish', '0.7000', '1.0000', '2.0000', '3.0000', '4.0000', '', '', '2', '']
+    assert rows[3][-2:] == ['', 'b'] and rows[5][2] == ''
+
+    again = DetectionTable.from_csv(out_path)
+    again_path = str(tmp_path / "again.csv")
+    again.write_csv(again_path)
+    assert read_rows(again_path) == rows
+    for name in ('frame_idx', 'tank_number', 'conf', 'x1', 'y1', 'x2', 'y2', 'cx', 'cy'):
+        assert np.array_equal(getattr(again, name), getattr(table, name), equal_nan=True)
+    assert again.class_name_array().tolist() == table.class_name_array().tolist()
+
+def test_write_csv_adds_tank_and_centroid_columns(tmp_path):
+    path = write_text(tmp_path, "frame_idx,class_name,conf,x1,y1,x2,y2\n1,fish,0.5,0,0,10,20\n")
+    table = DetectionTable.from_csv(path)
+    table = table.with_columns(cx=(table.x1 + table.x2) / 2, cy=(table.y1 + table.y2) / 2, tank_number=np.array([3], dtype=np.int16))
+    out_path = str(tmp_path / "out.csv")
+    table.write_csv(out_path)
+    assert read_rows(out_path) == [['frame_idx', 'class_name', 'conf', 'x1', 'y1', 'x2', 'y2', 'tank_number', 'cx', 'cy'],
+                                   ['1', 'fish', '0.5000', '0.0000', '0.0000', '10.0000', '20.0000', '3', '5.0000', '10.0000']]
+
+def test_empty_csv_gives_an_empty_table(tmp_path):
+    table = DetectionTable.from_csv(write_text(tmp_path, ""))
+    assert len(table) == 0 and table.num_frames == 0
+    assert table.frame_slice(0) == slice(0, 0) and table.frame_records(0, 'class_name') == []
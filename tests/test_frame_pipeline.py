@@ -0,0 +1,134 @@
+# EthoGrid_App/tests/test_frame_pipeline.py
+
+import time
+import threading
+import cv2
+import numpy as np
+import pytest
+
+from core.frame_pipeline import open_at_frame, run_pipeline
+
+QUEUE_SIZE = 4
+
+class FakeCapture:
+    """Stands in for cv2.VideoCapture: `frames` small frames whose pixels hold their frame number."""
+    def __init__(self, frames, fail_at=None):
+        self.frames, self.fail_at, self.position = frames, fail_at, 0
+        self.rng = np.random.default_rng(1)
+
+    def read(self):
+        if self.position == self.fail_at: raise IOError(f"decode failed at frame {self.position}")
+        if self.position >= self.frames: return False, None
+        time.sleep(self.rng.uniform(0, 0.001))  # Uneven decode times let the stages drift apart.
+        frame = np.full((4, 4), self.position, dtype=np.int32); self.position += 1
+        return True, frame
+
+class FakeWriter:
+    def __init__(self, fail_at=None):
+        self.written, self.fail_at, self.thread = [], fail_at, None
+
+    def write(self, frame):
+        self.thread = threading.current_thread()
+        if len(self.written) == self.fail_at: raise IOError("encode failed")
+        self.written.append(frame)
+
+def render(frame, frame_idx):
+    return np.stack([frame, np.full_like(frame, frame_idx)])
+
+def serial_output(cap, start, stop):
+    """What the export loop did before the pipeline: read, render and write one frame at a time."""
+    output = []
+    for frame_idx in range(start, stop):
+        ret, frame = cap.read()
+        if not ret: break
+        output.append(render(frame, frame_idx))
+    return output
+
+def assert_same_frames(written, expected):
+    assert len(written) == len(expected)
+    assert all(np.array_equal(a, b) for a, b in zip(written, expected))
+
+@pytest.mark.parametrize("start, stop", [(0, 50), (20, 45), (0, 1)])
+def test_pipeline_writes_the_serial_frames_in_order(start, stop):
+    cap, writer = FakeCapture(100), FakeWriter()
+    cap.position = start
+    stats = run_pipeline(cap, writer, render, start, stop, queue_size=QUEUE_SIZE)
+    expected_cap = FakeCapture(100); expected_cap.position = start
+    assert_same_frames(writer.written, serial_output(expected_cap, start, stop))
+    assert stats.frames == stop - start
+    assert writer.thread is not threading.current_thread()
+
+def test_pipeline_stops_at_the_end_of_the_video():
+    cap, writer = FakeCapture(30), FakeWriter()
+    stats = run_pipeline(cap, writer, render, 0, 100, queue_size=QUEUE_SIZE)
+    assert_same_frames(writer.written, serial_output(FakeCapture(30), 0, 100))
+    assert stats.frames == 30
+
+def test_cancelling_writes_the_rendered_frames_and_stops_decoding():
+    cap, writer = FakeCapture(1000), FakeWriter()
+    reports = []
+    def report(frames_rendered):
+        reports.append(frames_rendered)
+        return frames_rendered < 10
+    stats = run_pipeline(cap, writer, render, 0, 1000, report=report, queue_size=QUEUE_SIZE)
+    assert reports == list(range(1, 11))
+    assert_same_frames(writer.written, serial_output(FakeCapture(1000), 0, 10))
+    assert stats.frames == 10
+    # The reader stops once its queue is full; it never decodes the rest of the video.
+    time.sleep(0.05)
+    assert cap.position <= 10 + 2 * QUEUE_SIZE + 2
+
+def test_decode_errors_reach_the_caller():
+    writer = FakeWriter()
+    with pytest.raises(IOError, match="decode failed at frame 7"):
+        run_pipeline(FakeCapture(100, fail_at=7), writer, render, 0, 100, queue_size=QUEUE_SIZE)
+    assert len(writer.written) <= 7
+
+def test_encode_errors_reach_the_caller():
+    cap = FakeCapture(1000)
+    with pytest.raises(IOError, match="encode failed"):
+        run_pipeline(cap, FakeWriter(fail_at=5), render, 0, 1000, queue_size=QUEUE_SIZE)
+    assert cap.position < 1000
+
+def test_render_errors_reach_the_caller():
+    def failing_render(frame, frame_idx):
+        if frame_idx == 3: raise ValueError("render failed")
+        return render(frame, frame_idx)
+    writer = FakeWriter()
+    with pytest.raises(ValueError, match="render failed"):
+        run_pipeline(FakeCapture(1000), writer, failing_render, 0, 1000, queue_size=QUEUE_SIZE)
+    assert_same_frames(writer.written, serial_output(FakeCapture(1000), 0, 3))
+    assert not [thread for thread in threading.enumerate() if thread.name in ("frame-reader", "frame-writer", "export-decode", "export-encode")]
+
+def write_video(path, fourcc, frames=60):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*fourcc), 25, (64, 48))
+    rng = np.random.default_rng(0)
+    for frame_idx in range(frames):
+        frame = rng.integers(0, 256, (48, 64, 3), dtype=np.uint8)
+        frame[:, :8] = frame_idx * 4
+        writer.write(frame)
+    writer.release()
+    return str(path)
+
+def decoded_frames(path):
+    cap, frames = cv2.VideoCapture(path), []
+    while True:
+        ret, frame = cap.read()
+        if not ret: break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+@pytest.mark.parametrize("name, fourcc", [("video.avi", "MJPG"), ("video.mp4", "mp4v")])
+def test_open_at_frame_decodes_the_requested_frame(tmp_path, name, fourcc):
+    path = write_video(tmp_path / name, fourcc)
+    frames = decoded_frames(path)
+    if len(frames) != 60: pytest.skip(f"OpenCV cannot round-trip {fourcc} here")
+    for start in (0, 1, 13, 37, 59):
+        cap = open_at_frame(path, start)
+        ret, frame = cap.read()
+        cap.release()
+        assert ret and np.array_equal(frame, frames[start]), start
+
+def test_open_at_frame_of_a_missing_video(tmp_path):
+    assert open_at_frame(str(tmp_path / "missing.mp4"), 10) is None
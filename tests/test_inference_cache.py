@@ -0,0 +1,77 @@
+# EthoGrid_App/tests/test_inference_cache.py
+
+import os
+import numpy as np
+import pytest
+
+from core.inference_cache import CACHE_DIR_VARIABLE, ROW_COLUMNS, OutputCacheWriter, UndecodedFrames, cache_key, find_cached_outputs, video_fingerprint
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_VARIABLE, str(tmp_path / "cache"))
+
+@pytest.fixture
+def key(tmp_path):
+    video, model = tmp_path / "fish.mp4", tmp_path / "model.pt"
+    video.write_bytes(os.urandom(1000)); model.write_bytes(b"weights")
+    return cache_key(str(video), str(model))
+
+def frame_rows(rng, boxes):
+    rows = np.zeros((boxes, ROW_COLUMNS))
+    rows[:, :4] = rng.uniform(0, 500, size=(boxes, 4)); rows[:, 4] = rng.uniform(0.25, 1.0, size=boxes); rows[:, 5] = rng.integers(0, 3, size=boxes)
+    return rows
+
+def write_entry(key, confidence, frames):
+    writer = OutputCacheWriter(key, confidence)
+    for rows in frames: writer.add_frame(rows)
+    writer.finish()
+
+def test_fingerprint_changes_with_the_video(tmp_path):
+    video = tmp_path / "a.mp4"
+    video.write_bytes(b"a" * 100)
+    first = video_fingerprint(str(video))
+    assert video_fingerprint(str(video)) == first
+    video.write_bytes(b"b" * 100)
+    assert video_fingerprint(str(video)) != first
+
+def test_input_settings_change_the_key(tmp_path, key):
+    assert cache_key(str(tmp_path / "fish.mp4"), str(tmp_path / "model.pt"), {'tile_size': 320}) != key
+
+def test_cached_rows_round_trip(key):
+    rng = np.random.default_rng(0)
+    frames = [frame_rows(rng, n) for n in (3, 0, 5, 1)]
+    write_entry(key, 0.25, frames)
+    cached = find_cached_outputs(key, 0.25)
+    assert cached.frames == 4
+    for frame_idx, rows in enumerate(frames): assert np.array_equal(cached.frame_rows(frame_idx, 0.25), rows[rows[:, 4].astype(np.float32) > np.float32(0.25)])
+    assert cached.frame_rows(10, 0.25).shape == (0, ROW_COLUMNS)
+
+def test_higher_threshold_filters_a_lower_entry(key):
+    rng = np.random.default_rng(1)
+    frames = [frame_rows(rng, 20) for _ in range(3)]
+    write_entry(key, 0.25, frames)
+    cached = find_cached_outputs(key, 0.6)
+    assert cached.confidence == 0.25
+    for frame_idx, rows in enumerate(frames): assert np.array_equal(cached.frame_rows(frame_idx, 0.6), rows[rows[:, 4] > 0.6])
+
+def test_lower_threshold_is_not_served(key):
+    write_entry(key, 0.5, [frame_rows(np.random.default_rng(2), 4)])
+    assert find_cached_outputs(key, 0.4) is None
+    write_entry(key, 0.3, [frame_rows(np.random.default_rng(2), 4)])
+    assert find_cached_outputs(key, 0.6).confidence == 0.5  # The closest threshold below the requested one.
+
+def test_aborted_runs_leave_no_entry(key):
+    writer = OutputCacheWriter(key, 0.25)
+    writer.add_frame(frame_rows(np.random.default_rng(3), 2))
+    assert find_cached_outputs(key, 0.25) is None
+    writer.abort()
+    assert find_cached_outputs(key, 0.25) is None
+
+def test_undecoded_frames_yield_batches_of_none():
+    reader = UndecodedFrames(start_frame=3, frames=10, batch_size=4)
+    batches = []
+    while True:
+        batch = reader.get()
+        if not batch: break
+        batches.append(batch)
+    assert [len(batch) for batch in batches] == [4, 3] and reader.frames == 7 and all(frame is None for batch in batches for frame in batch)
@@ -0,0 +1,75 @@
+# EthoGrid_App/tests/test_inference_checkpoint.py
+
+import os
+import pytest
+
+from core.inference_checkpoint import checkpoint_metadata, plan_resume
+from core.streaming_csv import StreamingCsvWriter
+from core.polygon_store import PolygonStoreWriter, polygon_store_path
+
+@pytest.fixture
+def run(tmp_path):
+    """Paths and checkpoint metadata of a run over a fake video with a fake model file."""
+    video, model = tmp_path / "fish.mp4", tmp_path / "model.pt"
+    video.write_bytes(b"video" * 100); model.write_bytes(b"weights")
+    return str(tmp_path / "fish_detections.csv"), checkpoint_metadata(str(model), 0.4, str(video))
+
+def write_checkpoint(csv_path, metadata, frames, complete, polygons=False):
+    store = PolygonStoreWriter(polygon_store_path(csv_path)) if polygons else None
+    writer = StreamingCsvWriter(csv_path, ["frame_idx"], flush_frames=1, metadata=dict(metadata, video=False), polygon_store=store)
+    for frame_idx in range(frames):
+        writer.add_row([frame_idx])
+        if store is not None: store.add(None)
+        writer.end_frame(frame_idx)
+    writer.close(complete=complete)
+
+def test_first_run_starts(run):
+    csv_path, metadata = run
+    assert plan_resume(csv_path, None, metadata) == ('start', None, None)
+
+def test_complete_outputs_are_skipped(run):
+    csv_path, metadata = run
+    write_checkpoint(csv_path, metadata, 5, complete=True)
+    action, checkpoint, _ = plan_resume(csv_path, None, metadata)
+    assert action == 'skip' and checkpoint['frames_done'] == 5
+
+def test_partial_outputs_are_resumed(run):
+    csv_path, metadata = run
+    write_checkpoint(csv_path, metadata, 7, complete=False)
+    action, checkpoint, _ = plan_resume(csv_path, None, metadata)
+    assert action == 'resume' and checkpoint['frames_done'] == 7
+
+@pytest.mark.parametrize("key, value", [('confidence', 0.5), ('model_hash', 'other'), ('source_fingerprint', 'other'), ('settings', {'tile_size': 320})])
+def test_changed_run_settings_start_over(run, key, value):
+    csv_path, metadata = run
+    write_checkpoint(csv_path, metadata, 5, complete=True)
+    action, checkpoint, message = plan_resume(csv_path, None, dict(metadata, **{key: value}))
+    assert action == 'start' and checkpoint is None and message
+
+def test_replaced_video_of_the_same_size_starts_over(run, tmp_path):
+    csv_path, metadata = run
+    write_checkpoint(csv_path, metadata, 5, complete=True)
+    video, model = tmp_path / "fish.mp4", tmp_path / "model.pt"
+    video.write_bytes(b"VIDEO" * 100)
+    stat = os.stat(video); os.utime(video, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    action, checkpoint, message = plan_resume(csv_path, None, checkpoint_metadata(str(model), 0.4, str(video)))
+    assert action == 'start' and checkpoint is None and message
+    assert checkpoint_metadata(str(model), 0.4, str(video))['source_fingerprint'] != metadata['source_fingerprint']
+
+def test_truncated_csv_starts_over(run):
+    csv_path, metadata = run
+    write_checkpoint(csv_path, metadata, 5, complete=False)
+    with open(csv_path, 'r+b') as f: f.truncate(3)
+    assert plan_resume(csv_path, None, metadata)[0] == 'start'
+
+def test_truncated_polygon_file_starts_over(run):
+    csv_path, metadata = run
+    write_checkpoint(csv_path, metadata, 5, complete=False, polygons=True)
+    assert plan_resume(csv_path, None, metadata)[0] == 'resume'
+    with open(polygon_store_path(csv_path), 'r+b') as f: f.truncate(4)
+    assert plan_resume(csv_path, None, metadata)[0] == 'start'
+
+def test_missing_annotated_video_starts_over(run, tmp_path):
+    csv_path, metadata = run
+    write_checkpoint(csv_path, metadata, 5, complete=True)
+    assert plan_resume(csv_path, str(tmp_path / "fish_inference.mp4"), metadata)[0] == 'start'
@@ -0,0 +1,89 @@
+# EthoGrid_App/tests/test_mask_blend.py
+
+import cv2
+import numpy as np
+import pytest
+
+from core.mask_blend import MASK_ALPHA, RegionBlend, merge_regions
+
+WIDTH, HEIGHT = 320, 240
+
+def base_frame(seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+def ellipse_points(center, axes, angle=0.0):
+    t = np.linspace(0, 2 * np.pi, 32, endpoint=False)
+    outline = np.stack([np.cos(t) * axes[0], np.sin(t) * axes[1]], axis=1)
+    rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    return (outline @ rotation.T + center).astype(np.int32)
+
+def ellipse_mask(width, height):
+    mask = np.zeros((height, width), dtype=np.uint8)
+    cv2.ellipse(mask, (width // 2, height // 2), (width // 2, height // 3), 30, 0, 360, 1, -1)
+    return mask
+
+# Polygons that overlap each other, and polygons and mask crops running over the frame edges.
+POLYGONS = [
+    (ellipse_points((100, 100), (40, 15), 0.3), (0, 200, 0)),
+    (ellipse_points((125, 110), (35, 12), -0.5), (200, 0, 0)),
+    (ellipse_points((5, 230), (30, 20)), (0, 0, 200)),
+    (ellipse_points((315, 10), (25, 25)), (200, 200, 0)),
+]
+MASKS = [
+    (250, 180, ellipse_mask(90, 80), (0, 200, 200)),
+    (240, 170, ellipse_mask(40, 40), (90, 30, 160)),
+    (0, 0, ellipse_mask(30, 20), (10, 250, 10)),
+]
+
+def drawn_rects(polygons, masks):
+    rects = [(*points.min(axis=0), *(points.max(axis=0) + 1)) for points, _ in polygons]
+    rects += [(x, y, x + mask.shape[1], y + mask.shape[0]) for x, y, mask, _ in masks]
+    return rects
+
+def draw_boxes(frame, polygons):
+    for points, color in polygons:
+        (x1, y1), (x2, y2) = points.min(axis=0), points.max(axis=0)
+        cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
+        cv2.putText(frame, "7", (int(x1), int(y1) - 3), cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1, cv2.LINE_AA)
+
+def full_frame_blend(frame, polygons, masks):
+    """The blend the renderers did before RegionBlend: copy the whole frame, fill, addWeighted over all of it."""
+    overlay = frame.copy()
+    for points, color in polygons: cv2.fillPoly(overlay, [points], color)
+    for x, y, mask, color in masks:
+        crop = overlay[y:y + mask.shape[0], x:x + mask.shape[1]]
+        crop[mask[:crop.shape[0], :crop.shape[1]].astype(bool)] = color
+    draw_boxes(frame, polygons)
+    return cv2.addWeighted(overlay, MASK_ALPHA, frame, 1 - MASK_ALPHA, 0)
+
+def region_blend(frame, polygons, masks):
+    mask_blend = RegionBlend(frame, drawn_rects(polygons, masks))
+    for points, color in polygons: mask_blend.fill_poly(points, color)
+    for x, y, mask, color in masks: mask_blend.fill_mask(x, y, mask, color)
+    draw_boxes(frame, polygons)
+    mask_blend.apply(frame)
+    return frame
+
+@pytest.mark.parametrize("polygons, masks", [(POLYGONS, MASKS), (POLYGONS[:2], []), ([], MASKS), (POLYGONS[2:], MASKS[:1])])
+def test_region_blend_matches_the_full_frame_blend(polygons, masks):
+    expected = full_frame_blend(base_frame(), polygons, masks)
+    assert np.array_equal(region_blend(base_frame(), polygons, masks), expected)
+
+def test_pixels_outside_the_regions_are_untouched():
+    frame = base_frame()
+    mask_blend = RegionBlend(frame, drawn_rects(POLYGONS[:1], []))
+    mask_blend.fill_poly(*POLYGONS[0])
+    mask_blend.apply(frame)
+    (x1, y1, x2, y2), = merge_regions(drawn_rects(POLYGONS[:1], []), WIDTH, HEIGHT)
+    untouched = np.ones((HEIGHT, WIDTH), dtype=bool); untouched[y1:y2, x1:x2] = False
+    assert np.array_equal(frame[untouched], base_frame()[untouched])
+
+def test_merged_regions_are_clipped_and_disjoint():
+    regions = merge_regions(drawn_rects(POLYGONS, MASKS) + [(400, 10, 420, 20)], WIDTH, HEIGHT)
+    covered = np.zeros((HEIGHT, WIDTH), dtype=np.int32)
+    for x1, y1, x2, y2 in regions:
+        assert 0 <= x1 < x2 <= WIDTH and 0 <= y1 < y2 <= HEIGHT
+        covered[y1:y2, x1:x2] += 1
+    assert covered.max() == 1
+    # The two overlapping polygons end up in one region.
+    assert sum(1 for x1, y1, x2, y2 in regions if x1 <= 60 and x2 >= 160 and y1 <= 85 and y2 >= 122) == 1
@@ -0,0 +1,74 @@
+# EthoGrid_App/tests/test_parallel_export.py
+
+import cv2
+import numpy as np
+import pytest
+
+import core.parallel_export as parallel_export
+from core.parallel_export import MIN_FRAMES_PER_WORKER, effective_workers, frame_ranges, run_parallel_export
+
+FRAME_SIZE = (64, 48)
+
+def render_range(job, report):
+    """Writes one solid frame per frame number of the job's range, the way the export workers write their segment."""
+    writer = cv2.VideoWriter(job['segment_path'], cv2.VideoWriter_fourcc(*'MJPG'), 25, FRAME_SIZE)
+    frames_done = 0
+    for frame_idx in range(job['start'], job['stop']):
+        writer.write(np.full((FRAME_SIZE[1], FRAME_SIZE[0], 3), frame_idx % 256, dtype=np.uint8))
+        frames_done += 1
+        if not report(frames_done): break
+    writer.release()
+    return frames_done
+
+def video_frames(path):
+    """The mean gray level of every frame of a video."""
+    cap, levels = cv2.VideoCapture(path), []
+    while True:
+        ret, frame = cap.read()
+        if not ret: break
+        levels.append(int(round(frame.mean())))
+    cap.release()
+    return levels
+
+@pytest.mark.parametrize("total_frames, workers", [(1000, 4), (7, 3), (10, 1), (3, 8), (0, 4)])
+def test_frame_ranges_cover_every_frame_once(total_frames, workers):
+    ranges = frame_ranges(total_frames, workers)
+    assert [frame for start, stop in ranges for frame in range(start, stop)] == list(range(total_frames))
+    assert len(ranges) == min(workers, total_frames)
+    if ranges: assert max(stop - start for start, stop in ranges) - min(stop - start for start, stop in ranges) <= 1
+
+def test_effective_workers(monkeypatch):
+    monkeypatch.setattr(parallel_export, 'ffmpeg_path', lambda: "/usr/bin/ffmpeg")
+    assert effective_workers(10 * MIN_FRAMES_PER_WORKER, 4) == 4
+    assert effective_workers(3 * MIN_FRAMES_PER_WORKER + 1, 8) == 3
+    assert effective_workers(MIN_FRAMES_PER_WORKER - 1, 8) == 1
+    assert effective_workers(10 * MIN_FRAMES_PER_WORKER, 1) == 1
+    assert effective_workers(0, 4) == 1 and effective_workers(-1, 4) == 1
+    monkeypatch.setattr(parallel_export, 'ffmpeg_path', lambda: None)
+    assert effective_workers(10 * MIN_FRAMES_PER_WORKER, 4) == 1
+
+def test_segments_hold_exactly_the_serial_frames(tmp_path, monkeypatch):
+    total_frames = 95
+    joined = []
+    # Without ffmpeg, read the segments back in order instead of joining them.
+    def concat_segments(segment_paths, output_path):
+        for path in segment_paths: joined.extend(video_frames(path))
+    monkeypatch.setattr(parallel_export, 'concat_segments', concat_segments)
+    progress = []
+    jobs = [{'start': start, 'stop': stop} for start, stop in frame_ranges(total_frames, 3)]
+    assert run_parallel_export(render_range, jobs, str(tmp_path / "out.avi"), progress_callback=progress.append) is None
+    assert len(joined) == total_frames
+    assert np.all(np.abs(np.array(joined) - np.arange(total_frames)) <= 2)
+    assert progress[-1] == total_frames
+    # The segments are written to a temporary directory that is removed afterwards.
+    assert [path.name for path in tmp_path.iterdir()] == []
+
+@pytest.mark.skipif(parallel_export.ffmpeg_path() is None, reason="needs ffmpeg")
+def test_joined_video_has_the_serial_frame_count(tmp_path):
+    total_frames = 95
+    output_path = str(tmp_path / "out.avi")
+    jobs = [{'start': start, 'stop': stop} for start, stop in frame_ranges(total_frames, 3)]
+    assert run_parallel_export(render_range, jobs, output_path) is None
+    joined = video_frames(output_path)
+    assert len(joined) == total_frames
+    assert np.all(np.abs(np.array(joined) - np.arange(total_frames)) <= 2)
@@ -0,0 +1,85 @@
+# EthoGrid_App/tests/test_polygon_store.py
+
+import numpy as np
+
+from core.polygons import PolygonBuffer
+from core.polygon_store import MAGIC, PolygonStoreWriter, read_polygon_store, write_polygon_store, polygon_store_path
+
+def random_polygons(rng, rows, spread=4000):
+    return [None if rng.random() < 0.2 else rng.integers(-spread, spread, size=(rng.integers(1, 30), 2)).astype(np.int32) for _ in range(rows)]
+
+def to_buffer(polygons):
+    counts = [0 if points is None else len(points) for points in polygons]
+    vertices = [points for points in polygons if points is not None]
+    return PolygonBuffer(np.concatenate(vertices) if vertices else np.empty((0, 2), dtype=np.int32), np.concatenate(([0], np.cumsum(counts))))
+
+def assert_same(buffer, polygons):
+    assert buffer is not None and len(buffer) == len(polygons)
+    for found, expected in zip(buffer.points(slice(0, len(buffer))), polygons):
+        if expected is None: assert found is None
+        else: assert np.array_equal(found, expected)
+
+def test_polygon_store_path():
+    assert polygon_store_path("/data/fish_segmentations.csv") == "/data/fish_segmentations.polygons"
+
+def test_round_trip_over_several_blocks(tmp_path):
+    polygons = random_polygons(np.random.default_rng(1), 250)
+    path = str(tmp_path / "a.polygons")
+    writer = PolygonStoreWriter(path)
+    for start in range(0, len(polygons), 64):
+        for points in polygons[start:start + 64]: writer.add(points)
+        writer.flush(len(polygons[start:start + 64]))
+    writer.close()
+    assert_same(read_polygon_store(path), polygons)
+    assert_same(read_polygon_store(path, memory_mapped=True), polygons)
+
+def test_large_coordinates_use_wide_deltas(tmp_path):
+    polygons = [np.array([[0, 0], [100000, -100000], [-70000, 5]], dtype=np.int32)]
+    path = str(tmp_path / "wide.polygons")
+    write_polygon_store(path, to_buffer(polygons))
+    assert_same(read_polygon_store(path), polygons)
+
+def test_write_polygon_store_matches_buffer(tmp_path):
+    polygons = random_polygons(np.random.default_rng(2), 100)
+    path = str(tmp_path / "b.polygons")
+    write_polygon_store(path, to_buffer(polygons))
+    assert_same(read_polygon_store(path), polygons)
+
+def test_flush_keeps_unflushed_rows_buffered(tmp_path):
+    path = str(tmp_path / "c.polygons")
+    writer = PolygonStoreWriter(path)
+    first, second = np.array([[1, 2]], dtype=np.int32), np.array([[3, 4], [5, 6]], dtype=np.int32)
+    writer.add(first); writer.add(second)
+    size = writer.flush(1)
+    writer.close()
+    assert size == len(open(path, 'rb').read())
+    assert_same(read_polygon_store(path), [first])
+
+def test_resume_truncates_to_the_checkpointed_bytes(tmp_path):
+    polygons = random_polygons(np.random.default_rng(3), 40)
+    path = str(tmp_path / "d.polygons")
+    writer = PolygonStoreWriter(path)
+    for points in polygons[:20]: writer.add(points)
+    checkpoint = {'polygon_bytes': writer.flush(20)}
+    for points in polygons[20:30]: writer.add(points)
+    writer.flush(10)  # Written after the checkpoint, so a resumed run drops it.
+    writer.close()
+    writer = PolygonStoreWriter(path, resume_from=checkpoint)
+    for points in polygons[20:]: writer.add(points)
+    writer.flush(20); writer.close()
+    assert_same(read_polygon_store(path), polygons)
+
+def test_missing_or_damaged_files_read_as_none(tmp_path):
+    assert read_polygon_store(str(tmp_path / "missing.polygons")) is None
+    (tmp_path / "bad_magic.polygons").write_bytes(b"not a polygon file")
+    assert read_polygon_store(str(tmp_path / "bad_magic.polygons")) is None
+    path = str(tmp_path / "cut.polygons")
+    write_polygon_store(path, to_buffer(random_polygons(np.random.default_rng(4), 50)))
+    data = open(path, 'rb').read()
+    (tmp_path / "cut.polygons").write_bytes(data[:len(data) - 5])
+    assert read_polygon_store(path) is None
+
+def test_empty_store(tmp_path):
+    path = tmp_path / "empty.polygons"
+    path.write_bytes(MAGIC)
+    assert len(read_polygon_store(str(path))) == 0
@@ -0,0 +1,50 @@
+# EthoGrid_App/tests/test_polygons.py
+
+import numpy as np
+
+from core.detection_cache import EncodedStrings, encode_strings
+from core.polygons import parse_polygon_column, _parse_python
+
+WELL_FORMED = ["1,2;3,4;5,6", "-10,0;0,-20", "123456789,-987654321", "0,0"]
+MALFORMED = ["", "1,2;3", "1;2", "1,,2", "1,2;", ";1,2", "1-2,3", "a,b", "1,2,3,4", "-,1"]
+SLOW_PATH = [" 1,2", "1, 2;3,4", "+5,6", "1234567890,1"]
+
+def reference(values):
+    """The vertices and offsets the row-by-row Python parser gives for `values`."""
+    parsed = [_parse_python(value) if value else None for value in values]
+    counts = [0 if points is None else len(points) for points in parsed]
+    vertices = [points for points in parsed if points is not None and len(points)]
+    return (np.concatenate(vertices) if vertices else np.empty((0, 2), dtype=np.int32)), np.concatenate(([0], np.cumsum(counts)))
+
+def assert_matches_python(values, **kwargs):
+    polygons = parse_polygon_column(np.array(values, dtype=object), **kwargs)
+    vertices, offsets = reference(values)
+    assert np.array_equal(polygons.offsets, offsets)
+    assert np.array_equal(np.asarray(polygons.vertices), vertices)
+
+def test_fast_parser_matches_python_parser_on_edge_cases():
+    assert_matches_python(WELL_FORMED + MALFORMED + SLOW_PATH)
+
+def test_fast_parser_matches_python_parser_on_random_polygons():
+    rng = np.random.default_rng(0)
+    values = []
+    for _ in range(500):
+        points = rng.integers(-5000, 5000, size=(rng.integers(0, 12), 2))
+        values.append(";".join(f"{x},{y}" for x, y in points.tolist()))
+    assert_matches_python(values, chunk_rows=37)
+
+def test_memory_mapped_parse_matches_in_memory_parse():
+    values = np.array(WELL_FORMED * 3 + MALFORMED, dtype=object)
+    in_memory, mapped = parse_polygon_column(values), parse_polygon_column(values, memory_mapped=True)
+    assert np.array_equal(in_memory.offsets, mapped.offsets)
+    assert np.array_equal(in_memory.vertices, np.asarray(mapped.vertices))
+
+def test_parses_encoded_strings():
+    values = np.array(WELL_FORMED + MALFORMED, dtype=object)
+    encoded = EncodedStrings(*encode_strings(values))
+    assert np.array_equal(parse_polygon_column(encoded).offsets, parse_polygon_column(values).offsets)
+
+def test_points_returns_none_for_rows_without_polygon():
+    polygons = parse_polygon_column(np.array(["1,2;3,4", "", "bad"], dtype=object))
+    first, empty, bad = polygons.points(slice(0, 3))
+    assert first.tolist() == [[1, 2], [3, 4]] and empty is None and bad is None
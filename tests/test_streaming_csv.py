@@ -0,0 +1,76 @@
+# EthoGrid_App/tests/test_streaming_csv.py
+
+import csv
+import numpy as np
+
+from core.streaming_csv import StreamingCsvWriter, read_progress_marker
+from core.polygon_store import PolygonStoreWriter, read_polygon_store, polygon_store_path
+
+HEADER = ["frame_idx", "class_name", "conf"]
+
+def frame_rows(frame_idx):
+    return [[frame_idx, "fish", f"{0.5 + i / 10:.4f}"] for i in range(frame_idx % 3)]
+
+def read_rows(path):
+    with open(path, newline='') as f: return [row for row in csv.reader(f)]
+
+def write_frames(writer, frames):
+    for frame_idx in frames:
+        for row in frame_rows(frame_idx): writer.add_row(row)
+        writer.end_frame(frame_idx)
+
+def test_marker_tracks_flushed_frames(tmp_path):
+    path = str(tmp_path / "a.csv")
+    writer = StreamingCsvWriter(path, HEADER, flush_rows=4, metadata={'model_hash': 'm'})
+    write_frames(writer, range(10))
+    marker = read_progress_marker(path)
+    assert marker['model_hash'] == 'm' and not marker['complete']
+    assert 0 < marker['frames_done'] <= 10
+    writer.close()
+    marker = read_progress_marker(path)
+    expected = [row for frame_idx in range(10) for row in frame_rows(frame_idx)]
+    assert marker['complete'] and marker['frames_done'] == 10 and marker['rows'] == len(expected)
+    assert read_rows(path) == [HEADER] + [[str(value) for value in row] for row in expected]
+
+def test_rows_of_an_unfinished_frame_are_not_written(tmp_path):
+    path = str(tmp_path / "b.csv")
+    writer = StreamingCsvWriter(path, HEADER)
+    write_frames(writer, range(3))
+    writer.add_row([3, "fish", "0.9000"])  # Frame 3 never ends.
+    writer.close(complete=False)
+    assert read_progress_marker(path)['frames_done'] == 3
+    assert len(read_rows(path)) == 1 + sum(len(frame_rows(i)) for i in range(3))
+
+def test_resume_truncates_rows_after_the_checkpoint(tmp_path):
+    path = str(tmp_path / "c.csv")
+    writer = StreamingCsvWriter(path, HEADER, flush_rows=1)
+    write_frames(writer, range(6))
+    checkpoint = read_progress_marker(path)
+    write_frames(writer, [100, 101]); writer._file.close()  # A crash after the marker leaves extra rows.
+    writer = StreamingCsvWriter(path, HEADER, resume_from=checkpoint)
+    write_frames(writer, range(checkpoint['frames_done'], 12))
+    writer.close()
+    expected = [[str(value) for value in row] for frame_idx in range(12) for row in frame_rows(frame_idx)]
+    assert read_rows(path) == [HEADER] + expected
+    assert read_progress_marker(path)['rows'] == len(expected)
+
+def test_polygon_store_is_flushed_and_resumed_with_the_rows(tmp_path):
+    path = str(tmp_path / "d.csv")
+    polygon = lambda frame_idx, i: np.array([[frame_idx, i], [frame_idx + 1, i + 1]], dtype=np.int32)
+    def write(writer, frames):
+        for frame_idx in frames:
+            for i, row in enumerate(frame_rows(frame_idx)):
+                writer.add_row(row); writer.polygon_store.add(polygon(frame_idx, i))
+            writer.end_frame(frame_idx)
+    writer = StreamingCsvWriter(path, HEADER, flush_rows=2, polygon_store=PolygonStoreWriter(polygon_store_path(path)))
+    write(writer, range(8))
+    checkpoint = read_progress_marker(path)
+    assert checkpoint['polygon_bytes'] > 0
+    write(writer, [8, 11]); writer.close(complete=False)  # Rows and polygons written after the checkpoint are dropped.
+    writer = StreamingCsvWriter(path, HEADER, resume_from=checkpoint, polygon_store=PolygonStoreWriter(polygon_store_path(path), resume_from=checkpoint))
+    write(writer, range(checkpoint['frames_done'], 14))
+    writer.close()
+    expected = [polygon(frame_idx, i) for frame_idx in range(14) for i in range(len(frame_rows(frame_idx)))]
+    polygons = read_polygon_store(polygon_store_path(path))
+    assert len(polygons) == len(read_rows(path)) - 1 == len(expected)
+    assert all(np.array_equal(found, points) for found, points in zip(polygons.points(slice(0, len(polygons))), expected))
@@ -0,0 +1,135 @@
+# EthoGrid_App/tests/test_tank_assignment.py
+
+import numpy as np
+import pytest
+from PyQt5.QtCore import QPointF
+from PyQt5.QtGui import QTransform
+
+from core.tank_assignment import NO_TANK, BORDER, RASTER_MIN_POINTS, CellLabelMap, inverse_matrix_for, map_points, assign_tanks, _assign_analytic
+
+VIDEO_SIZE = (640, 480)
+COLS, ROWS = 4, 3
+
+def grid_transform(center=(320.0, 240.0), angle=0.0, scale=(1.0, 1.0), shear=(0.0, 0.0)):
+    """A grid transform built the way the main window builds it, optionally sheared."""
+    w, h = VIDEO_SIZE
+    transform = QTransform().translate(*center).rotate(angle).scale(*scale)
+    if shear != (0.0, 0.0): transform = transform.shear(*shear)
+    return transform.translate(-w / 2, -h / 2)
+
+TRANSFORMS = {
+    'identity': grid_transform(),
+    'shifted': grid_transform(center=(400.0, 180.0), scale=(0.8, 0.9)),
+    'rotated': grid_transform(angle=17.5, scale=(0.7, 0.75)),
+    'sheared': grid_transform(angle=-8.0, scale=(0.9, 0.6), shear=(0.15, -0.05)),
+}
+
+def tank_for_point(x, y, inverse_transform):
+    """The per-point assignment the workers used before `assign_tanks`."""
+    w, h = VIDEO_SIZE
+    point = inverse_transform.map(QPointF(x, y)); tx, ty = point.x(), point.y()
+    if not (0 <= tx < w and 0 <= ty < h): return NO_TANK
+    cell_width, cell_height = w / COLS, h / ROWS
+    col = min(COLS - 1, max(0, int(tx / cell_width))); row = min(ROWS - 1, max(0, int(ty / cell_height)))
+    return row * COLS + col + 1
+
+def sample_points(transform, count=4000, seed=0):
+    """Random points in and around the video, points on the cell borders and points outside the video."""
+    w, h = VIDEO_SIZE
+    rng = np.random.default_rng(seed)
+    xs, ys = [rng.uniform(-50, w + 50, count)], [rng.uniform(-50, h + 50, count)]
+    # The cell borders (and the grid outline) mapped into the video, where rounding decides the cell.
+    border_points = [(gx, gy) for gx in np.linspace(0, w, COLS + 1) for gy in np.linspace(0, h, 31)]
+    border_points += [(gx, gy) for gy in np.linspace(0, h, ROWS + 1) for gx in np.linspace(0, w, 41)]
+    mapped = [transform.map(QPointF(gx, gy)) for gx, gy in border_points]
+    xs.append(np.array([point.x() for point in mapped])); ys.append(np.array([point.y() for point in mapped]))
+    # Integer pixel positions, as in CSVs written with rounded centroids.
+    int_x, int_y = np.meshgrid(np.arange(0, w + 1, 40, dtype=np.float64), np.arange(0, h + 1, 40, dtype=np.float64))
+    xs.append(int_x.ravel()); ys.append(int_y.ravel())
+    xs.append(np.array([-1.0, w + 1.0, 10.0, 10.0, -1e6, 1e6])); ys.append(np.array([10.0, 10.0, -1.0, h + 1.0, -1e6, 1e6]))
+    return np.concatenate(xs), np.concatenate(ys)
+
+@pytest.mark.parametrize("name", TRANSFORMS)
+def test_map_points_matches_qtransform_map(name):
+    transform = TRANSFORMS[name]
+    inverse_transform, _ = transform.inverted()
+    xs, ys = sample_points(transform)
+    tx, ty = map_points(xs, ys, inverse_matrix_for(transform))
+    expected = [inverse_transform.map(QPointF(x, y)) for x, y in zip(xs, ys)]
+    assert np.array_equal(tx, [point.x() for point in expected])
+    assert np.array_equal(ty, [point.y() for point in expected])
+
+@pytest.mark.parametrize("name", TRANSFORMS)
+def test_assign_tanks_matches_per_point_assignment(name):
+    transform = TRANSFORMS[name]
+    inverse_transform, _ = transform.inverted()
+    xs, ys = sample_points(transform)
+    tanks = assign_tanks(xs, ys, inverse_matrix_for(transform), VIDEO_SIZE, COLS, ROWS)
+    assert tanks.dtype == np.int32
+    assert tanks.tolist() == [tank_for_point(x, y, inverse_transform) for x, y in zip(xs, ys)]
+
+def test_assign_tanks_on_cell_borders_of_the_identity_grid():
+    # Cells are 160 x 160 pixels: a border point belongs to the cell to its right and below, the far edges to no cell.
+    xs = np.array([0.0, 160.0, 159.999, 320.0, 640.0, 639.999, 0.0, 0.0])
+    ys = np.array([0.0, 0.0, 0.0, 160.0, 0.0, 479.999, 480.0, -0.001])
+    tanks = assign_tanks(xs, ys, inverse_matrix_for(grid_transform()), VIDEO_SIZE, COLS, ROWS)
+    assert tanks.tolist() == [1, 2, 1, 7, NO_TANK, 12, NO_TANK, NO_TANK]
+
+def test_missing_centroids_are_outside_every_tank():
+    tanks = assign_tanks(np.array([np.nan, 100.0]), np.array([100.0, np.nan]), inverse_matrix_for(grid_transform()), VIDEO_SIZE, COLS, ROWS)
+    assert tanks.tolist() == [NO_TANK, NO_TANK]
+
+def test_singular_transform_has_no_inverse():
+    assert inverse_matrix_for(QTransform().scale(0.0, 1.0)) is None
+
+def arena_mask():
+    """An elliptical arena covering the middle of the video."""
+    w, h = VIDEO_SIZE
+    ys, xs = np.mgrid[0:h, 0:w]
+    return ((xs - w / 2) / (w * 0.45)) ** 2 + ((ys - h / 2) / (h * 0.45)) ** 2 <= 1.0
+
+def expected_with_mask(xs, ys, inverse_matrix, mask):
+    tanks = _assign_analytic(xs, ys, inverse_matrix, VIDEO_SIZE, COLS, ROWS)
+    if mask is None: return tanks
+    w, h = VIDEO_SIZE
+    in_arena = np.array([0 <= x < w and 0 <= y < h and mask[int(y), int(x)] for x, y in zip(xs, ys)])
+    return np.where(in_arena, tanks, NO_TANK)
+
+@pytest.mark.parametrize("with_mask", [False, True])
+@pytest.mark.parametrize("name", TRANSFORMS)
+def test_cell_label_map_with_border_fallback_matches_analytic_assignment(name, with_mask):
+    transform = TRANSFORMS[name]
+    inverse_matrix = inverse_matrix_for(transform)
+    mask = arena_mask() if with_mask else None
+    xs, ys = sample_points(transform, count=RASTER_MIN_POINTS)
+    expected = expected_with_mask(xs, ys, inverse_matrix, mask)
+
+    label_map = CellLabelMap(inverse_matrix, VIDEO_SIZE, COLS, ROWS, mask)
+    raster = label_map.lookup(xs, ys)
+    decided = raster != BORDER
+    assert np.array_equal(raster[decided], expected[decided])
+    # The raster path (taken for this many points once the map is built) resolves the BORDER points analytically.
+    assert np.array_equal(assign_tanks(xs, ys, inverse_matrix, VIDEO_SIZE, COLS, ROWS, label_map), expected)
+
+@pytest.mark.parametrize("with_mask", [False, True])
+def test_cell_label_map_labels_border_pixels_for_the_analytic_path(with_mask):
+    transform = TRANSFORMS['rotated']
+    inverse_matrix = inverse_matrix_for(transform)
+    mask = arena_mask() if with_mask else None
+    label_map = CellLabelMap(inverse_matrix, VIDEO_SIZE, COLS, ROWS, mask)
+    # Every pixel a mapped cell border runs through must be left to the analytic path.
+    w, h = VIDEO_SIZE
+    border_x, border_y = [], []
+    for gx in np.linspace(0, w, COLS + 1)[1:-1]:
+        for gy in np.linspace(1, h - 1, 200):
+            point = transform.map(QPointF(gx, gy)); border_x.append(point.x()); border_y.append(point.y())
+    labels = label_map.lookup(np.array(border_x), np.array(border_y))
+    if mask is None: assert np.all(labels == BORDER)
+    else: assert np.all((labels == BORDER) | (labels == NO_TANK))
+
+def test_assign_tanks_applies_the_arena_mask_on_the_analytic_path():
+    inverse_matrix = inverse_matrix_for(grid_transform())
+    label_map = CellLabelMap(inverse_matrix, VIDEO_SIZE, COLS, ROWS, arena_mask())
+    tanks = assign_tanks(np.array([5.0, 320.0]), np.array([5.0, 240.0]), inverse_matrix, VIDEO_SIZE, COLS, ROWS, label_map)
+    assert tanks.tolist() == [NO_TANK, 7]
+    assert not label_map.is_built
@@ -0,0 +1,46 @@
+# EthoGrid_App/tests/test_tank_tiles.py
+
+import json
+import numpy as np
+
+from core.tank_tiles import TankTiles, TILE_MARGIN
+from core.tank_assignment import NO_TANK
+
+VIDEO_SIZE = (400, 200)
+
+def settings_file(tmp_path, cols=2, rows=2, center=(0.5, 0.5), angle=0.0, scale=1.0):
+    path = tmp_path / "settings.json"
+    path.write_text(json.dumps({'grid_settings': {'cols': cols, 'rows': rows}, 'line_thickness': 2,
+                                'grid_transform': {'center_x': center[0], 'center_y': center[1], 'angle': angle, 'scale_x': scale, 'scale_y': scale}}))
+    return str(path)
+
+def test_regions_are_cells_plus_margin_clipped_to_the_frame(tmp_path):
+    tiles = TankTiles(VIDEO_SIZE, settings_file(tmp_path))
+    # Cells are 200 x 100 pixels; each region reaches TILE_MARGIN of a cell into its neighbours.
+    x1, y1 = int(np.ceil((1 + TILE_MARGIN) * 200)), int(np.ceil((1 + TILE_MARGIN) * 100))
+    x0, y0 = int(np.floor((1 - TILE_MARGIN) * 200)), int(np.floor((1 - TILE_MARGIN) * 100))
+    assert tiles.regions == [(1, 0, 0, x1, y1), (2, x0, 0, 400, y1), (3, 0, y0, x1, 200), (4, x0, y0, 400, 200)]
+
+def test_crops_are_views_of_the_regions(tmp_path):
+    tiles = TankTiles(VIDEO_SIZE, settings_file(tmp_path))
+    frame = np.arange(200 * 400 * 3, dtype=np.uint32).reshape(200, 400, 3)
+    for crop, (_, x0, y0, x1, y1) in zip(tiles.crops(frame), tiles.regions):
+        assert crop.shape == (y1 - y0, x1 - x0, 3) and np.shares_memory(crop, frame)
+        assert crop[0, 0, 0] == frame[y0, x0, 0]
+
+def test_cells_outside_the_frame_have_no_region(tmp_path):
+    # Shifted right by 0.7 of the frame: the right column of cells lies outside it.
+    tiles = TankTiles(VIDEO_SIZE, settings_file(tmp_path, center=(1.2, 0.5)))
+    assert [tank for tank, *_ in tiles.regions] == [1, 3]
+
+def test_rotated_grid_regions_contain_their_cells(tmp_path):
+    tiles = TankTiles(VIDEO_SIZE, settings_file(tmp_path, angle=30.0, scale=0.6))
+    assert len(tiles.regions) == 4
+    for tank, x0, y0, x1, y1 in tiles.regions:
+        ys, xs = np.mgrid[y0:y1, x0:x1]
+        assert np.any(tiles.assign(xs.ravel() + 0.5, ys.ravel() + 0.5) == tank)
+
+def test_assign_gives_tank_numbers(tmp_path):
+    tiles = TankTiles(VIDEO_SIZE, settings_file(tmp_path, scale=0.5))
+    tanks = tiles.assign(np.array([150.0, 250.0, 150.0, 250.0, 10.0]), np.array([75.0, 75.0, 125.0, 125.0, 10.0]))
+    assert tanks.tolist() == [1, 2, 3, 4, NO_TANK]
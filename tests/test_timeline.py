@@ -0,0 +1,138 @@
+# EthoGrid_App/tests/test_timeline.py
+
+import numpy as np
+import pytest
+
+from core.tank_assignment import NO_TANK
+from core.timeline import TimelineSegments, build_segments
+
+CLASS_NAMES = ['swimming', 'resting', 'feeding']
+
+def loop_segments(frame_idx, tank_number, class_id, class_names):
+    """The per-tank segment loop the detection worker used before `build_segments`."""
+    frames_by_tank = {}
+    for frame, tank, behavior in zip(frame_idx, tank_number, class_id):
+        if tank != NO_TANK: frames_by_tank.setdefault(tank, {})[frame] = class_names[behavior]
+    segments_by_tank = {}
+    for tank_id, frames in frames_by_tank.items():
+        segments, sorted_frames = [], sorted(frames)
+        start_frame, current_behavior = sorted_frames[0], frames[sorted_frames[0]]
+        for prev_frame, frame in zip(sorted_frames, sorted_frames[1:]):
+            if frames[frame] != current_behavior or frame != prev_frame + 1:
+                segments.append((start_frame, prev_frame, current_behavior))
+                start_frame, current_behavior = frame, frames[frame]
+        segments.append((start_frame, sorted_frames[-1], current_behavior))
+        segments_by_tank[tank_id] = segments
+    return segments_by_tank
+
+def random_detections(frames=400, tanks=4, seed=0):
+    """Frame-sorted rows with gaps, single-frame runs, several detections per tank and frame, and unassigned rows."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    behavior = rng.integers(0, len(CLASS_NAMES), tanks + 1)
+    for frame in range(frames):
+        if rng.random() < 0.05: continue  # A frame without any detection.
+        for tank in range(NO_TANK, tanks + 1):
+            if rng.random() < 0.1: continue  # The tank is missing from this frame.
+            if rng.random() < 0.2: behavior[tank] = rng.integers(0, len(CLASS_NAMES))
+            rows.append((frame, tank, behavior[tank]))
+            if rng.random() < 0.1: rows.append((frame, tank, rng.integers(0, len(CLASS_NAMES))))
+    frame_idx, tank_number, class_id = (np.array(column) for column in zip(*rows))
+    return frame_idx.astype(np.int32), tank_number.astype(np.int16), class_id.astype(np.int16)
+
+def as_dict(segments):
+    return {tank_id: segments[tank_id] for tank_id in segments}
+
+@pytest.mark.parametrize("seed", range(3))
+def test_build_segments_matches_the_per_tank_loop(seed):
+    frame_idx, tank_number, class_id = random_detections(seed=seed)
+    segments = build_segments(frame_idx, tank_number, class_id, CLASS_NAMES)
+    assert as_dict(segments) == loop_segments(frame_idx.tolist(), tank_number.tolist(), class_id.tolist(), CLASS_NAMES)
+    assert NO_TANK not in segments
+
+def test_gaps_and_single_frame_runs():
+    frame_idx = np.array([0, 1, 2, 4, 5, 6, 7, 7, 9])
+    tank_number = np.array([1, 1, 1, 1, 1, 1, 1, 1, 2])
+    class_id = np.array([0, 0, 0, 0, 1, 0, 2, 0, 1])
+    segments = build_segments(frame_idx, tank_number, class_id, CLASS_NAMES)
+    # The last detection of a tank in a frame decides the behavior there.
+    assert segments[1] == [(0, 2, 'swimming'), (4, 4, 'swimming'), (5, 5, 'resting'), (6, 7, 'swimming')]
+    assert segments[2] == [(9, 9, 'resting')]
+    assert list(segments) == [1, 2] and 3 not in segments
+
+def test_no_assigned_detections():
+    segments = build_segments(np.array([0, 1]), np.array([NO_TANK, NO_TANK]), np.array([0, 1]), CLASS_NAMES)
+    assert len(segments) == 0 and segments.num_segments == 0 and segments.class_names == CLASS_NAMES
+
+@pytest.mark.parametrize("boundaries", [[100], [57, 58, 200], [1, 250, 399]])
+def test_concatenate_joins_runs_across_chunk_boundaries(boundaries):
+    frame_idx, tank_number, class_id = random_detections(seed=5)
+    whole = build_segments(frame_idx, tank_number, class_id, CLASS_NAMES)
+    # Chunks split between frames, the way DetectionTable.row_chunks splits a table.
+    cuts = [0] + [int(np.searchsorted(frame_idx, frame)) for frame in boundaries] + [len(frame_idx)]
+    parts = [build_segments(frame_idx[a:b], tank_number[a:b], class_id[a:b], CLASS_NAMES) for a, b in zip(cuts, cuts[1:])]
+    joined = TimelineSegments.concatenate(parts)
+    assert as_dict(joined) == as_dict(whole)
+    assert joined.num_segments == whole.num_segments
+
+def test_concatenate_keeps_runs_apart_across_a_gap_or_a_behavior_change():
+    first = build_segments(np.array([0, 1]), np.array([1, 2]), np.array([0, 0]), CLASS_NAMES)
+    second = build_segments(np.array([2, 2]), np.array([1, 2]), np.array([0, 1]), CLASS_NAMES)
+    third = build_segments(np.array([4]), np.array([1]), np.array([0]), CLASS_NAMES)
+    joined = TimelineSegments.concatenate([first, second, TimelineSegments.empty(CLASS_NAMES), third])
+    assert as_dict(joined) == {1: [(0, 0, 'swimming'), (2, 2, 'swimming'), (4, 4, 'swimming')], 2: [(1, 1, 'swimming'), (2, 2, 'resting')]}
+    assert as_dict(TimelineSegments.concatenate([TimelineSegments.empty(CLASS_NAMES)])) == {}
+
+def test_from_dict_round_trips():
+    segments = {3: [(0, 4, 'resting'), (5, 9, 'feeding')], 1: [(2, 2, 'swimming')]}
+    table = TimelineSegments.from_dict(segments)
+    assert as_dict(table) == segments
+    start, end, class_id = table.tank_arrays(3)
+    assert start.tolist() == [0, 5] and end.tolist() == [4, 9] and [table.class_names[i] for i in class_id] == ['resting', 'feeding']
+
+def test_dominant_classes_per_column():
+    segments = TimelineSegments.from_dict({1: [(0, 9, 'swimming'), (10, 13, 'resting'), (14, 39, 'feeding')], 2: [(30, 31, 'resting')]})
+    swimming, resting, feeding = (segments.class_names.index(name) for name in ('swimming', 'resting', 'feeding'))
+    # 4 columns of 10 frames over [0, 40).
+    assert segments.dominant_classes(1, 40, 4).tolist() == [swimming, feeding, feeding, feeding]
+    assert segments.dominant_classes(2, 40, 4).tolist() == [-1, -1, -1, resting]
+    assert segments.dominant_classes(3, 40, 4).tolist() == [-1, -1, -1, -1]
+    # 8 columns of 5 frames: frames 10-14 are mostly resting.
+    assert segments.dominant_classes(1, 40, 8).tolist() == [swimming, swimming, resting] + [feeding] * 5
+    # Columns narrower than a frame: 80 columns of half a frame each.
+    assert segments.dominant_classes(1, 40, 80).tolist() == [swimming] * 20 + [resting] * 8 + [feeding] * 52
+
+def test_dominant_classes_prefer_the_class_covering_more_frames():
+    segments = TimelineSegments.from_dict({1: [(0, 3, 'resting'), (4, 9, 'swimming'), (10, 16, 'feeding'), (17, 19, 'resting')]})
+    resting, swimming, feeding = (segments.class_names.index(name) for name in ('resting', 'swimming', 'feeding'))
+    # Column 0 is frames 0-9 (6 swimming vs 4 resting), column 1 frames 10-19 (7 feeding vs 3 resting).
+    assert segments.dominant_classes(1, 20, 2).tolist() == [swimming, feeding]
+    # Over all 20 frames resting and feeding tie at 7 frames; the lower class id wins.
+    assert segments.dominant_classes(1, 20, 1).tolist() == [min(resting, feeding)]
+
+def test_after_frame_with_remapped_class_names_joins_a_partial_timeline():
+    # A re-assignment has reached frame 19; the previous timeline is shown after it, as in TimelineWidget.setPartialSegments.
+    previous = TimelineSegments.from_dict({1: [(0, 29, 'feeding'), (30, 49, 'swimming')], 2: [(5, 12, 'resting')]})
+    partial = TimelineSegments.from_dict({1: [(0, 19, 'resting')], 3: [(10, 19, 'swimming')]})
+    tail = previous.after_frame(19).with_class_names(partial.class_names)
+    assert tail.class_names[:len(partial.class_names)] == partial.class_names
+    assert as_dict(tail) == {1: [(20, 29, 'feeding'), (30, 49, 'swimming')]}
+    joined = TimelineSegments.concatenate([partial.with_class_names(tail.class_names), tail])
+    assert as_dict(joined) == {1: [(0, 19, 'resting'), (20, 29, 'feeding'), (30, 49, 'swimming')], 3: [(10, 19, 'swimming')]}
+
+def test_after_frame_continues_a_run_across_the_boundary():
+    previous = TimelineSegments.from_dict({1: [(0, 49, 'swimming')]})
+    partial = TimelineSegments.from_dict({1: [(40, 59, 'resting'), (60, 69, 'swimming')]})
+    tail = previous.after_frame(59).with_class_names(partial.class_names)
+    assert tail.class_names == partial.class_names and tail.num_segments == 0
+    tail = TimelineSegments.from_dict({1: [(0, 99, 'swimming')]}).after_frame(69).with_class_names(partial.class_names)
+    assert as_dict(tail) == {1: [(70, 99, 'swimming')]}
+    # The partial run ending at the boundary and the tail starting right after it become one segment.
+    assert as_dict(TimelineSegments.concatenate([partial, tail])) == {1: [(40, 59, 'resting'), (60, 99, 'swimming')]}
+
+def test_with_class_names_keeps_ids_of_known_names():
+    segments = TimelineSegments.from_dict({1: [(0, 1, 'feeding'), (2, 3, 'swimming')]})
+    remapped = segments.with_class_names(['swimming', 'resting'])
+    assert remapped.class_names == ['swimming', 'resting', 'feeding']
+    assert remapped.tank_arrays(1)[2].tolist() == [2, 0] and as_dict(remapped) == as_dict(segments)
+    assert segments.with_class_names(segments.class_names) is segments
@@ -0,0 +1,39 @@
+# EthoGrid_App/tests/test_video_saver.py
+
+import numpy as np
+from PyQt5.QtGui import QTransform
+
+from core.detection_table import DetectionTable
+from workers.video_saver import VideoSaver
+
+VIDEO_SIZE = (200, 100)
+GREEN = [0, 255, 0]
+
+def video_saver():
+    # A grid scaled 1.8x around the video center: its right line runs through the legend column (x = 280)
+    # and its bottom line through the timeline panel (y = 140).
+    transform = QTransform().translate(100, 50).scale(1.8, 1.8).translate(-100, -50)
+    return VideoSaver("in.mp4", "out.mp4", DetectionTable.empty(), {'cols': 2, 'rows': 2}, transform, {'swimming': (60, 180, 75)},
+                      VIDEO_SIZE, 25.0, 1, [], {}, draw_grid=True, draw_overlays=True)
+
+def test_legend_items_and_timeline_panel_are_drawn_over_the_grid():
+    saver = video_saver()
+    frame = saver.process_frame(np.zeros((100, 200, 3), dtype=np.uint8), 0, 50)
+    static = saver._static_overlay(50)
+    # The legend swatch and label are restored where the grid line crossed them.
+    assert np.array_equal(frame[20:41, 220:241], static[20:41, 220:241])
+    assert np.array_equal(frame[30, 250:340], static[30, 250:340])
+    # The timeline panel is restored everywhere but at the playhead.
+    assert np.array_equal(frame[100:, 60:], static[100:, 60:])
+
+def test_grid_lines_outside_the_legend_items_are_kept():
+    saver = video_saver()
+    frame = saver.process_frame(np.zeros((100, 200, 3), dtype=np.uint8), 0, 50)
+    # Just below the legend label, and further down the legend column.
+    assert frame[44, 280].tolist() == GREEN and frame[70, 280].tolist() == GREEN
+
+def test_without_a_timeline_nothing_below_the_video_is_erased():
+    saver = video_saver()
+    # A single frame has no timeline, so nothing is drawn below the video but the grid.
+    frame = saver.process_frame(np.zeros((100, 200, 3), dtype=np.uint8), 0, 1)
+    assert frame[140, 150].tolist() == GREEN
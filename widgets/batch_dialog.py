@@ -4,6 +4,7 @@ import os
 from PyQt5 import QtWidgets
 from PyQt5.QtCore import QThread
 from workers.batch_processor import BatchProcessor
+from core.parallel_export import default_worker_count, ffmpeg_path
 
 class BatchProcessDialog(QtWidgets.QDialog):
     def __init__(self, parent=None):
@@ -24,6 +25,10 @@ class BatchProcessDialog(QtWidgets.QDialog):
         self.save_excel_checkbox = QtWidgets.QCheckBox("Save to Excel (by Tank)"); self.save_excel_checkbox.setChecked(True)
         self.save_trajectory_img_checkbox = QtWidgets.QCheckBox("Save Trajectory Image"); self.save_trajectory_img_checkbox.setChecked(True)
 
+        self.export_workers_spinbox = QtWidgets.QSpinBox(); self.export_workers_spinbox.setRange(1, 32); self.export_workers_spinbox.setValue(default_worker_count()); self.export_workers_spinbox.setFixedHeight(20)
+        self.export_workers_spinbox.setToolTip("Number of processes that render and encode parts of each annotated video in parallel.")
+        if ffmpeg_path() is None: self.export_workers_spinbox.setValue(1); self.export_workers_spinbox.setToolTip("Parallel export needs ffmpeg on the PATH to join the video parts.")
+
         self.time_gap_spinbox = QtWidgets.QDoubleSpinBox()
         self.time_gap_spinbox.setToolTip("Max time gap in seconds. Trajectory lines will break if the time between points is greater than this.")
         self.time_gap_spinbox.setRange(1, 99999.0); self.time_gap_spinbox.setValue(1.0); self.time_gap_spinbox.setSingleStep(0.1)
@@ -50,6 +55,8 @@ class BatchProcessDialog(QtWidgets.QDialog):
         output_options_group = QtWidgets.QGroupBox("Output Options")
         output_options_layout = QtWidgets.QVBoxLayout(output_options_group)
         output_options_layout.addWidget(self.save_video_checkbox); output_options_layout.addWidget(self.show_overlays_checkbox)
+        workers_layout = QtWidgets.QHBoxLayout(); workers_layout.addWidget(QtWidgets.QLabel("Export Worker Processes:")); workers_layout.addWidget(self.export_workers_spinbox); workers_layout.addStretch()
+        output_options_layout.addLayout(workers_layout)
         output_options_layout.addWidget(self.save_csv_checkbox); output_options_layout.addWidget(self.save_centroid_csv_checkbox)
         output_options_layout.addWidget(self.save_excel_checkbox)
         traj_layout = QtWidgets.QHBoxLayout(); traj_layout.addWidget(self.save_trajectory_img_checkbox); traj_layout.addStretch(); traj_layout.addWidget(QtWidgets.QLabel("Max Time Gap (s):")); traj_layout.addWidget(self.time_gap_spinbox)
@@ -70,7 +77,7 @@ class BatchProcessDialog(QtWidgets.QDialog):
 
     def on_save_video_changed(self):
         is_checked = self.save_video_checkbox.isChecked()
-        self.show_overlays_checkbox.setEnabled(is_checked)
+        self.show_overlays_checkbox.setEnabled(is_checked); self.export_workers_spinbox.setEnabled(is_checked and ffmpeg_path() is not None)
         if not is_checked: self.show_overlays_checkbox.setChecked(False)
     def on_save_trajectory_changed(self):
         self.time_gap_spinbox.setEnabled(self.save_trajectory_img_checkbox.isChecked())
@@ -102,7 +109,8 @@ class BatchProcessDialog(QtWidgets.QDialog):
             save_excel=self.save_excel_checkbox.isChecked(),
             save_trajectory_img=self.save_trajectory_img_checkbox.isChecked(),
             time_gap_seconds=self.time_gap_spinbox.value(),
-            draw_overlays=self.show_overlays_checkbox.isChecked()
+            draw_overlays=self.show_overlays_checkbox.isChecked(),
+            export_workers=self.export_workers_spinbox.value()
         )
         self.batch_thread = QThread(); self.batch_worker.moveToThread(self.batch_thread)
         self.batch_worker.overall_progress.connect(self.update_overall_progress); self.batch_worker.file_progress.connect(self.update_file_progress); self.batch_worker.log_message.connect(self.log_text_edit.append); self.batch_worker.finished.connect(self.on_processing_finished); self.batch_worker.time_updated.connect(self.update_time_labels); self.batch_worker.speed_updated.connect(self.update_speed_label); self.batch_thread.started.connect(self.batch_worker.run)
@@ -1,10 +1,15 @@
 # EthoGrid_App/widgets/timeline_widget.py
 
+import numpy as np
 from PyQt5 import QtWidgets, QtGui, QtCore
 
+from core.timeline import TimelineSegments
+
 class TimelineWidget(QtWidgets.QWidget):
     """
     A custom widget to display behavior timelines for multiple tanks.
+    The bars are rendered once into a cached pixmap, one dominant behavior per pixel column,
+    so moving the playhead only blits the cache and draws the indicator line.
     """
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -14,9 +19,12 @@ class TimelineWidget(QtWidgets.QWidget):
         self.total_frames = 0
         self.current_frame = 0
         self.num_tanks = 0
+        self._previous_segments = None
+        self._cache = None
 
     def setData(self, timeline_segments, behavior_colors, total_frames, num_tanks):
         self.timeline_segments = timeline_segments
+        self._previous_segments = None
         self.behavior_colors = behavior_colors
         self.total_frames = total_frames
         self.num_tanks = num_tanks
@@ -25,48 +33,89 @@ class TimelineWidget(QtWidgets.QWidget):
             self.setMaximumHeight(self.num_tanks * 12 + 20)
         else:
             self.setMinimumHeight(0)
+        self._cache = None
+        self.update()
+
+    def setPartialSegments(self, partial_segments, last_frame):
+        """
+        Shows the segments of a running re-assignment up to `last_frame`, and the last complete
+        timeline after it, until the final result arrives through setData.
+        """
+        if self._previous_segments is None: self._previous_segments = self._as_segments(self.timeline_segments)
+        partial_segments = self._as_segments(partial_segments)
+        tail = self._previous_segments.after_frame(last_frame).with_class_names(partial_segments.class_names)
+        self.timeline_segments = TimelineSegments.concatenate([partial_segments.with_class_names(tail.class_names), tail])
+        self._cache = None
         self.update()
 
+    @staticmethod
+    def _as_segments(segments):
+        return segments if isinstance(segments, TimelineSegments) else TimelineSegments.from_dict(segments)
+
     def setCurrentFrame(self, frame_idx):
         if self.current_frame != frame_idx:
+            old_x = self._indicator_x()
             self.current_frame = frame_idx
-            self.update()
+            new_x = self._indicator_x()
+            if old_x is None or new_x is None: self.update(); return
+            for x in (old_x, new_x): self.update(QtCore.QRect(int(x) - 3, 0, 7, self.height()))
 
-    def paintEvent(self, event):
-        super().paintEvent(event)
-        if self.total_frames <= 1 or self.num_tanks == 0: return
+    def resizeEvent(self, event):
+        self._cache = None
+        super().resizeEvent(event)
 
-        painter = QtGui.QPainter(self)
-        painter.setRenderHint(QtGui.QPainter.Antialiasing)
-        rect = self.rect().adjusted(30, 10, -10, -10)
-        if not rect.isValid(): return
+    def _bar_rect(self):
+        return self.rect().adjusted(30, 10, -10, -10)
 
+    def _indicator_x(self):
+        rect = self._bar_rect()
+        if self.total_frames <= 1 or self.num_tanks == 0 or not rect.isValid(): return None
+        return rect.left() + (self.current_frame / self.total_frames) * rect.width()
+
+    def _render_cache(self, rect):
+        dpr = self.devicePixelRatioF()
+        pixmap = QtGui.QPixmap(self.size() * dpr)
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(QtCore.Qt.transparent)
+        painter = QtGui.QPainter(pixmap)
+
+        segments = self._as_segments(self.timeline_segments)
+        colors = [QtGui.QColor(*self.behavior_colors.get(name, (100, 100, 100))) for name in segments.class_names]
+        columns = max(1, int(round(rect.width() * dpr)))
         bar_height_total = rect.height() / self.num_tanks
         bar_height_visible = bar_height_total * 0.8
+        font = painter.font()
+        font.setPointSize(7)
+        painter.setFont(font)
 
         for i in range(self.num_tanks):
             tank_id = i + 1
             y_pos = rect.top() + i * bar_height_total
-            painter.setPen(QtCore.Qt.NoPen)
-            painter.setBrush(QtGui.QBrush(QtGui.QColor("#4a4a4a")))
-            painter.drawRect(QtCore.QRectF(rect.left(), y_pos, rect.width(), bar_height_visible))
-            if tank_id in self.timeline_segments:
-                for start_frame, end_frame, behavior in self.timeline_segments[tank_id]:
-                    color_tuple = self.behavior_colors.get(behavior, (100, 100, 100))
-                    color = QtGui.QColor(*color_tuple)
-                    x_start = rect.left() + (start_frame / self.total_frames) * rect.width()
-                    x_end = rect.left() + ((end_frame + 1) / self.total_frames) * rect.width()
-                    segment_width = max(1.0, x_end - x_start)
-                    painter.setBrush(QtGui.QBrush(color))
-                    painter.drawRect(QtCore.QRectF(x_start, y_pos, segment_width, bar_height_visible))
+            painter.fillRect(QtCore.QRectF(rect.left(), y_pos, rect.width(), bar_height_visible), QtGui.QColor("#4a4a4a"))
+            if tank_id in segments:
+                dominant = segments.dominant_classes(tank_id, self.total_frames, columns)
+                run_starts = [0] + (np.flatnonzero(dominant[1:] != dominant[:-1]) + 1).tolist()
+                for start, stop in zip(run_starts, run_starts[1:] + [columns]):
+                    class_id = int(dominant[start])
+                    if class_id >= 0:
+                        painter.fillRect(QtCore.QRectF(rect.left() + start / dpr, y_pos, (stop - start) / dpr, bar_height_visible), colors[class_id])
             painter.setPen(QtGui.QColor("#e0e0e0"))
-            font = painter.font()
-            font.setPointSize(7)
-            painter.setFont(font)
             label_rect = QtCore.QRectF(rect.left() - 25, y_pos, 20, bar_height_visible)
             painter.drawText(label_rect, QtCore.Qt.AlignVCenter | QtCore.Qt.AlignRight, f"T{tank_id}")
-        
-        if self.total_frames > 0:
-            indicator_x = rect.left() + (self.current_frame / self.total_frames) * rect.width()
-            painter.setPen(QtGui.QPen(QtGui.QColor(255, 80, 80, 220), 2))
-            painter.drawLine(QtCore.QPointF(indicator_x, rect.top()), QtCore.QPointF(indicator_x, rect.bottom()))
\ No newline at end of file
+        painter.end()
+        return pixmap
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.total_frames <= 1 or self.num_tanks == 0: return
+        rect = self._bar_rect()
+        if not rect.isValid(): return
+        if self._cache is None or self._cache.size() != self.size() * self.devicePixelRatioF():
+            self._cache = self._render_cache(rect)
+
+        painter = QtGui.QPainter(self)
+        painter.drawPixmap(0, 0, self._cache)
+        indicator_x = self._indicator_x()
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.setPen(QtGui.QPen(QtGui.QColor(255, 80, 80, 220), 2))
+        painter.drawLine(QtCore.QPointF(indicator_x, rect.top()), QtCore.QPointF(indicator_x, rect.bottom()))
@@ -4,6 +4,11 @@ import os
 from PyQt5 import QtWidgets
 from PyQt5.QtCore import QThread
 from workers.yolo_processor import YoloProcessor
+from core.inference import DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE
+from core.video_scheduler import default_parallel_videos
+from core.motion_gate import DEFAULT_MOTION_THRESHOLD, DEFAULT_MAX_SKIP_FRAMES
+from core.tank_tiles import DEFAULT_TILE_SIZE
+from core.model_runtime import RUNTIMES
 
 class YoloInferenceDialog(QtWidgets.QDialog):
     def __init__(self, parent=None):
@@ -17,8 +22,29 @@ class YoloInferenceDialog(QtWidgets.QDialog):
         self.output_dir_line_edit = QtWidgets.QLineEdit(); self.output_dir_line_edit.setPlaceholderText("Click 'Browse' to select an output folder")
         self.add_videos_btn = QtWidgets.QPushButton("Add Videos..."); self.browse_model_btn = QtWidgets.QPushButton("Browse..."); self.browse_output_btn = QtWidgets.QPushButton("Browse...")
         self.confidence_spinbox = QtWidgets.QDoubleSpinBox(); self.confidence_spinbox.setRange(0.0, 1.0); self.confidence_spinbox.setSingleStep(0.05); self.confidence_spinbox.setValue(0.4)
+        self.batch_size_spinbox = QtWidgets.QSpinBox(); self.batch_size_spinbox.setRange(1, MAX_BATCH_SIZE); self.batch_size_spinbox.setValue(DEFAULT_BATCH_SIZE)
+        self.batch_size_spinbox.setToolTip("Number of frames passed to the model per call. Larger batches are faster but use more memory.")
+        self.parallel_videos_spinbox = QtWidgets.QSpinBox(); self.parallel_videos_spinbox.setRange(1, 32); self.parallel_videos_spinbox.setValue(default_parallel_videos())
+        self.parallel_videos_spinbox.setToolTip("Number of videos processed at the same time, each in its own process with its own copy of the model and a share of the CPU cores.")
+        self.runtime_combo = QtWidgets.QComboBox()
+        for runtime, label in RUNTIMES.items(): self.runtime_combo.addItem(label, runtime)
+        self.runtime_combo.setToolTip("How the model is run. ONNX Runtime and OpenVINO are exported from the .pt file once and run on the CPU, usually much faster than PyTorch there; INT8 weights are faster still but slightly less accurate.")
+        self.motion_gating_checkbox = QtWidgets.QCheckBox("Skip inference on frames without motion")
+        self.motion_gating_checkbox.setToolTip("Runs the model only when part of a grid cell changed since the last inferred frame; other frames reuse its detections, marked in the CSV's 'carried' column.")
+        self.motion_threshold_spinbox = QtWidgets.QDoubleSpinBox(); self.motion_threshold_spinbox.setRange(0.01, 100.0); self.motion_threshold_spinbox.setDecimals(2); self.motion_threshold_spinbox.setSingleStep(0.05); self.motion_threshold_spinbox.setSuffix(" %"); self.motion_threshold_spinbox.setValue(DEFAULT_MOTION_THRESHOLD)
+        self.motion_threshold_spinbox.setToolTip("Share of a cell's pixels that must change to run inference.")
+        self.max_skip_spinbox = QtWidgets.QSpinBox(); self.max_skip_spinbox.setRange(1, 10000); self.max_skip_spinbox.setValue(DEFAULT_MAX_SKIP_FRAMES)
+        self.max_skip_spinbox.setToolTip("Inference runs at least once every this many frames, even without motion.")
+        self.grid_settings_line_edit = QtWidgets.QLineEdit(); self.grid_settings_line_edit.setPlaceholderText("Optional settings file (.json) with the tank grid")
+        self.browse_grid_settings_btn = QtWidgets.QPushButton("Browse...")
+        self.tile_tanks_checkbox = QtWidgets.QCheckBox("Run inference on each tank separately")
+        self.tile_tanks_checkbox.setToolTip("Crops every tank of the grid settings out of the frame and runs the model on the crops, so small fish keep their resolution. Detections get their tank number in the CSV.")
+        self.tile_size_spinbox = QtWidgets.QSpinBox(); self.tile_size_spinbox.setRange(64, 1280); self.tile_size_spinbox.setSingleStep(32); self.tile_size_spinbox.setSuffix(" px"); self.tile_size_spinbox.setValue(DEFAULT_TILE_SIZE)
+        self.tile_size_spinbox.setToolTip("Model input size for one tank crop.")
         self.save_video_checkbox = QtWidgets.QCheckBox("Save Annotated Video"); self.save_video_checkbox.setChecked(True)
         self.save_csv_checkbox = QtWidgets.QCheckBox("Save Detections CSV"); self.save_csv_checkbox.setChecked(True)
+        self.use_cache_checkbox = QtWidgets.QCheckBox("Reuse Cached Model Outputs"); self.use_cache_checkbox.setChecked(True)
+        self.use_cache_checkbox.setToolTip("Keeps the model outputs of every video in a cache and reuses them when the same video is run again with the same model, e.g. at a higher confidence threshold. Not used with motion gating.")
         self.start_btn = QtWidgets.QPushButton("Start Inference"); self.cancel_btn = QtWidgets.QPushButton("Cancel")
         self.overall_progress_bar = QtWidgets.QProgressBar(); self.overall_progress_label = QtWidgets.QLabel("Waiting to start...")
         self.file_progress_bar = QtWidgets.QProgressBar(); self.file_progress_label = QtWidgets.QLabel("Frame: 0 / 0")
@@ -26,7 +52,8 @@ class YoloInferenceDialog(QtWidgets.QDialog):
         # ### CORRECTED INITIALIZATION ###
         self.elapsed_time_label = QtWidgets.QLabel("Elapsed: 00:00:00")
         self.etr_label = QtWidgets.QLabel("ETR: --:--:--")
-        self.speed_label = QtWidgets.QLabel("Speed: 0.00 FPS")
+        self.speed_label = QtWidgets.QLabel("Speed: 0.00 FPS"); self.current_fps = 0.0
+        self.speed_label.setToolTip("Overall speed, then the frames per second each stage (decode, inference, encode) sustains while busy. The slowest stage limits the overall speed.")
         
         self.log_text_edit = QtWidgets.QTextEdit(); self.log_text_edit.setReadOnly(True)
 
@@ -36,9 +63,20 @@ class YoloInferenceDialog(QtWidgets.QDialog):
         form_layout.addWidget(QtWidgets.QLabel("YOLO Model File (.pt):"), 2, 0); form_layout.addWidget(self.model_line_edit, 3, 0); form_layout.addWidget(self.browse_model_btn, 3, 1)
         form_layout.addWidget(QtWidgets.QLabel("Output Directory:"), 4, 0); form_layout.addWidget(self.output_dir_line_edit, 5, 0); form_layout.addWidget(self.browse_output_btn, 5, 1)
         form_layout.addWidget(QtWidgets.QLabel("Confidence Threshold:"), 6, 0); form_layout.addWidget(self.confidence_spinbox, 6, 1)
+        form_layout.addWidget(QtWidgets.QLabel("Batch Size (frames):"), 7, 0); form_layout.addWidget(self.batch_size_spinbox, 7, 1)
+        form_layout.addWidget(QtWidgets.QLabel("Parallel Videos:"), 8, 0); form_layout.addWidget(self.parallel_videos_spinbox, 8, 1)
+        form_layout.addWidget(QtWidgets.QLabel("Runtime:"), 9, 0); form_layout.addWidget(self.runtime_combo, 9, 1)
         output_options_group = QtWidgets.QGroupBox("Output Options"); output_options_layout = QtWidgets.QHBoxLayout(output_options_group)
-        output_options_layout.addWidget(self.save_video_checkbox); output_options_layout.addWidget(self.save_csv_checkbox); output_options_layout.addStretch()
-        form_layout.addWidget(output_options_group, 7, 0, 1, 2)
+        output_options_layout.addWidget(self.save_video_checkbox); output_options_layout.addWidget(self.save_csv_checkbox); output_options_layout.addWidget(self.use_cache_checkbox); output_options_layout.addStretch()
+        form_layout.addWidget(output_options_group, 10, 0, 1, 2)
+        motion_gating_group = QtWidgets.QGroupBox("Motion Gating"); motion_gating_layout = QtWidgets.QGridLayout(motion_gating_group)
+        motion_gating_layout.addWidget(self.motion_gating_checkbox, 0, 0, 1, 4)
+        motion_gating_layout.addWidget(QtWidgets.QLabel("Motion Threshold:"), 1, 0); motion_gating_layout.addWidget(self.motion_threshold_spinbox, 1, 1); motion_gating_layout.addWidget(QtWidgets.QLabel("Max Skipped Frames:"), 1, 2); motion_gating_layout.addWidget(self.max_skip_spinbox, 1, 3)
+        form_layout.addWidget(motion_gating_group, 11, 0, 1, 2)
+        tank_grid_group = QtWidgets.QGroupBox("Tank Grid"); tank_grid_layout = QtWidgets.QGridLayout(tank_grid_group)
+        tank_grid_layout.addWidget(QtWidgets.QLabel("Grid Settings:"), 0, 0); tank_grid_layout.addWidget(self.grid_settings_line_edit, 0, 1, 1, 2); tank_grid_layout.addWidget(self.browse_grid_settings_btn, 0, 3)
+        tank_grid_layout.addWidget(self.tile_tanks_checkbox, 1, 0, 1, 2); tank_grid_layout.addWidget(QtWidgets.QLabel("Tank Input Size:"), 1, 2); tank_grid_layout.addWidget(self.tile_size_spinbox, 1, 3)
+        form_layout.addWidget(tank_grid_group, 12, 0, 1, 2)
         layout.addLayout(form_layout)
         
         progress_group = QtWidgets.QGroupBox("Progress"); progress_layout = QtWidgets.QVBoxLayout(progress_group)
@@ -50,8 +88,9 @@ class YoloInferenceDialog(QtWidgets.QDialog):
         button_layout = QtWidgets.QHBoxLayout(); button_layout.addStretch(); button_layout.addWidget(self.cancel_btn); button_layout.addWidget(self.start_btn); layout.addLayout(button_layout)
 
         self.add_videos_btn.clicked.connect(self.add_videos); self.browse_model_btn.clicked.connect(self.browse_model); self.browse_output_btn.clicked.connect(self.browse_output)
+        self.browse_grid_settings_btn.clicked.connect(self.browse_grid_settings); self.motion_gating_checkbox.toggled.connect(self.update_motion_gating_controls); self.tile_tanks_checkbox.toggled.connect(self.update_motion_gating_controls)
         self.start_btn.clicked.connect(self.start_processing); self.cancel_btn.clicked.connect(self.cancel_processing)
-        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(False); self.update_motion_gating_controls()
 
     def add_videos(self):
         files, _ = QtWidgets.QFileDialog.getOpenFileNames(self, "Select Video Files", "", "Video Files (*.mp4 *.avi *.mov)")
@@ -64,6 +103,17 @@ class YoloInferenceDialog(QtWidgets.QDialog):
         if file:
             self.model_line_edit.setText(file)
 
+    def browse_grid_settings(self):
+        file, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Select Settings File", "", "JSON Files (*.json)")
+        if file:
+            self.grid_settings_line_edit.setText(file)
+
+    def update_motion_gating_controls(self):
+        idle = self.start_btn.isEnabled()
+        for widget in (self.motion_threshold_spinbox, self.max_skip_spinbox): widget.setEnabled(idle and self.motion_gating_checkbox.isChecked())
+        self.tile_size_spinbox.setEnabled(idle and self.tile_tanks_checkbox.isChecked())
+        for widget in (self.grid_settings_line_edit, self.browse_grid_settings_btn): widget.setEnabled(idle and (self.motion_gating_checkbox.isChecked() or self.tile_tanks_checkbox.isChecked()))
+
     def browse_output(self):
         directory = QtWidgets.QFileDialog.getExistingDirectory(self, "Select Output Directory")
         if directory:
@@ -74,6 +124,9 @@ class YoloInferenceDialog(QtWidgets.QDialog):
         if not self.model_line_edit.text() or not os.path.exists(self.model_line_edit.text()): QtWidgets.QMessageBox.warning(self, "Input Error", "Please select a valid YOLO model (.pt) file."); return
         if not self.output_dir_line_edit.text() or not os.path.isdir(self.output_dir_line_edit.text()): QtWidgets.QMessageBox.warning(self, "Input Error", "Please select a valid output directory."); return
         if not self.save_video_checkbox.isChecked() and not self.save_csv_checkbox.isChecked(): QtWidgets.QMessageBox.warning(self, "Input Error", "Please select at least one output option."); return
+        grid_settings_file = self.grid_settings_line_edit.text() or None
+        if self.tile_tanks_checkbox.isChecked() and not grid_settings_file: QtWidgets.QMessageBox.warning(self, "Input Error", "Running inference per tank needs a grid settings file."); return
+        if grid_settings_file and not os.path.isfile(grid_settings_file): QtWidgets.QMessageBox.warning(self, "Input Error", "The grid settings file does not exist."); return
         
         self.toggle_controls(False)
         self.log_text_edit.clear()
@@ -84,7 +137,16 @@ class YoloInferenceDialog(QtWidgets.QDialog):
             self.output_dir_line_edit.text(), 
             self.confidence_spinbox.value(), 
             save_video=self.save_video_checkbox.isChecked(), 
-            save_csv=self.save_csv_checkbox.isChecked()
+            save_csv=self.save_csv_checkbox.isChecked(),
+            batch_size=self.batch_size_spinbox.value(),
+            parallel_videos=self.parallel_videos_spinbox.value(),
+            motion_threshold=self.motion_threshold_spinbox.value() if self.motion_gating_checkbox.isChecked() else None,
+            max_skip_frames=self.max_skip_spinbox.value(),
+            settings_file=grid_settings_file,
+            tile_tanks=self.tile_tanks_checkbox.isChecked(),
+            tile_size=self.tile_size_spinbox.value(),
+            use_cache=self.use_cache_checkbox.isChecked(),
+            runtime=self.runtime_combo.currentData()
         )
         self.yolo_thread = QThread()
         self.yolo_worker.moveToThread(self.yolo_thread)
@@ -94,7 +156,7 @@ class YoloInferenceDialog(QtWidgets.QDialog):
         self.yolo_worker.error.connect(self.on_processing_error)
         self.yolo_worker.finished.connect(self.on_processing_finished)
         self.yolo_worker.time_updated.connect(self.update_time_labels)
-        self.yolo_worker.speed_updated.connect(self.update_speed_label)
+        self.yolo_worker.speed_updated.connect(self.update_speed_label); self.yolo_worker.stage_speeds_updated.connect(self.update_stage_speeds)
         self.yolo_thread.started.connect(self.yolo_worker.run)
         self.yolo_thread.start()
         
@@ -133,13 +195,18 @@ class YoloInferenceDialog(QtWidgets.QDialog):
         self.etr_label.setText(f"ETR: {etr}")
 
     def update_speed_label(self, fps):
-        self.speed_label.setText(f"Speed: {fps:.2f} FPS")
+        self.current_fps = fps; self.speed_label.setText(f"Speed: {fps:.2f} FPS")
+
+    def update_stage_speeds(self, decode_fps, inference_fps, encode_fps):
+        stages = f"decode {decode_fps:.0f} | inference {inference_fps:.0f}" + (f" | encode {encode_fps:.0f}" if encode_fps else "")
+        self.speed_label.setText(f"Speed: {self.current_fps:.2f} FPS ({stages})")
 
     def toggle_controls(self, enabled):
         self.start_btn.setEnabled(enabled)
         self.add_videos_btn.setEnabled(enabled)
         self.browse_model_btn.setEnabled(enabled)
         self.browse_output_btn.setEnabled(enabled)
+        self.motion_gating_checkbox.setEnabled(enabled); self.tile_tanks_checkbox.setEnabled(enabled); self.use_cache_checkbox.setEnabled(enabled); self.runtime_combo.setEnabled(enabled); self.update_motion_gating_controls()
         self.cancel_btn.setEnabled(not enabled)
 
     def closeEvent(self, event):
@@ -4,6 +4,9 @@ import os
 from PyQt5 import QtWidgets
 from PyQt5.QtCore import QThread
 from workers.yolo_segmentation_processor import YoloSegmentationProcessor
+from core.inference import DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE
+from core.video_scheduler import default_parallel_videos
+from core.model_runtime import RUNTIMES
 
 class YoloSegmentationDialog(QtWidgets.QDialog):
     def __init__(self, parent=None):
@@ -16,6 +19,17 @@ class YoloSegmentationDialog(QtWidgets.QDialog):
         self.output_dir_line_edit = QtWidgets.QLineEdit(); self.output_dir_line_edit.setPlaceholderText("Click 'Browse' to select an output folder")
         self.add_videos_btn = QtWidgets.QPushButton("Add Videos..."); self.browse_model_btn = QtWidgets.QPushButton("Browse..."); self.browse_output_btn = QtWidgets.QPushButton("Browse...")
         self.confidence_spinbox = QtWidgets.QDoubleSpinBox(); self.confidence_spinbox.setRange(0.0, 1.0); self.confidence_spinbox.setSingleStep(0.05); self.confidence_spinbox.setValue(0.4)
+        self.batch_size_spinbox = QtWidgets.QSpinBox(); self.batch_size_spinbox.setRange(1, MAX_BATCH_SIZE); self.batch_size_spinbox.setValue(DEFAULT_BATCH_SIZE)
+        self.batch_size_spinbox.setToolTip("Number of frames passed to the model per call. Larger batches are faster but use more memory.")
+        self.parallel_videos_spinbox = QtWidgets.QSpinBox(); self.parallel_videos_spinbox.setRange(1, 32); self.parallel_videos_spinbox.setValue(default_parallel_videos())
+        self.parallel_videos_spinbox.setToolTip("Number of videos processed at the same time, each in its own process with its own copy of the model and a share of the CPU cores.")
+        self.runtime_combo = QtWidgets.QComboBox()
+        for runtime, label in RUNTIMES.items(): self.runtime_combo.addItem(label, runtime)
+        self.runtime_combo.setToolTip("How the model is run. ONNX Runtime and OpenVINO are exported from the .pt file once and run on the CPU, usually much faster than PyTorch there; INT8 weights are faster still but slightly less accurate.")
+        self.polygon_tolerance_spinbox = QtWidgets.QDoubleSpinBox(); self.polygon_tolerance_spinbox.setRange(0.0, 20.0); self.polygon_tolerance_spinbox.setSingleStep(0.5); self.polygon_tolerance_spinbox.setSuffix(" px"); self.polygon_tolerance_spinbox.setValue(0.0)
+        self.polygon_tolerance_spinbox.setToolTip("Simplifies the saved polygons so that no vertex moves by more than this distance. 0 keeps every contour vertex.")
+        self.polygon_format_combo = QtWidgets.QComboBox(); self.polygon_format_combo.addItem("CSV column (text)", 'csv'); self.polygon_format_combo.addItem("Compressed binary file (.polygons)", 'binary')
+        self.polygon_format_combo.setToolTip("The binary format stores the polygons next to the CSV in a much smaller file that loads faster. EthoGrid reads both.")
         self.save_video_checkbox = QtWidgets.QCheckBox("Save Segmented Video"); self.save_video_checkbox.setChecked(True)
         self.save_csv_checkbox = QtWidgets.QCheckBox("Save Segmentations CSV"); self.save_csv_checkbox.setChecked(True)
         self.start_btn = QtWidgets.QPushButton("Start Segmentation"); self.cancel_btn = QtWidgets.QPushButton("Cancel")
@@ -24,7 +38,8 @@ class YoloSegmentationDialog(QtWidgets.QDialog):
         
         self.elapsed_time_label = QtWidgets.QLabel("Elapsed: 00:00:00")
         self.etr_label = QtWidgets.QLabel("ETR: --:--:--")
-        self.speed_label = QtWidgets.QLabel("Speed: 0.00 FPS")
+        self.speed_label = QtWidgets.QLabel("Speed: 0.00 FPS"); self.current_fps = 0.0
+        self.speed_label.setToolTip("Overall speed, then the frames per second each stage (decode, inference, encode) sustains while busy. The slowest stage limits the overall speed.")
         
         self.log_text_edit = QtWidgets.QTextEdit(); self.log_text_edit.setReadOnly(True)
 
@@ -34,9 +49,14 @@ class YoloSegmentationDialog(QtWidgets.QDialog):
         form_layout.addWidget(QtWidgets.QLabel("YOLO Model File (-seg.pt):"), 2, 0); form_layout.addWidget(self.model_line_edit, 3, 0); form_layout.addWidget(self.browse_model_btn, 3, 1)
         form_layout.addWidget(QtWidgets.QLabel("Output Directory:"), 4, 0); form_layout.addWidget(self.output_dir_line_edit, 5, 0); form_layout.addWidget(self.browse_output_btn, 5, 1)
         form_layout.addWidget(QtWidgets.QLabel("Confidence Threshold:"), 6, 0); form_layout.addWidget(self.confidence_spinbox, 6, 1)
+        form_layout.addWidget(QtWidgets.QLabel("Batch Size (frames):"), 7, 0); form_layout.addWidget(self.batch_size_spinbox, 7, 1)
+        form_layout.addWidget(QtWidgets.QLabel("Parallel Videos:"), 8, 0); form_layout.addWidget(self.parallel_videos_spinbox, 8, 1)
+        form_layout.addWidget(QtWidgets.QLabel("Runtime:"), 9, 0); form_layout.addWidget(self.runtime_combo, 9, 1)
         output_options_group = QtWidgets.QGroupBox("Output Options"); output_options_layout = QtWidgets.QHBoxLayout(output_options_group)
         output_options_layout.addWidget(self.save_video_checkbox); output_options_layout.addWidget(self.save_csv_checkbox); output_options_layout.addStretch()
-        form_layout.addWidget(output_options_group, 7, 0, 1, 2)
+        form_layout.addWidget(QtWidgets.QLabel("Polygon Simplification:"), 10, 0); form_layout.addWidget(self.polygon_tolerance_spinbox, 10, 1)
+        form_layout.addWidget(QtWidgets.QLabel("Polygon Format:"), 11, 0); form_layout.addWidget(self.polygon_format_combo, 11, 1)
+        form_layout.addWidget(output_options_group, 12, 0, 1, 2)
         layout.addLayout(form_layout)
         
         progress_group = QtWidgets.QGroupBox("Progress"); progress_layout = QtWidgets.QVBoxLayout(progress_group)
@@ -66,9 +86,9 @@ class YoloSegmentationDialog(QtWidgets.QDialog):
         if not self.output_dir_line_edit.text() or not os.path.isdir(self.output_dir_line_edit.text()): QtWidgets.QMessageBox.warning(self, "Input Error", "Please select a valid output directory."); return
         if not self.save_video_checkbox.isChecked() and not self.save_csv_checkbox.isChecked(): QtWidgets.QMessageBox.warning(self, "Input Error", "Please select at least one output option."); return
         self.toggle_controls(False); self.log_text_edit.clear()
-        self.yolo_worker = YoloSegmentationProcessor(self.video_files, self.model_line_edit.text(), self.output_dir_line_edit.text(), self.confidence_spinbox.value(), save_video=self.save_video_checkbox.isChecked(), save_csv=self.save_csv_checkbox.isChecked())
+        self.yolo_worker = YoloSegmentationProcessor(self.video_files, self.model_line_edit.text(), self.output_dir_line_edit.text(), self.confidence_spinbox.value(), save_video=self.save_video_checkbox.isChecked(), save_csv=self.save_csv_checkbox.isChecked(), batch_size=self.batch_size_spinbox.value(), parallel_videos=self.parallel_videos_spinbox.value(), polygon_tolerance=self.polygon_tolerance_spinbox.value(), polygon_format=self.polygon_format_combo.currentData(), runtime=self.runtime_combo.currentData())
         self.yolo_thread = QThread(); self.yolo_worker.moveToThread(self.yolo_thread)
-        self.yolo_worker.overall_progress.connect(self.update_overall_progress); self.yolo_worker.file_progress.connect(self.update_file_progress); self.yolo_worker.log_message.connect(self.log_text_edit.append); self.yolo_worker.error.connect(self.on_processing_error); self.yolo_worker.finished.connect(self.on_processing_finished); self.yolo_worker.time_updated.connect(self.update_time_labels); self.yolo_worker.speed_updated.connect(self.update_speed_label); self.yolo_thread.started.connect(self.yolo_worker.run)
+        self.yolo_worker.overall_progress.connect(self.update_overall_progress); self.yolo_worker.file_progress.connect(self.update_file_progress); self.yolo_worker.log_message.connect(self.log_text_edit.append); self.yolo_worker.error.connect(self.on_processing_error); self.yolo_worker.finished.connect(self.on_processing_finished); self.yolo_worker.time_updated.connect(self.update_time_labels); self.yolo_worker.speed_updated.connect(self.update_speed_label); self.yolo_worker.stage_speeds_updated.connect(self.update_stage_speeds); self.yolo_thread.started.connect(self.yolo_worker.run)
         self.yolo_thread.start()
     def cancel_processing(self):
         if self.yolo_worker: self.yolo_worker.stop(); self.cancel_btn.setEnabled(False)
@@ -87,9 +107,12 @@ class YoloSegmentationDialog(QtWidgets.QDialog):
     def update_time_labels(self, elapsed, etr):
         self.elapsed_time_label.setText(f"Elapsed: {elapsed}"); self.etr_label.setText(f"ETR: {etr}")
     def update_speed_label(self, fps):
-        self.speed_label.setText(f"Speed: {fps:.2f} FPS")
+        self.current_fps = fps; self.speed_label.setText(f"Speed: {fps:.2f} FPS")
+    def update_stage_speeds(self, decode_fps, inference_fps, encode_fps):
+        stages = f"decode {decode_fps:.0f} | inference {inference_fps:.0f}" + (f" | encode {encode_fps:.0f}" if encode_fps else "")
+        self.speed_label.setText(f"Speed: {self.current_fps:.2f} FPS ({stages})")
     def toggle_controls(self, enabled):
-        self.start_btn.setEnabled(enabled); self.add_videos_btn.setEnabled(enabled); self.browse_model_btn.setEnabled(enabled); self.browse_output_btn.setEnabled(enabled); self.cancel_btn.setEnabled(not enabled)
+        self.start_btn.setEnabled(enabled); self.add_videos_btn.setEnabled(enabled); self.browse_model_btn.setEnabled(enabled); self.browse_output_btn.setEnabled(enabled); self.runtime_combo.setEnabled(enabled); self.cancel_btn.setEnabled(not enabled)
     def closeEvent(self, event):
         if self.yolo_thread and self.yolo_thread.isRunning():
             self.cancel_processing(); self.yolo_thread.quit(); self.yolo_thread.wait()
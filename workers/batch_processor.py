@@ -1,14 +1,20 @@
 # EthoGrid_App/workers/batch_processor.py
 
-import os, csv, json, traceback
-from collections import defaultdict
-from PyQt5.QtCore import QThread, pyqtSignal, QPointF
-from PyQt5.QtGui import QTransform
+import os, traceback
+from PyQt5.QtCore import QThread, pyqtSignal
 import cv2
+import numpy as np
 
 from .video_saver import VideoSaver
 from core.data_exporter import export_centroid_csv, export_to_excel_sheets, export_trajectory_image
+from core.detection_loader import load_detection_file
+from core.polygon_store import polygon_store_path, write_polygon_store
 from core.stopwatch import Stopwatch
+from core.grid_manager import transform_from_settings, read_settings_file
+from core.tank_assignment import CellLabelMap, assign_tanks, inverse_matrix_for, load_arena_mask
+from core.timeline import TimelineSegments, build_segments
+from core.frame_pipeline import run_pipeline
+from core.parallel_export import effective_workers, ffmpeg_path
 
 class BatchProcessor(QThread):
     overall_progress = pyqtSignal(int, int, str)
@@ -18,28 +24,22 @@ class BatchProcessor(QThread):
     time_updated = pyqtSignal(str, str)
     speed_updated = pyqtSignal(float)
 
-    def __init__(self, video_files, settings_file, output_dir, csv_dir, save_video, save_csv, save_centroid_csv, save_excel, save_trajectory_img, time_gap_seconds, draw_overlays, parent=None):
+    def __init__(self, video_files, settings_file, output_dir, csv_dir, save_video, save_csv, save_centroid_csv, save_excel, save_trajectory_img, time_gap_seconds, draw_overlays, export_workers=1, parent=None):
         super().__init__(parent)
         self.video_files = video_files; self.settings_file = settings_file; self.output_dir = output_dir
         self.csv_dir = csv_dir # Store new CSV directory path
         self.save_video = save_video; self.save_csv = save_csv; self.save_centroid_csv = save_centroid_csv; self.save_excel = save_excel
         self.save_trajectory_img = save_trajectory_img; self.time_gap_seconds = time_gap_seconds
-        self.draw_overlays = draw_overlays; self.is_running = True
+        self.draw_overlays = draw_overlays; self.export_workers = export_workers; self.is_running = True
 
     def stop(self):
         self.log_message.emit("Stopping batch process..."); self.is_running = False
 
-    def _get_tank_for_point(self, x, y, w, h, cols, rows, inverse_transform):
-        transformed_point = inverse_transform.map(QPointF(x, y)); tx, ty = transformed_point.x(), transformed_point.y()
-        if not (0 <= tx < w and 0 <= ty < h): return None
-        cell_width, cell_height = w / cols, h / rows; col = min(cols - 1, max(0, int(tx / cell_width))); row = min(rows - 1, max(0, int(ty / cell_height)))
-        return row * cols + col + 1
-
     def run(self):
         try:
-            with open(self.settings_file, 'r') as f: settings_data = json.load(f)
-            grid_settings = settings_data['grid_settings']; transform_settings = settings_data['grid_transform']
+            grid_settings, transform_settings, arena_mask_path = read_settings_file(self.settings_file)
         except Exception as e: self.log_message.emit(f"[ERROR] Failed to load settings file: {e}"); return
+        label_maps = {}  # One lazily built cell-label raster per video resolution, shared by all videos of that size.
 
         file_stopwatch = Stopwatch()
         for idx, video_path in enumerate(self.video_files):
@@ -63,39 +63,25 @@ class BatchProcessor(QThread):
             
             self.log_message.emit(f"Found matching detection file: {os.path.basename(csv_path)}")
             try:
-                # The rest of the run method is identical to the previous version
-                detections, csv_headers = {}, []
-                with open(csv_path, newline="", encoding='utf-8') as f:
-                    reader = csv.DictReader(f); csv_headers = reader.fieldnames[:]
-                    coord_cols = ['x1', 'y1', 'x2', 'y2', 'cx', 'cy']
-                    for row in reader:
-                        frame_idx = int(float(row["frame_idx"]))
-                        for col in coord_cols:
-                            if col in row and row[col]:
-                                try: row[col] = float(row[col])
-                                except (ValueError, TypeError): row[col] = None
-                        detections.setdefault(frame_idx, []).append(row)
+                detections, load_stats = load_detection_file(csv_path); self.log_message.emit(load_stats.summary())
                 
                 self.log_message.emit("Assigning detections to tanks based on centroid...")
                 cap = cv2.VideoCapture(video_path)
                 if not cap.isOpened(): self.log_message.emit(f"[ERROR] Could not open video: {video_filename}"); continue
                 video_w, video_h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)); video_fps, total_frames = cap.get(cv2.CAP_PROP_FPS) or 30.0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)); video_size = (video_w, video_h); cap.release()
-                final_transform = QTransform(); final_transform.translate(video_w * transform_settings['center_x'], video_h * transform_settings['center_y']); final_transform.rotate(transform_settings['angle']); final_transform.scale(transform_settings['scale_x'], transform_settings['scale_y']); final_transform.translate(-video_w / 2, -video_h / 2)
-                inverse_transform, _ = final_transform.inverted()
-                for dets in detections.values():
-                    for det in dets:
-                        if 'cx' not in det or det['cx'] is None: det['cx'], det['cy'] = (det["x1"] + det["x2"]) / 2.0, (det["y1"] + det["y2"]) / 2.0
-                        det['tank_number'] = self._get_tank_for_point(det['cx'], det['cy'], video_w, video_h, grid_settings['cols'], grid_settings['rows'], inverse_transform)
+                final_transform = transform_from_settings(transform_settings, video_size)
+                inverse_matrix = inverse_matrix_for(final_transform)
+                if inverse_matrix is None: self.log_message.emit(f"[ERROR] Skipping '{video_filename}': the saved grid transform is degenerate and cannot be inverted."); continue
+                if video_size not in label_maps:
+                    label_maps[video_size] = CellLabelMap(inverse_matrix, video_size, grid_settings['cols'], grid_settings['rows'], load_arena_mask(arena_mask_path, video_size) if arena_mask_path else None)
+                missing_centroid = np.isnan(detections.cx)
+                cxs = np.where(missing_centroid, (detections.x1 + detections.x2) / 2.0, detections.cx); cys = np.where(missing_centroid, (detections.y1 + detections.y2) / 2.0, detections.cy)
+                tank_numbers = assign_tanks(cxs, cys, inverse_matrix, video_size, grid_settings['cols'], grid_settings['rows'], label_maps[video_size]).astype(np.int16)
+                detections = detections.with_columns(cx=cxs, cy=cys, tank_number=tank_numbers)
                 if self.save_csv:
                     output_csv_path = os.path.join(self.output_dir, f"{base_name}_with_tanks.csv"); self.log_message.emit(f"Saving enriched CSV to: {os.path.basename(output_csv_path)}")
-                    all_processed_detections = [det for frame_dets in detections.values() for det in frame_dets]; new_headers = csv_headers[:]; new_headers.extend(k for k in ['tank_number', 'cx', 'cy'] if k not in new_headers)
-                    with open(output_csv_path, 'w', newline='', encoding='utf-8') as f:
-                        writer = csv.DictWriter(f, fieldnames=new_headers, extrasaction='ignore'); writer.writeheader()
-                        for det in all_processed_detections:
-                            row_to_write = det.copy()
-                            for key in ['x1', 'y1', 'x2', 'y2', 'cx', 'cy']:
-                                if key in row_to_write and isinstance(row_to_write[key], float): row_to_write[key] = f"{row_to_write[key]:.4f}"
-                            writer.writerow(row_to_write)
+                    detections.write_csv(output_csv_path)
+                    if detections.polygons is not None and 'polygon' not in detections.extra: write_polygon_store(polygon_store_path(output_csv_path), detections.polygons)
                 if self.save_centroid_csv:
                     output_centroid_path = os.path.join(self.output_dir, f"{base_name}_centroids_wide.csv"); self.log_message.emit(f"Saving centroid CSV to: {os.path.basename(output_centroid_path)}")
                     error_msg = export_centroid_csv(detections, grid_settings['cols'] * grid_settings['rows'], output_centroid_path)
@@ -110,38 +96,32 @@ class BatchProcessor(QThread):
                     if error_msg: self.log_message.emit(f"[ERROR] Trajectory image export failed: {error_msg}")
                 if self.save_video:
                     output_video_path = os.path.join(self.output_dir, f"{base_name}_annotated.mp4"); self.log_message.emit(f"Exporting annotated video to: {os.path.basename(output_video_path)}")
-                    all_behaviors = sorted(list(set(det['class_name'] for dets in detections.values() for det in dets))); predefined_colors = [(31,119,180),(255,127,14),(44,160,44),(214,39,40),(148,103,189),(140,86,75),(227,119,194),(127,127,127),(188,189,34),(23,190,207)]; behavior_colors = {name: predefined_colors[i % len(predefined_colors)] for i, name in enumerate(all_behaviors)}
-                    tank_data_for_timeline = defaultdict(dict)
-                    if self.draw_overlays:
-                        for frame_idx_tl, dets in detections.items():
-                            for det in dets:
-                                if det.get('tank_number') is not None: tank_data_for_timeline[det['tank_number']][frame_idx_tl] = det["class_name"]
-                    timeline_segments = {};
-                    for tank_id, frames in tank_data_for_timeline.items():
-                        if not frames: continue
-                        segments, sorted_frames = [], sorted(frames.keys()); start_frame, current_behavior = sorted_frames[0], frames[sorted_frames[0]]
-                        for i in range(1, len(sorted_frames)):
-                            frame, prev_frame, behavior = sorted_frames[i], sorted_frames[i-1], frames[sorted_frames[i]]
-                            if behavior != current_behavior or frame != prev_frame + 1: segments.append((start_frame, prev_frame, current_behavior)); start_frame, current_behavior = frame, behavior
-                        segments.append((start_frame, sorted_frames[-1], current_behavior)); timeline_segments[tank_id] = segments
+                    all_behaviors = sorted(set(detections.class_names)); predefined_colors = [(31,119,180),(255,127,14),(44,160,44),(214,39,40),(148,103,189),(140,86,75),(227,119,194),(127,127,127),(188,189,34),(23,190,207)]; behavior_colors = {name: predefined_colors[i % len(predefined_colors)] for i, name in enumerate(all_behaviors)}
+                    timeline_segments = build_segments(detections.frame_idx, detections.tank_number, detections.class_id, detections.class_names) if self.draw_overlays else TimelineSegments.empty()
                     video_exporter = VideoSaver(source_video_path=video_path, output_video_path=output_video_path, detections=detections, grid_settings=grid_settings, grid_transform=final_transform, behavior_colors=behavior_colors, video_size=video_size, fps=video_fps, line_thickness=grid_settings.get('line_thickness', 2), selected_cells=set(), timeline_segments=timeline_segments, draw_grid=False, draw_overlays=self.draw_overlays)
-                    cap_export = cv2.VideoCapture(video_path); fourcc = cv2.VideoWriter_fourcc(*'mp4v'); writer = cv2.VideoWriter(output_video_path, fourcc, video_fps, video_exporter.final_video_size)
                     file_stopwatch.start()
-                    frame_count_for_fps = 0; fps_check_time = 0
-                    for frame_idx_export in range(total_frames):
-                        if not self.is_running: break
-                        ret, frame = cap_export.read()
-                        if not ret: break
-                        processed_frame = video_exporter.process_frame(frame, frame_idx_export, total_frames); writer.write(processed_frame)
-                        frame_count_for_fps += 1
+                    speed = {'frames': 0, 'checked_at': 0}
+                    def report_progress(frames_done):
                         current_time = file_stopwatch.get_elapsed_time(as_float=True)
-                        if current_time > fps_check_time + 1:
-                            processing_fps = frame_count_for_fps / (current_time - fps_check_time)
-                            self.speed_updated.emit(processing_fps)
-                            frame_count_for_fps = 0; fps_check_time = current_time
-                        progress = int((frame_idx_export + 1) * 100 / total_frames); self.file_progress.emit(progress, frame_idx_export + 1, total_frames)
-                        self.time_updated.emit(file_stopwatch.get_elapsed_time(), file_stopwatch.get_etr(frame_idx_export + 1, total_frames))
-                    cap_export.release(); writer.release()
+                        if current_time > speed['checked_at'] + 1:
+                            self.speed_updated.emit((frames_done - speed['frames']) / (current_time - speed['checked_at']))
+                            speed['frames'], speed['checked_at'] = frames_done, current_time
+                        self.file_progress.emit(int(frames_done * 100 / total_frames), frames_done, total_frames)
+                        self.time_updated.emit(file_stopwatch.get_elapsed_time(), file_stopwatch.get_etr(max(frames_done, 1), total_frames))
+                    workers = effective_workers(total_frames, self.export_workers)
+                    if self.export_workers > 1 and ffmpeg_path() is None: self.log_message.emit("ffmpeg was not found; exporting the video in a single process.")
+                    if workers > 1:
+                        self.log_message.emit(f"Rendering the video in {workers} parallel segments...")
+                        error_msg = video_exporter.export_in_parallel(total_frames, workers, report_progress, lambda: not self.is_running)
+                        if error_msg: self.log_message.emit(f"[ERROR] Video export failed: {error_msg}"); continue
+                    else:
+                        cap_export = cv2.VideoCapture(video_path); fourcc = cv2.VideoWriter_fourcc(*'mp4v'); writer = cv2.VideoWriter(output_video_path, fourcc, video_fps, video_exporter.final_video_size)
+                        try:
+                            pipeline_stats = run_pipeline(cap_export, writer, lambda frame, frame_idx: video_exporter.process_frame(frame, frame_idx, total_frames), 0, total_frames,
+                                                          lambda frames_done: report_progress(frames_done) or self.is_running)
+                        finally:
+                            cap_export.release(); writer.release()
+                        self.log_message.emit(pipeline_stats.summary())
                     self.log_message.emit(f"✓ Finished processing video for: {video_filename}")
                 else:
                     if any([self.save_csv, self.save_centroid_csv, self.save_excel, self.save_trajectory_img]):
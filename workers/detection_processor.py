@@ -1,13 +1,40 @@
 # EthoGrid_App/workers/detection_processor.py
 
-from PyQt5.QtCore import QThread, pyqtSignal, QPointF
+import time
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from core.tank_assignment import assign_tanks, inverse_matrix_for
+from core.timeline import TimelineSegments, build_segments
+
+def assign_detections(table, inverse_matrix, video_size, grid_settings, rows=slice(None), out=None, label_map=None):
+    """
+    Computes bbox centroids and tank numbers for `rows` of a DetectionTable.
+    Results are written into `out` = (cxs, cys, tank_numbers) when given, otherwise returned as new arrays.
+    `label_map` is an optional CellLabelMap of the grid (see GridManager.label_map).
+    """
+    cxs = (table.x1[rows] + table.x2[rows]) / 2.0
+    cys = (table.y1[rows] + table.y2[rows]) / 2.0
+    tank_numbers = assign_tanks(cxs, cys, inverse_matrix, video_size, grid_settings['cols'], grid_settings['rows'], label_map).astype(np.int16)
+    if out is None: return cxs, cys, tank_numbers
+    out[0][rows], out[1][rows], out[2][rows] = cxs, cys, tank_numbers
+    return out
 
 class DetectionProcessor(QThread):
-    processing_finished = pyqtSignal(dict, dict)
+    """
+    Assigns every detection to a tank and builds the timeline segments in the background.
+    The work is done in frame-aligned chunks, so `stop()` takes effect quickly, and the segments
+    finished so far are streamed through `timeline_progress` while the job runs.
+    """
+    CHUNK_ROWS = 250_000
+    PROGRESS_INTERVAL = 0.25  # Seconds between two partial timeline updates.
+    processing_finished = pyqtSignal(object, object)  # DetectionTable, TimelineSegments
+    timeline_progress = pyqtSignal(object, int)  # TimelineSegments so far, last frame they cover.
     error_occurred = pyqtSignal(str)
 
-    def __init__(self, detections, grid_transform, grid_settings, video_size, parent=None):
+    def __init__(self, detections, grid_transform, grid_settings, video_size, label_map=None, parent=None):
         super().__init__(parent)
+        self.label_map = label_map
         self.detections = detections
         self.grid_transform = grid_transform
         self.grid_settings = grid_settings
@@ -17,61 +44,30 @@ class DetectionProcessor(QThread):
     def stop(self):
         self._is_running = False
 
-    def _get_tank_for_point(self, x, y, w, h, cols, rows, inverse_transform):
-        transformed_point = inverse_transform.map(QPointF(x, y))
-        tx, ty = transformed_point.x(), transformed_point.y()
-        if not (0 <= tx < w and 0 <= ty < h): return None
-        cell_width, cell_height = w / cols, h / rows
-        col = min(cols - 1, max(0, int(tx / cell_width)))
-        row = min(rows - 1, max(0, int(ty / cell_height)))
-        return row * cols + col + 1
-
     def run(self):
         try:
-            w, h = self.video_size
-            cols, rows = self.grid_settings['cols'], self.grid_settings['rows']
-            inverse_transform, invertible = self.grid_transform.inverted()
-            if not invertible:
+            inverse_matrix = inverse_matrix_for(self.grid_transform)
+            if inverse_matrix is None:
                 self.error_occurred.emit("Grid transform is not invertible. Cannot process detections.")
                 return
 
-            tank_data_for_timeline = {}
-            for frame_idx, dets in list(self.detections.items()):
+            table = self.detections
+            columns = (table.allocate_column(np.float64), table.allocate_column(np.float64), table.allocate_column(np.int16))
+            segment_parts = []
+            last_progress = time.monotonic()
+            # Work in frame-aligned chunks so memory-mapped tables are never pulled into RAM as a whole.
+            for chunk in table.row_chunks(self.CHUNK_ROWS):
                 if not self._is_running: return
-                for det in dets:
-                    # Python's / operator produces a float, so precision is maintained here.
-                    cx = (float(det["x1"]) + float(det["x2"])) / 2.0
-                    cy = (float(det["y1"]) + float(det["y2"])) / 2.0
-                    
-                    det['cx'] = cx
-                    det['cy'] = cy
-                    
-                    tank_number = self._get_tank_for_point(cx, cy, w, h, cols, rows, inverse_transform)
-                    det['tank_number'] = tank_number
-                    
-                    if tank_number is not None:
-                        tank_data_for_timeline.setdefault(tank_number, {})[frame_idx] = det["class_name"]
+                assign_detections(table, inverse_matrix, self.video_size, self.grid_settings, chunk, out=columns, label_map=self.label_map)
+                segment_parts.append(build_segments(table.frame_idx[chunk], columns[2][chunk], table.class_id[chunk], table.class_names))
+                if chunk.stop < len(table) and time.monotonic() - last_progress >= self.PROGRESS_INTERVAL:
+                    segment_parts = [TimelineSegments.concatenate(segment_parts)]
+                    self.timeline_progress.emit(segment_parts[0], int(table.frame_idx[chunk.stop - 1]))
+                    last_progress = time.monotonic()
+            processed = table.with_columns(cx=columns[0], cy=columns[1], tank_number=columns[2])
+            timeline_segments = TimelineSegments.concatenate(segment_parts) if segment_parts else TimelineSegments.empty(table.class_names)
 
-            timeline_segments = {}
-            for tank_id, frames in tank_data_for_timeline.items():
-                if not self._is_running: return
-                if not frames: continue
-                segments = []
-                sorted_frames = sorted(frames.keys())
-                start_frame = sorted_frames[0]
-                current_behavior = frames[start_frame]
-                for i in range(1, len(sorted_frames)):
-                    frame = sorted_frames[i]
-                    prev_frame = sorted_frames[i-1]
-                    behavior = frames[frame]
-                    if behavior != current_behavior or frame != prev_frame + 1:
-                        segments.append((start_frame, prev_frame, current_behavior))
-                        start_frame = frame
-                        current_behavior = behavior
-                segments.append((start_frame, sorted_frames[-1], current_behavior))
-                timeline_segments[tank_id] = segments
-            
             if self._is_running:
-                self.processing_finished.emit(self.detections, timeline_segments)
+                self.processing_finished.emit(processed, timeline_segments)
         except Exception as e:
-            self.error_occurred.emit(f"Error during detection processing: {e}")
\ No newline at end of file
+            self.error_occurred.emit(f"Error during detection processing: {e}")
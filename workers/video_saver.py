@@ -4,6 +4,12 @@ import cv2
 import numpy as np
 from PyQt5.QtCore import QThread, pyqtSignal, QPointF
 
+from core.frame_pipeline import run_pipeline, open_at_frame
+from core.mask_blend import RegionBlend
+from core.parallel_export import effective_workers, frame_ranges, run_parallel_export
+from core.tank_assignment import NO_TANK
+from core.timeline import TimelineSegments
+
 class VideoSaver(QThread):
     progress_updated = pyqtSignal(int)
     finished = pyqtSignal()
@@ -12,7 +18,7 @@ class VideoSaver(QThread):
     def __init__(self, source_video_path, output_video_path, detections, 
                  grid_settings, grid_transform, behavior_colors, 
                  video_size, fps, line_thickness, selected_cells, 
-                 timeline_segments, draw_grid=False, draw_overlays=True, parent=None):
+                 timeline_segments, draw_grid=False, draw_overlays=True, workers=1, parent=None):
         super().__init__(parent)
         self.source_path = source_video_path
         self.output_path = output_video_path
@@ -24,10 +30,13 @@ class VideoSaver(QThread):
         self.fps = fps
         self.line_thickness = line_thickness
         self.selected_cells = selected_cells
-        self.timeline_segments = timeline_segments
+        self.timeline_segments = timeline_segments if isinstance(timeline_segments, TimelineSegments) else TimelineSegments.from_dict(timeline_segments)
         self.draw_grid = draw_grid
         self.draw_overlays = draw_overlays
+        self.workers = workers
+        self.pipeline_stats = None  # PipelineStats of the last serial export.
         self.is_running = True
+        self._static_layer = None
 
         original_w, original_h = self.video_size
         if self.draw_overlays:
@@ -42,47 +51,110 @@ class VideoSaver(QThread):
         self.is_running = False
 
     def _draw_legend_on_frame(self, frame, original_video_width):
-        if not self.behavior_colors: return
+        """Draws the behavior legend and returns the (x1, y1, x2, y2) rectangles of its swatches and labels."""
+        rects = []
+        if not self.behavior_colors: return rects
         legend_x_start = original_video_width + 20; y_offset = 0
         for behavior, color_rgb in sorted(self.behavior_colors.items()):
             y_pos = 20 + y_offset
             cv2.rectangle(frame, (legend_x_start, y_pos), (legend_x_start + 20, y_pos + 20), color_rgb[::-1], -1)
             cv2.putText(frame, behavior, (legend_x_start + 30, y_pos + 16), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (240, 240, 240), 1, cv2.LINE_AA)
+            (tw, th), baseline = cv2.getTextSize(behavior, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 1)
+            rects.append((legend_x_start, y_pos, legend_x_start + 21, y_pos + 21))
+            rects.append((legend_x_start + 29, y_pos + 16 - th - 1, legend_x_start + 31 + tw, y_pos + 17 + baseline))
             y_offset += 25
+        return rects
+
+    def _timeline_area(self, frame_shape, total_frames, original_video_height):
+        """Returns the (x, y, w, h) area of the timeline bars, or None if there is no timeline to draw."""
+        new_h, new_w = frame_shape[:2]
+        num_tanks = self.grid_settings['cols'] * self.grid_settings['rows']
+        if new_h <= original_video_height or num_tanks == 0 or total_frames <= 1: return None
+        draw_area_w, draw_area_h = new_w - 80, new_h - original_video_height - 20
+        return (40, original_video_height + 10, draw_area_w, draw_area_h)
 
-    def _draw_timeline_on_frame(self, frame, frame_idx, total_frames, original_video_height):
+    def _draw_timeline_on_frame(self, frame, total_frames, original_video_height):
+        """Draws the timeline panel and returns its (x1, y1, x2, y2) rectangle, or None if there is no timeline."""
         new_h, new_w, _ = frame.shape
         num_tanks = self.grid_settings['cols'] * self.grid_settings['rows']
-        if new_h <= original_video_height or num_tanks == 0 or total_frames <= 1: return
+        area = self._timeline_area(frame.shape, total_frames, original_video_height)
+        if area is None: return None
         cv2.rectangle(frame, (0, original_video_height), (new_w, new_h), (10, 10, 10), -1)
-        draw_area_x, draw_area_y = 40, original_video_height + 10
-        draw_area_w, draw_area_h = new_w - 80, new_h - original_video_height - 20
-        if draw_area_h <= 0 or draw_area_w <= 0: return
+        panel = (0, original_video_height, new_w, new_h)
+        draw_area_x, draw_area_y, draw_area_w, draw_area_h = area
+        if draw_area_h <= 0 or draw_area_w <= 0: return panel
         bar_h_total = draw_area_h / num_tanks; bar_h_visible = bar_h_total * 0.8
         for i in range(num_tanks):
             tank_id = i + 1; y_pos = draw_area_y + i * bar_h_total
             cv2.rectangle(frame, (draw_area_x, int(y_pos)), (draw_area_x + draw_area_w, int(y_pos + bar_h_visible)), (74, 74, 74), -1)
-            if tank_id in self.timeline_segments:
-                for start_f, end_f, behavior in self.timeline_segments[tank_id]:
-                    color_rgb = self.behavior_colors.get(behavior, (100, 100, 100))
-                    x_start = int(draw_area_x + (start_f / total_frames) * draw_area_w)
-                    x_end = int(draw_area_x + ((end_f + 1) / total_frames) * draw_area_w)
-                    cv2.rectangle(frame, (x_start, int(y_pos)), (x_end, int(y_pos + bar_h_visible)), color_rgb[::-1], -1)
+            starts, ends, class_ids = self.timeline_segments.tank_arrays(tank_id)
+            x_starts = (draw_area_x + (starts / total_frames) * draw_area_w).astype(int).tolist()
+            x_ends = (draw_area_x + ((ends + 1) / total_frames) * draw_area_w).astype(int).tolist()
+            for x_start, x_end, class_id in zip(x_starts, x_ends, class_ids.tolist()):
+                color_rgb = self.behavior_colors.get(self.timeline_segments.class_names[class_id], (100, 100, 100))
+                cv2.rectangle(frame, (x_start, int(y_pos)), (x_end, int(y_pos + bar_h_visible)), color_rgb[::-1], -1)
             cv2.putText(frame, f"T{tank_id}", (draw_area_x - 35, int(y_pos + bar_h_visible / 2 + 5)), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (224, 224, 224), 1, cv2.LINE_AA)
+        return panel
+
+    def _static_overlay(self, total_frames):
+        """
+        Returns the overlay canvas that is the same for every exported frame: the legend and the timeline bars.
+        It is rendered once per export (per total_frames) and copied under each frame, so only the playhead is drawn per frame.
+        """
+        if self._static_layer is None or self._static_layer[0] != total_frames:
+            original_w, original_h = self.video_size
+            new_w, new_h = self.final_video_size
+            canvas = np.zeros((new_h, new_w, 3), dtype=np.uint8)
+            rects = self._draw_legend_on_frame(canvas, original_w)
+            timeline_panel = self._draw_timeline_on_frame(canvas, total_frames, original_h)
+            if timeline_panel is not None: rects.append(timeline_panel)
+            self._static_layer = (total_frames, canvas, rects)
+        return self._static_layer[1]
+
+    def _draw_overlays_on_frame(self, frame, frame_idx, total_frames):
+        """
+        Restores the legend items and the timeline panel over anything the grid or the detections drew on them, then draws
+        the playhead. Other pixels outside the video area keep what was drawn there.
+        """
+        original_w, original_h = self.video_size
+        static = self._static_overlay(total_frames)
+        for x1, y1, x2, y2 in self._static_layer[2]: frame[y1:y2, x1:x2] = static[y1:y2, x1:x2]
+        area = self._timeline_area(frame.shape, total_frames, original_h)
+        if area is None or area[2] <= 0 or area[3] <= 0: return
+        draw_area_x, draw_area_y, draw_area_w, draw_area_h = area
         indicator_x = int(draw_area_x + (frame_idx / total_frames) * draw_area_w)
         cv2.line(frame, (indicator_x, draw_area_y), (indicator_x, draw_area_y + draw_area_h), (80, 80, 255), 2)
 
+    @staticmethod
+    def _detection_rect(label, x1f, y1f, x2f, y2f, cx, cy, poly_points, font_face, f_scale, f_thick):
+        """Bounding rectangle of everything process_frame draws for one detection: mask or box, centroid and label."""
+        (tw, th), _ = cv2.getTextSize(label, font_face, f_scale, f_thick)
+        xs, ys = [x1f, x2f, int(x1f) + tw], [y1f, y2f, int(y1f) - th - 12]
+        if cx == cx and cy == cy: xs += [cx - 9, cx + 9]; ys += [cy - 9, cy + 9]
+        if poly_points is not None:
+            (px1, py1), (px2, py2) = poly_points.min(axis=0), poly_points.max(axis=0)
+            xs += [px1, px2 + 1]; ys += [py1, py2 + 1]
+        return min(xs), min(ys), max(xs), max(ys)
+
     def process_frame(self, original_frame, frame_idx, total_frames):
         original_w, original_h = self.video_size
         
         if self.draw_overlays:
-            new_w, new_h = self.final_video_size
-            processed_frame = np.zeros((new_h, new_w, 3), dtype=np.uint8)
+            processed_frame = self._static_overlay(total_frames).copy()
             processed_frame[0:original_h, 0:original_w] = original_frame
         else:
             processed_frame = original_frame.copy()
 
-        overlay = processed_frame.copy() # For mask transparency
+        frame_dets = [det for det in self.detections.frame_records(frame_idx, 'tank_number', 'class_name', 'x1', 'y1', 'x2', 'y2', 'cx', 'cy', 'polygon_points')
+                      if det[0] != NO_TANK and (not self.selected_cells or str(det[0]) in self.selected_cells)]
+        font_face, f_scale, f_thick = cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2
+
+        # Masks are blended only around the detections (the grid spans the whole frame); frames without masks are not copied.
+        mask_blend = None
+        if any(det[-1] is not None for det in frame_dets):
+            h, w = processed_frame.shape[:2]
+            rects = [(0, 0, w, h)] if self.draw_grid else [self._detection_rect(f"{det[0]}", *det[2:], font_face, f_scale, f_thick) for det in frame_dets]
+            mask_blend = RegionBlend(processed_frame, rects)
 
         def transform_point(x, y):
             p = self.grid_transform.map(QPointF(x, y)); return int(p.x()), int(p.y())
@@ -91,63 +163,89 @@ class VideoSaver(QThread):
             for i in range(self.grid_settings['cols'] + 1): cv2.line(processed_frame, transform_point(original_w*i/self.grid_settings['cols'],0), transform_point(original_w*i/self.grid_settings['cols'],original_h), (0,255,0), self.line_thickness)
             for i in range(self.grid_settings['rows'] + 1): cv2.line(processed_frame, transform_point(0,original_h*i/self.grid_settings['rows']), transform_point(original_w,original_h*i/self.grid_settings['rows']), (0,255,0), self.line_thickness)
         
-        has_drawn_mask = False
-        if frame_idx in self.detections:
-            for det in self.detections[frame_idx]:
-                if det.get('tank_number') is not None and (not self.selected_cells or str(det['tank_number']) in self.selected_cells):
-                    color_bgr = self.behavior_colors.get(det["class_name"], (255, 255, 255))[::-1]
-                    
-                    # ### CONDITIONAL DRAWING LOGIC ###
-                    if 'polygon' in det and det['polygon']:
-                        try:
-                            # Convert string representation of polygon points back to numpy array
-                            poly_points = np.array([list(map(int, p.split(','))) for p in det['polygon'].split(';')], dtype=np.int32)
-                            cv2.fillPoly(overlay, [poly_points], color_bgr)
-                            has_drawn_mask = True
-                        except (ValueError, IndexError):
-                            # Fallback if polygon data is malformed
-                            x1, y1, x2, y2 = map(int, (det["x1"], det["y1"], det["x2"], det["y2"]))
-                            cv2.rectangle(processed_frame, (x1, y1), (x2, y2), color_bgr, 2)
-                    else:
-                        # Fallback to bounding box if no polygon data
-                        x1, y1, x2, y2 = map(int, (det["x1"], det["y1"], det["x2"], det["y2"]))
-                        cv2.rectangle(processed_frame, (x1, y1), (x2, y2), color_bgr, 2)
-
-                    if det.get('cx') is not None and det.get('cy') is not None: cv2.circle(processed_frame, (int(det['cx']), int(det['cy'])), 8, (0, 0, 255), -1)
-                    
-                    label = f"{det['tank_number']}"
-                    x1, y1 = int(det["x1"]), int(det["y1"])
-                    font_face, f_scale, f_thick = cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2
-                    (tw, th), _ = cv2.getTextSize(label, font_face, f_scale, f_thick)
-                    cv2.rectangle(processed_frame, (x1, y1 - th - 12), (x1 + tw, y1), color_bgr, -1)
-                    cv2.putText(processed_frame, label, (x1, y1 - 7), font_face, f_scale, (0,0,0), f_thick, cv2.LINE_AA)
+        for tank_number, class_name, x1f, y1f, x2f, y2f, cx, cy, poly_points in frame_dets:
+            color_bgr = self.behavior_colors.get(class_name, (255, 255, 255))[::-1]
+            
+            # ### CONDITIONAL DRAWING LOGIC ###
+            if poly_points is not None:
+                # Polygons were parsed once at load time; malformed ones have no points and fall back to the box.
+                mask_blend.fill_poly(poly_points, color_bgr)
+            else:
+                # Fallback to bounding box if no (valid) polygon data
+                x1, y1, x2, y2 = map(int, (x1f, y1f, x2f, y2f))
+                cv2.rectangle(processed_frame, (x1, y1), (x2, y2), color_bgr, 2)
+
+            if cx == cx and cy == cy: cv2.circle(processed_frame, (int(cx), int(cy)), 8, (0, 0, 255), -1)
+            
+            label = f"{tank_number}"
+            x1, y1 = int(x1f), int(y1f)
+            (tw, th), _ = cv2.getTextSize(label, font_face, f_scale, f_thick)
+            cv2.rectangle(processed_frame, (x1, y1 - th - 12), (x1 + tw, y1), color_bgr, -1)
+            cv2.putText(processed_frame, label, (x1, y1 - 7), font_face, f_scale, (0,0,0), f_thick, cv2.LINE_AA)
         
-        if has_drawn_mask:
-            processed_frame = cv2.addWeighted(overlay, 0.4, processed_frame, 0.6, 0)
+        if mask_blend is not None:
+            mask_blend.apply(processed_frame)
 
         if self.draw_overlays:
-            self._draw_legend_on_frame(processed_frame, original_w)
-            self._draw_timeline_on_frame(processed_frame, frame_idx, total_frames, original_h)
+            self._draw_overlays_on_frame(processed_frame, frame_idx, total_frames)
             
         return processed_frame
 
+    def _range_job(self, start, stop, total_frames):
+        """The picklable settings a pool process needs to render frames [start, stop): only that window of detections is included."""
+        detections = self.detections.frame_window(start, stop - 1)
+        detections.extra = {}  # The renderer reads parsed polygons, not the strings.
+        if detections.polygons is not None: detections.polygons = detections.polygons.compact()
+        saver_args = dict(source_video_path=self.source_path, output_video_path=None, detections=detections, grid_settings=self.grid_settings,
+                          grid_transform=self.grid_transform, behavior_colors=self.behavior_colors, video_size=self.video_size, fps=self.fps,
+                          line_thickness=self.line_thickness, selected_cells=self.selected_cells, timeline_segments=self.timeline_segments,
+                          draw_grid=self.draw_grid, draw_overlays=self.draw_overlays)
+        return {'start': start, 'stop': stop, 'total_frames': total_frames, 'saver_args': saver_args}
+
+    def export_in_parallel(self, total_frames, workers, progress_callback=None, should_stop=None):
+        """
+        Renders and encodes `workers` frame ranges in separate processes, then joins the segments losslessly
+        with ffmpeg into the output file. Returns an error message or None.
+        """
+        jobs = [self._range_job(start, stop, total_frames) for start, stop in frame_ranges(total_frames, workers)]
+        return run_parallel_export(_render_frame_range, jobs, self.output_path, progress_callback, should_stop)
+
     def run(self):
         cap = cv2.VideoCapture(self.source_path)
         if not cap.isOpened(): self.error_occurred.emit(f"Could not open source video: {self.source_path}"); return
         
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        workers = effective_workers(total_frames, self.workers)
+        if workers > 1:
+            cap.release()
+            error = self.export_in_parallel(total_frames, workers, lambda done: self.progress_updated.emit(int(done * 100 / total_frames)), lambda: not self.is_running)
+            if error: self.error_occurred.emit(error); return
+            if self.is_running: self.finished.emit()
+            return
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
         writer = cv2.VideoWriter(self.output_path, fourcc, self.fps, self.final_video_size)
         if not writer.isOpened(): self.error_occurred.emit(f"Could not open video writer for: {self.output_path}"); cap.release(); return
-            
-        for frame_idx in range(total_frames):
-            if not self.is_running: break
-            ret, original_frame = cap.read()
-            if not ret: break
-            
-            processed_frame = self.process_frame(original_frame, frame_idx, total_frames)
-            writer.write(processed_frame)
-            self.progress_updated.emit(int((frame_idx + 1) * 100 / total_frames))
-            
+
+        def report(frames_done):
+            self.progress_updated.emit(int(frames_done * 100 / total_frames)); return self.is_running
+        try:
+            self.pipeline_stats = run_pipeline(cap, writer, lambda frame, frame_idx: self.process_frame(frame, frame_idx, total_frames), 0, total_frames, report)
+        except Exception as e:
+            self.error_occurred.emit(str(e)); return
+        finally:
+            cap.release(); writer.release()
+        if self.is_running: self.finished.emit()
+
+def _render_frame_range(job, report):
+    """Pool-process side of VideoSaver.export_in_parallel: renders frames [start, stop) into job['segment_path']."""
+    saver = VideoSaver(**job['saver_args'])
+    start, stop = job['start'], job['stop']
+    cap = open_at_frame(saver.source_path, start)
+    if cap is None: raise RuntimeError(f"Could not open source video: {saver.source_path}")
+    writer = cv2.VideoWriter(job['segment_path'], cv2.VideoWriter_fourcc(*'mp4v'), saver.fps, saver.final_video_size)
+    if not writer.isOpened(): cap.release(); raise RuntimeError(f"Could not open video writer for: {job['segment_path']}")
+    try:
+        stats = run_pipeline(cap, writer, lambda frame, frame_idx: saver.process_frame(frame, frame_idx, job['total_frames']), start, stop, report)
+    finally:
         cap.release(); writer.release()
-        if self.is_running: self.finished.emit()
\ No newline at end of file
+    return stats.frames
@@ -1,11 +1,23 @@
 # EthoGrid_App/workers/yolo_processor.py
 
 import os
-import csv
 import cv2
+import time
 import traceback
+from functools import partial
 from PyQt5.QtCore import QThread, pyqtSignal
 from core.stopwatch import Stopwatch
+from core.streaming_csv import StreamingCsvWriter
+from core.detection_cache import file_content_hash
+from core.inference_checkpoint import checkpoint_metadata, plan_resume, continuation_path, join_continuation
+from core.frame_pipeline import FrameReader, FrameWriter, raise_stage_errors, open_at_frame
+from core.inference import prefetch_queue_size, stage_fps
+from core.video_scheduler import schedule_videos
+from core.motion_gate import MotionGate, gate_cells, DEFAULT_MAX_SKIP_FRAMES
+from core.tank_tiles import TankTiles, DEFAULT_TILE_SIZE
+from core.tank_assignment import NO_TANK
+from core.model_runtime import load_model, export_runtime, DEFAULT_RUNTIME, DEFAULT_INPUT_SIZE
+from core.inference_cache import ROW_COLUMNS, UndecodedFrames, OutputCacheWriter, cache_key, find_cached_outputs
 
 try:
     import numpy as np
@@ -21,8 +33,10 @@ class YoloProcessor(QThread):
     error = pyqtSignal(str)
     time_updated = pyqtSignal(str, str)
     speed_updated = pyqtSignal(float)
+    stage_speeds_updated = pyqtSignal(float, float, float)
 
-    def __init__(self, video_files, model_path, output_dir, confidence, save_video, save_csv, parent=None):
+    def __init__(self, video_files, model_path, output_dir, confidence, save_video, save_csv, batch_size=1, parallel_videos=1,
+                 motion_threshold=None, max_skip_frames=DEFAULT_MAX_SKIP_FRAMES, settings_file=None, tile_tanks=False, tile_size=DEFAULT_TILE_SIZE, use_cache=True, runtime=DEFAULT_RUNTIME, parent=None):
         super().__init__(parent)
         self.video_files = video_files
         self.model_path = model_path
@@ -30,6 +44,17 @@ class YoloProcessor(QThread):
         self.confidence = confidence
         self.save_video = save_video
         self.save_csv = save_csv
+        self.batch_size = max(1, batch_size)
+        self.parallel_videos = parallel_videos
+        # Motion gating is off without a threshold. The settings file supplies the tank grid that gating compares per cell
+        # and that `tile_tanks` crops the frames into; tiling requires one.
+        self.motion_threshold = motion_threshold
+        self.max_skip_frames = max_skip_frames
+        self.settings_file = settings_file
+        self.tile_tanks = tile_tanks
+        self.tile_size = tile_size
+        self.use_cache = use_cache  # Reuse and store raw model outputs in the inference cache (see core/inference_cache.py).
+        self.runtime = runtime  # A key of core.model_runtime.RUNTIMES; exported runtimes run the model on the CPU.
         self.is_running = True
 
     def stop(self):
@@ -41,136 +66,285 @@ class YoloProcessor(QThread):
             self.error.emit("Dependencies not found. Please run: pip install ultralytics numpy")
             return
 
-        try:
-            self.log_message.emit(f"Loading YOLO model from: {self.model_path}")
-            model = YOLO(self.model_path)
-            self.log_message.emit("Model loaded successfully.")
-        except Exception as e:
-            self.error.emit(f"Failed to load YOLO model: {e}")
-            return
+        if self.parallel_videos > 1 and len(self.video_files) > 1:
+            if self.runtime != DEFAULT_RUNTIME:
+                # Exported once here, so the pool processes only load it.
+                try: export_runtime(self.model_path, self.runtime, self.input_size(), log=self.log_message.emit)
+                except Exception as e:
+                    self.error.emit(f"Failed to export YOLO model: {e}"); return
+            schedule_videos(self, partial(_process_video_in_process, self.worker_args()), min(self.parallel_videos, len(self.video_files)))
+        else:
+            try:
+                self.log_message.emit(f"Loading YOLO model from: {self.model_path}")
+                model = load_model(self.model_path, self.runtime, self.input_size(), task='detect', log=self.log_message.emit)
+                self.log_message.emit("Model loaded successfully.")
+            except Exception as e:
+                self.error.emit(f"Failed to load YOLO model: {e}")
+                return
+            class_colors = detection_class_colors(model.names)
+
+            for idx, video_path in enumerate(self.video_files):
+                if not self.is_running: break
+                self.overall_progress.emit(idx + 1, len(self.video_files), os.path.basename(video_path))
+                self.process_video(model, class_colors, video_path)
+
+        if self.is_running: self.log_message.emit("\n--- YOLO Inference Complete ---")
+        else: self.log_message.emit("\n--- YOLO Inference Cancelled ---")
+        self.finished.emit()
+
+    def worker_args(self):
+        """Constructor arguments that recreate this worker's settings in another process."""
+        return dict(video_files=[], model_path=self.model_path, output_dir=self.output_dir, confidence=self.confidence,
+                    save_video=self.save_video, save_csv=self.save_csv, batch_size=self.batch_size,
+                    motion_threshold=self.motion_threshold, max_skip_frames=self.max_skip_frames, settings_file=self.settings_file,
+                    tile_tanks=self.tile_tanks, tile_size=self.tile_size, use_cache=self.use_cache, runtime=self.runtime)
+
+    def output_settings(self):
+        """The motion gating, tiling and runtime settings that change the outputs, stored with their checkpoints; None for the defaults."""
+        settings = {}
+        if self.motion_threshold is not None: settings.update(motion_threshold=self.motion_threshold, max_skip_frames=self.max_skip_frames)
+        if self.tile_tanks: settings.update(tile_size=self.tile_size)
+        if settings: settings['settings_file'] = self.settings_file
+        if self.runtime != DEFAULT_RUNTIME: settings['runtime'] = self.runtime
+        return settings or None
 
+    def input_settings(self):
+        """What the model is shown besides the video frames and how it runs, part of the inference cache key; None for full frames on PyTorch."""
+        settings = {'tile_size': self.tile_size, 'grid': file_content_hash(self.settings_file)} if self.tile_tanks else {}
+        if self.runtime != DEFAULT_RUNTIME: settings['runtime'] = self.runtime
+        return settings or None
+
+    def input_size(self):
+        """The input size the model is run at, which exported runtimes are exported for."""
+        return self.tile_size if self.tile_tanks else DEFAULT_INPUT_SIZE
+
+    def process_video(self, model, class_colors, video_path):
+        """Runs detection on one video and saves its outputs; failures are logged and do not stop the batch."""
         class_names = model.names
-        class_colors = {}
-        for i, name in class_names.items():
-            np.random.seed(i + 5)
-            color = tuple(np.random.randint(60, 255, size=3).tolist())
-            class_colors[name] = color
-            
         centroid_color = (0, 0, 255)
+        video_filename = os.path.basename(video_path)
+        self.file_progress.emit(0, 0, 0)
+        self.time_updated.emit("00:00:00", "--:--:--")
+        self.speed_updated.emit(0.0)
 
-        for idx, video_path in enumerate(self.video_files):
-            if not self.is_running: break
+        base_name = os.path.splitext(video_filename)[0]
+        self.log_message.emit(f"\n--- Starting processing for: {video_filename} ---")
+        
+        out_video_path = os.path.join(self.output_dir, f"{base_name}_inference.mp4")
+        out_csv_path = os.path.join(self.output_dir, f"{base_name}_detections.csv")
+        try:
+            checkpoint = None
+            if self.save_csv and os.path.exists(video_path):
+                metadata = checkpoint_metadata(self.model_path, self.confidence, video_path, self.output_settings())
+                action, checkpoint, message = plan_resume(out_csv_path, out_video_path if self.save_video else None, metadata)
+                if message: self.log_message.emit(message)
+                if action == 'skip':
+                    self.file_progress.emit(100, checkpoint['frames_done'], checkpoint['frames_done']); return
+            start_frame = checkpoint['frames_done'] if checkpoint else 0
+            cap = open_at_frame(video_path, start_frame)
+            if cap is None:
+                self.log_message.emit(f"[WARNING] Could not open video: {video_filename}. Skipping.")
+                return
+            
+            width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            fps, total_frames = cap.get(cv2.CAP_PROP_FPS) or 30.0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-            video_filename = os.path.basename(video_path)
-            self.overall_progress.emit(idx + 1, len(self.video_files), video_filename)
-            self.file_progress.emit(0, 0, 0)
-            self.time_updated.emit("00:00:00", "--:--:--")
-            self.speed_updated.emit(0.0)
+            tiles = TankTiles((width, height), self.settings_file) if self.tile_tanks else None
+            if tiles is not None: self.log_message.emit(f"Running inference on {len(tiles.regions)} tank crops per frame at {self.tile_size} px.")
+            gate = MotionGate(gate_cells((width, height), self.settings_file), self.motion_threshold, self.max_skip_frames) if self.motion_threshold is not None else None
+            out_video = None
+            if self.save_video:
+                # A resumed run encodes the remaining frames separately and appends them to the partial video at the end.
+                video_segment_path = continuation_path(out_video_path) if checkpoint else out_video_path
+                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                out_video = cv2.VideoWriter(video_segment_path, fourcc, fps, (width, height))
+            
+            # Cached outputs replace the model; motion gating decides per run which frames to infer, so it bypasses the cache.
+            cached, cache_writer = None, None
+            if self.use_cache and gate is None:
+                key = cache_key(video_path, self.model_path, self.input_settings())
+                cached = find_cached_outputs(key, self.confidence)
+                if cached is not None: self.log_message.emit(f"Using cached model outputs (captured at confidence {cached.confidence:.2f}); skipping inference.")
+                elif start_frame == 0: cache_writer = OutputCacheWriter(key, self.confidence)
+            elif self.use_cache:
+                self.log_message.emit("Motion gating is on; model outputs are not cached.")
 
-            base_name = os.path.splitext(video_filename)[0]
-            self.log_message.emit(f"\n--- Starting processing for: {video_filename} ---")
+            csv_writer = None
+            if self.save_csv:
+                header = ["frame_idx", "class_name", "conf", "x1", "y1", "x2", "y2", "cx", "cy"] + (["tank_number"] if tiles else []) + (["carried"] if gate else [])
+                csv_writer = StreamingCsvWriter(out_csv_path, header,
+                                                metadata=dict(metadata, video=self.save_video), resume_from=checkpoint)
+            frame_idx = start_frame
+            frame_count_for_fps = 0
+            fps_check_time = 0
             
-            try:
-                cap = cv2.VideoCapture(video_path)
-                if not cap.isOpened():
-                    self.log_message.emit(f"[WARNING] Could not open video: {video_filename}. Skipping.")
-                    continue
-                
-                width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                fps, total_frames = cap.get(cv2.CAP_PROP_FPS) or 30.0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-
-                out_video = None
-                if self.save_video:
-                    out_video_path = os.path.join(self.output_dir, f"{base_name}_inference.mp4")
-                    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-                    out_video = cv2.VideoWriter(out_video_path, fourcc, fps, (width, height))
-                
-                all_detections_data = []
-                frame_idx = 0
-                frame_count_for_fps = 0
-                fps_check_time = 0
-                
-                file_stopwatch = Stopwatch()
-                file_stopwatch.start()
-
-                while self.is_running:
-                    ret, frame = cap.read()
-                    if not ret: break
-
-                    results_list = model.predict(frame, conf=self.confidence, verbose=False)
-                    results = results_list[0]
-
-                    if results.boxes is not None:
-                        for box in results.boxes:
-                            if self.save_video or self.save_csv:
-                                x1_orig, y1_orig, x2_orig, y2_orig = box.xyxy[0].tolist()
-                                box_width = x2_orig - x1_orig
-                                box_height = y2_orig - y1_orig
-                                inset_x = box_width * 0.05
-                                inset_y = box_height * 0.05
-                                
-                                x1f = x1_orig + inset_x
-                                y1f = y1_orig + inset_y
-                                x2f = x2_orig - inset_x
-                                y2f = y2_orig - inset_y
-
-                                conf, cls_id = float(box.conf[0]), int(box.cls[0])
-                                class_name = class_names.get(cls_id, "Unknown")
-                                cx = (x1f + x2f) / 2.0
-                                cy = (y1f + y2f) / 2.0
-                            
-                            if self.save_video:
-                                color = class_colors.get(class_name, (255, 255, 255))
-                                cv2.rectangle(frame, (int(x1f), int(y1f)), (int(x2f), int(y2f)), color, 2)
-                                label_text = f"{class_name} {conf:.2f}"
-                                cv2.putText(frame, label_text, (int(x1f), int(y1f) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-                                cv2.circle(frame, (int(round(cx)), int(round(cy))), 4, centroid_color, -1)
-                            
-                            if self.save_csv:
-                                all_detections_data.append([
-                                    frame_idx, class_name, f"{conf:.4f}", 
-                                    f"{x1f:.4f}", f"{y1f:.4f}", f"{x2f:.4f}", f"{y2f:.4f}", 
-                                    f"{cx:.4f}", f"{cy:.4f}"
-                                ])
-
-                    if self.save_video and out_video is not None:
-                        out_video.write(frame)
+            file_stopwatch = Stopwatch()
+            file_stopwatch.start()
+            # Decoding and encoding run on their own threads, so inference never waits on either while the queues are not empty or full.
+            # With cached outputs and no annotated video, the frames do not even have to be decoded.
+            if cached is not None and not self.save_video: reader = UndecodedFrames(start_frame, cached.frames, self.batch_size)
+            else: reader = FrameReader(cap, batch_size=self.batch_size, queue_size=prefetch_queue_size(self.batch_size))
+            video_writer = FrameWriter(out_video) if out_video is not None else None
+            inferred_frames, predict_time = 0, 0.0  # The inference stage speed counts only the frames passed to model.predict and the time it takes.
+            detections = []
+
+            while self.is_running:
+                frames = reader.get()
+                if not frames: break
+                # Gating decides on every frame of the batch before any of them is drawn on.
+                inferred = [gate.needs_inference(frame) for frame in frames] if gate else [True] * len(frames)
+                predict_began = time.perf_counter()
+                # One predict call per batch (of the frames that need it); results come back in frame order.
+                inputs = [frame for frame, run in zip(frames, inferred) if run] if cached is None else []
+                if tiles is not None: inputs = [crop for frame in inputs for crop in tiles.crops(frame)]
+                results = model.predict(inputs, conf=self.confidence, verbose=False, **({'imgsz': self.tile_size} if tiles else {})) if inputs else []
+                predictions = iter(results) if tiles is None else iter([results[i:i + len(tiles.regions)] for i in range(0, len(results), len(tiles.regions))])
+                predict_time += time.perf_counter() - predict_began; inferred_frames += sum(inferred) if cached is None else 0
+                for frame, run in zip(frames, inferred):
+                    # Skipped frames carry the last detections forward.
+                    if run:
+                        if cached is not None: rows = cached.frame_rows(frame_idx, self.confidence)
+                        else: rows = box_rows(next(predictions)) if tiles is None else tile_rows(tiles, next(predictions))
+                        if cache_writer is not None: cache_writer.add_frame(rows)
+                        detections = box_detections(rows, class_names, with_tank=tiles is not None)
+                    for detection in detections:
+                        class_name, conf, x1f, y1f, x2f, y2f, cx, cy = detection[:8]
+                        if self.save_video:
+                            color = class_colors.get(class_name, (255, 255, 255))
+                            cv2.rectangle(frame, (int(x1f), int(y1f)), (int(x2f), int(y2f)), color, 2)
+                            label_text = f"{class_name} {conf:.2f}"
+                            cv2.putText(frame, label_text, (int(x1f), int(y1f) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+                            cv2.circle(frame, (int(round(cx)), int(round(cy))), 4, centroid_color, -1)
                     
+                        if self.save_csv:
+                            row = [
+                                frame_idx, class_name, f"{conf:.4f}", 
+                                f"{x1f:.4f}", f"{y1f:.4f}", f"{x2f:.4f}", f"{y2f:.4f}", 
+                                f"{cx:.4f}", f"{cy:.4f}"
+                            ] + list(detection[8:])
+                            if gate: row.append(0 if run else 1)
+                            csv_writer.add_row(row)
+
+                    if self.save_video and video_writer is not None:
+                        video_writer.write(frame)
+                    if csv_writer is not None: csv_writer.end_frame(frame_idx)
+                
                     frame_idx += 1
                     frame_count_for_fps += 1
-                    
+                
                     current_time = file_stopwatch.get_elapsed_time(as_float=True)
                     if current_time > fps_check_time + 1:
                         processing_fps = frame_count_for_fps / (current_time - fps_check_time)
                         self.speed_updated.emit(processing_fps)
+                        self.stage_speeds_updated.emit(stage_fps(reader.frames, reader.busy), stage_fps(inferred_frames, predict_time), stage_fps(video_writer.frames, video_writer.busy) if video_writer else 0.0)
                         frame_count_for_fps = 0
                         fps_check_time = current_time
 
                     if total_frames > 0:
                         progress = int(frame_idx * 100 / total_frames)
                         self.file_progress.emit(progress, frame_idx, total_frames)
-                        self.time_updated.emit(file_stopwatch.get_elapsed_time(), file_stopwatch.get_etr(frame_idx, total_frames))
+                        self.time_updated.emit(file_stopwatch.get_elapsed_time(), file_stopwatch.get_etr(frame_idx - start_frame, total_frames - start_frame))
 
-                cap.release()
-                if self.save_video and out_video is not None:
-                    out_video.release()
-                    self.log_message.emit(f"✓ Saved annotated video to: {os.path.basename(out_video_path)}")
-                
-                if self.save_csv:
-                    out_csv_path = os.path.join(self.output_dir, f"{base_name}_detections.csv")
-                    with open(out_csv_path, 'w', newline='') as f:
-                        writer = csv.writer(f)
-                        writer.writerow(["frame_idx", "class_name", "conf", "x1", "y1", "x2", "y2", "cx", "cy"])
-                        writer.writerows(all_detections_data)
-                    self.log_message.emit(f"✓ Saved detections CSV to: {os.path.basename(out_csv_path)}")
+            reader.close()
+            if video_writer is not None: video_writer.close()
+            raise_stage_errors(reader, video_writer)
+            cap.release()
+            if cache_writer is not None:
+                # Only a run over every frame of the video leaves a cache entry.
+                if self.is_running: cache_writer.finish()
+                else: cache_writer.abort()
+                cache_writer = None
+            if gate is not None: self.log_message.emit(gate.summary(predict_time))
+            if self.save_video and out_video is not None:
+                out_video.release()
+                if video_segment_path != out_video_path:
+                    error = join_continuation(out_video_path, video_segment_path)
+                    if error: raise RuntimeError(error)
+                self.log_message.emit(f"✓ Saved annotated video to: {os.path.basename(out_video_path)}")
+            
+            if csv_writer is not None:
+                csv_writer.close(complete=self.is_running)  # A cancelled video is resumed from its marker by the next run.
+                self.log_message.emit(f"✓ Saved detections CSV to: {os.path.basename(out_csv_path)}")
 
-            except Exception as e:
-                self.log_message.emit(f"[ERROR] Failed during processing of {video_filename}: {e}")
-                self.log_message.emit(traceback.format_exc())
-                if 'cap' in locals() and cap.isOpened(): cap.release()
-                if 'out_video' in locals() and out_video is not None: out_video.release()
-                continue
-        
-        if self.is_running: self.log_message.emit("\n--- YOLO Inference Complete ---")
-        else: self.log_message.emit("\n--- YOLO Inference Cancelled ---")
-        self.finished.emit()
\ No newline at end of file
+        except Exception as e:
+            self.log_message.emit(f"[ERROR] Failed during processing of {video_filename}: {e}")
+            self.log_message.emit(traceback.format_exc())
+            if 'reader' in locals(): reader.close()
+            if 'video_writer' in locals() and video_writer is not None: video_writer.close()
+            if 'cap' in locals() and cap.isOpened(): cap.release()
+            if 'out_video' in locals() and out_video is not None: out_video.release()
+            if 'csv_writer' in locals() and csv_writer is not None: csv_writer.close(complete=False)
+            if 'cache_writer' in locals() and cache_writer is not None: cache_writer.abort()
+
+def box_rows(results, offset=(0, 0)):
+    """
+    The boxes of one frame's (or crop's) results as (k, ROW_COLUMNS) float64 rows of x1, y1, x2, y2, conf, class id
+    and tank number (NO_TANK), the form the inference cache stores. `offset` is added to boxes detected in a crop.
+    """
+    if results.boxes is None or len(results.boxes) == 0: return np.empty((0, ROW_COLUMNS))
+    rows = np.full((len(results.boxes), ROW_COLUMNS), float(NO_TANK))
+    rows[:, :4] = results.boxes.xyxy.cpu().numpy()
+    rows[:, [0, 2]] += offset[0]; rows[:, [1, 3]] += offset[1]
+    rows[:, 4], rows[:, 5] = results.boxes.conf.cpu().numpy(), results.boxes.cls.cpu().numpy()
+    return rows
+
+def tile_rows(tiles, tile_results):
+    """
+    Box rows of one frame from the results of its tank crops, in frame coordinates and with their tank number.
+    A box is kept only from the crop of the tank its (inset) centroid lies in, which drops the duplicates of the
+    overlapping crop margins and detections outside the grid or arena mask.
+    """
+    rows = [box_rows(results, (x0, y0)) for (_, x0, y0, _, _), results in zip(tiles.regions, tile_results)]
+    tanks = np.concatenate([np.full(len(found), tank_number) for (tank_number, *_), found in zip(tiles.regions, rows)]) if rows else np.empty(0)
+    rows = np.concatenate(rows) if rows else np.empty((0, ROW_COLUMNS))
+    if not len(rows): return rows
+    inset_x, inset_y = (rows[:, 2] - rows[:, 0]) * 0.05, (rows[:, 3] - rows[:, 1]) * 0.05
+    cxs, cys = ((rows[:, 0] + inset_x) + (rows[:, 2] - inset_x)) / 2.0, ((rows[:, 1] + inset_y) + (rows[:, 3] - inset_y)) / 2.0
+    keep = tiles.assign(cxs, cys) == tanks
+    rows[:, 6] = tanks
+    return rows[keep]
+
+def box_detections(rows, class_names, with_tank=False):
+    """
+    (class_name, conf, x1, y1, x2, y2, cx, cy) of every box row of one frame, followed by its tank number when
+    `with_tank`. Boxes are inset by 5% on each side, which centres the centroid better on the animal.
+    """
+    detections = []
+    for x1_orig, y1_orig, x2_orig, y2_orig, conf, cls_id, tank_number in rows.tolist():
+        box_width = x2_orig - x1_orig
+        box_height = y2_orig - y1_orig
+        inset_x = box_width * 0.05
+        inset_y = box_height * 0.05
+
+        x1f = x1_orig + inset_x
+        y1f = y1_orig + inset_y
+        x2f = x2_orig - inset_x
+        y2f = y2_orig - inset_y
+
+        class_name = class_names.get(int(cls_id), "Unknown")
+        detection = (class_name, conf, x1f, y1f, x2f, y2f, (x1f + x2f) / 2.0, (y1f + y2f) / 2.0)
+        detections.append(detection + (int(tank_number),) if with_tank else detection)
+    return detections
+
+def detection_class_colors(class_names):
+    class_colors = {}
+    for i, name in class_names.items():
+        np.random.seed(i + 5)
+        class_colors[name] = tuple(np.random.randint(60, 255, size=3).tolist())
+    return class_colors
+
+_process_model = None  # (model, class_colors) loaded once by each scheduler process.
+
+def _process_video_in_process(worker_args, video_path, emit, should_stop):
+    """Runs one video of a multi-video schedule (see core.video_scheduler) in a pool process, reporting through `emit`."""
+    global _process_model
+    if _process_model is None:
+        emit('log', f"Loading YOLO model from: {worker_args['model_path']}")
+        model = load_model(worker_args['model_path'], worker_args['runtime'], worker_args['tile_size'] if worker_args['tile_tanks'] else DEFAULT_INPUT_SIZE, task='detect')
+        _process_model = (model, detection_class_colors(model.names))
+    worker = YoloProcessor(**worker_args)
+    def forward_progress(percentage, frames_done, total_frames):
+        emit('progress', frames_done, total_frames)
+        if should_stop(): worker.is_running = False
+    worker.log_message.connect(lambda message: emit('log', message)); worker.file_progress.connect(forward_progress)
+    worker.process_video(*_process_model, video_path)
@@ -1,11 +1,21 @@
 # EthoGrid_App/workers/yolo_segmentation_processor.py
 
 import os
-import csv
 import cv2
+import time
 import traceback
+from functools import partial
 from PyQt5.QtCore import QThread, pyqtSignal
 from core.stopwatch import Stopwatch
+from core.streaming_csv import StreamingCsvWriter
+from core.inference_checkpoint import checkpoint_metadata, plan_resume, continuation_path, join_continuation
+from core.frame_pipeline import FrameReader, FrameWriter, raise_stage_errors, open_at_frame
+from core.inference import prefetch_queue_size, stage_fps
+from core.video_scheduler import schedule_videos
+from core.mask_blend import RegionBlend
+from core.mask_geometry import MaskGeometry
+from core.polygon_store import PolygonStoreWriter, polygon_store_path
+from core.model_runtime import load_model, export_runtime, DEFAULT_RUNTIME, DEFAULT_INPUT_SIZE
 
 try:
     import numpy as np
@@ -21,11 +31,16 @@ class YoloSegmentationProcessor(QThread):
     error = pyqtSignal(str)
     time_updated = pyqtSignal(str, str)
     speed_updated = pyqtSignal(float)
+    stage_speeds_updated = pyqtSignal(float, float, float)
 
-    def __init__(self, video_files, model_path, output_dir, confidence, save_video, save_csv, parent=None):
+    def __init__(self, video_files, model_path, output_dir, confidence, save_video, save_csv, batch_size=1, parallel_videos=1, polygon_tolerance=0.0, polygon_format='csv', runtime=DEFAULT_RUNTIME, parent=None):
         super().__init__(parent)
         self.video_files = video_files; self.model_path = model_path; self.output_dir = output_dir
         self.confidence = confidence; self.save_video = save_video; self.save_csv = save_csv
+        self.batch_size = max(1, batch_size); self.parallel_videos = parallel_videos
+        self.polygon_tolerance = polygon_tolerance  # approxPolyDP tolerance in video pixels for the CSV polygons; 0 keeps every contour vertex.
+        self.polygon_format = polygon_format  # 'csv' for the 'polygon' column, 'binary' for a compressed .polygons file next to the CSV.
+        self.runtime = runtime  # A key of core.model_runtime.RUNTIMES; exported runtimes run the model on the CPU.
         self.is_running = True
 
     def stop(self):
@@ -35,80 +50,145 @@ class YoloSegmentationProcessor(QThread):
         if YOLO is None or np is None:
             self.error.emit("Dependencies not found. Please run: pip install ultralytics numpy"); return
 
-        try:
-            self.log_message.emit(f"Loading YOLO Segmentation model from: {self.model_path}")
-            model = YOLO(self.model_path); self.log_message.emit("Model loaded successfully.")
-        except Exception as e:
-            self.error.emit(f"Failed to load YOLO model: {e}"); return
+        if self.parallel_videos > 1 and len(self.video_files) > 1:
+            if self.runtime != DEFAULT_RUNTIME:
+                # Exported once here, so the pool processes only load it.
+                try: export_runtime(self.model_path, self.runtime, DEFAULT_INPUT_SIZE, log=self.log_message.emit)
+                except Exception as e:
+                    self.error.emit(f"Failed to export YOLO model: {e}"); return
+            schedule_videos(self, partial(_process_video_in_process, self.worker_args()), min(self.parallel_videos, len(self.video_files)))
+        else:
+            try:
+                self.log_message.emit(f"Loading YOLO Segmentation model from: {self.model_path}")
+                model = load_model(self.model_path, self.runtime, task='segment', log=self.log_message.emit); self.log_message.emit("Model loaded successfully.")
+            except Exception as e:
+                self.error.emit(f"Failed to load YOLO model: {e}"); return
+            class_colors = segmentation_class_colors(model.names)
+            for idx, video_path in enumerate(self.video_files):
+                if not self.is_running: break
+                self.overall_progress.emit(idx + 1, len(self.video_files), os.path.basename(video_path))
+                self.process_video(model, class_colors, video_path)
+        
+        if self.is_running: self.log_message.emit("\n--- YOLO Segmentation Complete ---")
+        else: self.log_message.emit("\n--- YOLO Segmentation Cancelled ---")
+        self.finished.emit()
 
-        class_names = model.names
-        class_colors = {i: tuple(np.random.randint(60, 255, size=3).tolist()) for i, name in class_names.items()}
-        centroid_color = (0, 0, 255)
+    def worker_args(self):
+        """Constructor arguments that recreate this worker's settings in another process."""
+        return dict(video_files=[], model_path=self.model_path, output_dir=self.output_dir, confidence=self.confidence,
+                    save_video=self.save_video, save_csv=self.save_csv, batch_size=self.batch_size, polygon_tolerance=self.polygon_tolerance,
+                    polygon_format=self.polygon_format, runtime=self.runtime)
+
+    def output_settings(self):
+        """The polygon and runtime settings that change the outputs, stored with their checkpoints; None for the defaults."""
+        settings = {}
+        if self.polygon_tolerance > 0: settings['polygon_tolerance'] = self.polygon_tolerance
+        if self.polygon_format != 'csv': settings['polygon_format'] = self.polygon_format
+        if self.runtime != DEFAULT_RUNTIME: settings['runtime'] = self.runtime
+        return settings or None
+
+    def process_video(self, model, class_colors, video_path):
+        """Runs segmentation on one video and saves its outputs; failures are logged and do not stop the batch."""
+        class_names = model.names; centroid_color = (0, 0, 255)
+        video_filename = os.path.basename(video_path)
+        self.file_progress.emit(0, 0, 0)
+        self.time_updated.emit("00:00:00", "--:--:--")
+        self.speed_updated.emit(0.0)
         
-        for idx, video_path in enumerate(self.video_files):
-            if not self.is_running: break
-            video_filename = os.path.basename(video_path)
-            self.overall_progress.emit(idx + 1, len(self.video_files), video_filename)
-            self.file_progress.emit(0, 0, 0)
-            self.time_updated.emit("00:00:00", "--:--:--")
-            self.speed_updated.emit(0.0)
+        base_name = os.path.splitext(video_filename)[0]
+        self.log_message.emit(f"\n--- Starting segmentation for: {video_filename} ---")
+        
+        out_video_path = os.path.join(self.output_dir, f"{base_name}_segmentation.mp4")
+        out_csv_path = os.path.join(self.output_dir, f"{base_name}_segmentations.csv")
+        try:
+            checkpoint = None
+            if self.save_csv and os.path.exists(video_path):
+                metadata = checkpoint_metadata(self.model_path, self.confidence, video_path, self.output_settings())
+                action, checkpoint, message = plan_resume(out_csv_path, out_video_path if self.save_video else None, metadata)
+                if message: self.log_message.emit(message)
+                if action == 'skip': self.file_progress.emit(100, checkpoint['frames_done'], checkpoint['frames_done']); return
+            start_frame = checkpoint['frames_done'] if checkpoint else 0
+            cap = open_at_frame(video_path, start_frame)
+            if cap is None: self.log_message.emit(f"[WARNING] Could not open video: {video_filename}. Skipping."); return
             
-            base_name = os.path.splitext(video_filename)[0]
-            self.log_message.emit(f"\n--- Starting segmentation for: {video_filename} ---")
+            width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            fps, total_frames = cap.get(cv2.CAP_PROP_FPS) or 30.0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+            out_video = None
+            if self.save_video:
+                # A resumed run encodes the remaining frames separately and appends them to the partial video at the end.
+                video_segment_path = continuation_path(out_video_path) if checkpoint else out_video_path
+                fourcc = cv2.VideoWriter_fourcc(*'mp4v'); out_video = cv2.VideoWriter(video_segment_path, fourcc, fps, (width, height))
             
-            try:
-                cap = cv2.VideoCapture(video_path)
-                if not cap.isOpened(): self.log_message.emit(f"[WARNING] Could not open video: {video_filename}. Skipping."); continue
-                
-                width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                fps, total_frames = cap.get(cv2.CAP_PROP_FPS) or 30.0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            csv_writer = None
+            if self.save_csv:
+                # In the binary format the polygons go to a .polygons file, row for row, and the CSV has no 'polygon' column.
+                polygon_store = PolygonStoreWriter(polygon_store_path(out_csv_path), resume_from=checkpoint) if self.polygon_format == 'binary' else None
+                csv_writer = StreamingCsvWriter(out_csv_path, ["frame_idx", "class_name", "conf", "x1", "y1", "x2", "y2", "cx", "cy"] + (["polygon"] if polygon_store is None else []),
+                                                metadata=dict(metadata, video=self.save_video), resume_from=checkpoint, polygon_store=polygon_store)
+            frame_idx = start_frame
+            frame_count_for_fps = 0; fps_check_time = 0
+            
+            file_stopwatch = Stopwatch()
+            file_stopwatch.start()
+            reader = FrameReader(cap, batch_size=self.batch_size, queue_size=prefetch_queue_size(self.batch_size))
+            video_writer = FrameWriter(out_video) if out_video is not None else None
+            inference_time, inferred_frames = 0.0, 0  # Time spent in model.predict only, for the inference stage speed.
+            geometry = None
 
-                out_video = None
-                if self.save_video:
-                    out_video_path = os.path.join(self.output_dir, f"{base_name}_segmentation.mp4")
-                    fourcc = cv2.VideoWriter_fourcc(*'mp4v'); out_video = cv2.VideoWriter(out_video_path, fourcc, fps, (width, height))
-                
-                all_detections_data = []; frame_idx = 0
-                frame_count_for_fps = 0; fps_check_time = 0
-                
-                file_stopwatch = Stopwatch()
-                file_stopwatch.start()
-
-                while self.is_running:
-                    ret, frame = cap.read()
-                    if not ret: break
-                    results_list = model.predict(frame, conf=self.confidence, verbose=False)
-                    results = results_list[0]; overlay = frame.copy(); has_drawn_mask = False
+            while self.is_running:
+                frames = reader.get()
+                if not frames: break
+                # One predict call per batch; results come back in frame order.
+                predict_began = time.perf_counter()
+                batch_results = model.predict(frames, conf=self.confidence, verbose=False)
+                inference_time += time.perf_counter() - predict_began; inferred_frames += len(frames)
+                for frame, results in zip(frames, batch_results):
+                    drawn = []
                     if results.masks is not None:
-                        for i in range(len(results.masks)):
-                            if not self.is_running: break
-                            conf = float(results.boxes.conf[i]); cls_id = int(results.boxes.cls[i])
+                        # One transfer from the model's device per frame; masks stay at the model's resolution (see MaskGeometry).
+                        masks = results.masks.data.cpu().numpy().astype(np.uint8)
+                        confs, cls_ids, boxes = results.boxes.conf.tolist(), results.boxes.cls.tolist(), results.boxes.xyxy.tolist()
+                        if geometry is None or geometry.mask_size != (masks.shape[2], masks.shape[1]): geometry = MaskGeometry((masks.shape[2], masks.shape[1]), (width, height))
+                        for i, mask in enumerate(masks):
+                            conf = float(confs[i]); cls_id = int(cls_ids[i])
                             class_name = class_names.get(cls_id, "Unknown"); color = class_colors.get(cls_id, (255,255,255))
-                            mask = results.masks.data[i].cpu().numpy(); mask_resized = cv2.resize(mask, (width, height), interpolation=cv2.INTER_NEAREST).astype(np.uint8)
-                            x1_orig, y1_orig, x2_orig, y2_orig = results.boxes.xyxy[i].tolist()
+                            x1_orig, y1_orig, x2_orig, y2_orig = boxes[i]
                             box_width = x2_orig - x1_orig; box_height = y2_orig - y1_orig
                             inset_x = box_width * 0.05; inset_y = box_height * 0.05
                             x1f = x1_orig + inset_x; y1f = y1_orig + inset_y
                             x2f = x2_orig - inset_x; y2f = y2_orig - inset_y
-                            M = cv2.moments(mask_resized)
-                            if M["m00"] != 0:
-                                cx = M["m10"] / M["m00"]
-                                cy = M["m01"] / M["m00"]
+                            centroid = geometry.centroid(mask)
+                            if centroid is not None:
+                                cx, cy = centroid
                             else:
                                 cx = (x1f + x2f) / 2.0
                                 cy = (y1f + y2f) / 2.0
                             if self.save_csv:
-                                contours, _ = cv2.findContours(mask_resized, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                                polygon_points_str = ";".join([",".join(map(str, p[0])) for cnt in contours for p in cnt])
-                                all_detections_data.append([frame_idx, class_name, f"{conf:.4f}", f"{x1f:.4f}", f"{y1f:.4f}", f"{x2f:.4f}", f"{y2f:.4f}", f"{cx:.4f}", f"{cy:.4f}", polygon_points_str])
+                                row = [frame_idx, class_name, f"{conf:.4f}", f"{x1f:.4f}", f"{y1f:.4f}", f"{x2f:.4f}", f"{y2f:.4f}", f"{cx:.4f}", f"{cy:.4f}"]
+                                if polygon_store is not None: polygon_store.add(geometry.polygon_points(mask, self.polygon_tolerance))
+                                else: row.append(geometry.polygon(mask, self.polygon_tolerance))
+                                csv_writer.add_row(row)
                             if self.save_video:
-                                overlay[mask_resized.astype(bool)] = color; has_drawn_mask = True
-                                cv2.rectangle(frame, (int(x1f), int(y1f)), (int(x2f), int(y2f)), color, 1)
-                                cv2.circle(frame, (int(round(cx)), int(round(cy))), 8, centroid_color, -1)
+                                box, centroid = (int(x1f), int(y1f), int(x2f), int(y2f)), (int(round(cx)), int(round(cy)))
+                                rect = (min(box[0], centroid[0] - 9), min(box[1], centroid[1] - 9), max(box[2], centroid[0] + 9) + 1, max(box[3], centroid[1] + 9) + 1)
+                                mask_crop = geometry.crop(mask)
+                                if mask_crop is not None:
+                                    mx, my, crop = mask_crop
+                                    rect = (min(rect[0], mx), min(rect[1], my), max(rect[2], mx + crop.shape[1]), max(rect[3], my + crop.shape[0]))
+                                drawn.append((rect, mask_crop, box, centroid, color))
                     if self.save_video:
-                        if has_drawn_mask: frame = cv2.addWeighted(overlay, 0.4, frame, 0.6, 0)
-                        out_video.write(frame)
-                    
+                        if drawn:
+                            # Blend the masks only around the instances instead of over a full-frame overlay copy.
+                            mask_blend = RegionBlend(frame, [item[0] for item in drawn])
+                            for _, mask_crop, box, centroid, color in drawn:
+                                if mask_crop is not None: mask_blend.fill_mask(*mask_crop, color)
+                                cv2.rectangle(frame, box[:2], box[2:], color, 1)
+                                cv2.circle(frame, centroid, 8, centroid_color, -1)
+                            mask_blend.apply(frame)
+                        video_writer.write(frame)
+                    if csv_writer is not None: csv_writer.end_frame(frame_idx)
+                
                     frame_idx += 1
                     frame_count_for_fps += 1
 
@@ -116,27 +196,50 @@ class YoloSegmentationProcessor(QThread):
                     if current_time > fps_check_time + 1:
                         processing_fps = frame_count_for_fps / (current_time - fps_check_time)
                         self.speed_updated.emit(processing_fps)
+                        self.stage_speeds_updated.emit(stage_fps(reader.frames, reader.busy), stage_fps(inferred_frames, inference_time), stage_fps(video_writer.frames, video_writer.busy) if video_writer else 0.0)
                         frame_count_for_fps = 0; fps_check_time = current_time
 
                     if total_frames > 0:
                         progress = int(frame_idx * 100 / total_frames)
                         self.file_progress.emit(progress, frame_idx, total_frames)
-                        self.time_updated.emit(file_stopwatch.get_elapsed_time(), file_stopwatch.get_etr(frame_idx, total_frames))
-                
-                cap.release()
-                if self.save_video:
-                    out_video.release(); self.log_message.emit(f"✓ Saved segmented video to: {os.path.basename(out_video_path)}")
-                if self.save_csv:
-                    out_csv_path = os.path.join(self.output_dir, f"{base_name}_segmentations.csv")
-                    with open(out_csv_path, 'w', newline='') as f:
-                        writer = csv.writer(f); writer.writerow(["frame_idx", "class_name", "conf", "x1", "y1", "x2", "y2", "cx", "cy", "polygon"]); writer.writerows(all_detections_data)
-                    self.log_message.emit(f"✓ Saved segmentations CSV to: {os.path.basename(out_csv_path)}")
-            except Exception as e:
-                self.log_message.emit(f"[ERROR] Failed during processing of {video_filename}: {e}"); self.log_message.emit(traceback.format_exc())
-                if 'cap' in locals() and cap.isOpened(): cap.release()
-                if 'out_video' in locals() and out_video is not None: out_video.release()
-                continue
-        
-        if self.is_running: self.log_message.emit("\n--- YOLO Segmentation Complete ---")
-        else: self.log_message.emit("\n--- YOLO Segmentation Cancelled ---")
-        self.finished.emit()
\ No newline at end of file
+                        self.time_updated.emit(file_stopwatch.get_elapsed_time(), file_stopwatch.get_etr(frame_idx - start_frame, total_frames - start_frame))
+            
+            reader.close()
+            if video_writer is not None: video_writer.close()
+            raise_stage_errors(reader, video_writer)
+            cap.release()
+            if self.save_video:
+                out_video.release()
+                if video_segment_path != out_video_path:
+                    error = join_continuation(out_video_path, video_segment_path)
+                    if error: raise RuntimeError(error)
+                self.log_message.emit(f"✓ Saved segmented video to: {os.path.basename(out_video_path)}")
+            if csv_writer is not None:
+                csv_writer.close(complete=self.is_running)  # A cancelled video is resumed from its marker by the next run.
+                self.log_message.emit(f"✓ Saved segmentations CSV to: {os.path.basename(out_csv_path)}")
+                if self.polygon_format == 'binary': self.log_message.emit(f"✓ Saved polygons to: {os.path.basename(polygon_store_path(out_csv_path))}")
+        except Exception as e:
+            self.log_message.emit(f"[ERROR] Failed during processing of {video_filename}: {e}"); self.log_message.emit(traceback.format_exc())
+            if 'reader' in locals(): reader.close()
+            if 'video_writer' in locals() and video_writer is not None: video_writer.close()
+            if 'cap' in locals() and cap.isOpened(): cap.release()
+            if 'out_video' in locals() and out_video is not None: out_video.release()
+            if 'csv_writer' in locals() and csv_writer is not None: csv_writer.close(complete=False)
+
+def segmentation_class_colors(class_names):
+    return {i: tuple(np.random.randint(60, 255, size=3).tolist()) for i, name in class_names.items()}
+
+_process_model = None  # (model, class_colors) loaded once by each scheduler process.
+
+def _process_video_in_process(worker_args, video_path, emit, should_stop):
+    """Runs one video of a multi-video schedule (see core.video_scheduler) in a pool process, reporting through `emit`."""
+    global _process_model
+    if _process_model is None:
+        emit('log', f"Loading YOLO Segmentation model from: {worker_args['model_path']}")
+        model = load_model(worker_args['model_path'], worker_args['runtime'], task='segment'); _process_model = (model, segmentation_class_colors(model.names))
+    worker = YoloSegmentationProcessor(**worker_args)
+    def forward_progress(percentage, frames_done, total_frames):
+        emit('progress', frames_done, total_frames)
+        if should_stop(): worker.is_running = False
+    worker.log_message.connect(lambda message: emit('log', message)); worker.file_progress.connect(forward_progress)
+    worker.process_video(*_process_model, video_path)